@@ -0,0 +1,169 @@
+import json
+import random
+import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import fire
+
+from pro_solver.modules.collection.dataset_load.text_process import chunk_latex, chunk_text
+from pro_solver.modules.collection.dataset_load.vars import MATH_BLOCK_PATTERNS, MAX_CHARS, OVERLAP, CHUNK_SIZE
+
+
+def legacy_chunk_latex(text: str, max_chars: int = MAX_CHARS, overlap: int = OVERLAP) -> List[str]:
+    """The multi-pass mask/unmask chunker that chunk_latex replaced, kept as the reference."""
+    masks = {}
+    i = 0
+    for pat, flags in MATH_BLOCK_PATTERNS:
+        def repl(m):
+            nonlocal i
+            key = f"__MATHBLOCK_{i}__"
+            masks[key] = m.group(0)
+            i += 1
+            return key
+        text = re.sub(pat, repl, text, flags=flags)
+
+    def unmask(s):
+        for k, v in masks.items():
+            s = s.replace(k, v)
+        return s
+
+    paras = [p for p in text.split("\n\n") if p.strip()]
+    chunks, buf, cur_len = [], [], 0
+    for p in paras:
+        parts = re.split(r"(?<=[.!?])\s+", p) if len(p) > max_chars * 1.25 else [p]
+        for sp in parts:
+            if cur_len + len(sp) + 2 > max_chars and buf:
+                chunk = unmask("\n\n".join(buf))
+                chunks.append(chunk)
+                if overlap > 0:
+                    tail = chunk[-overlap:]
+                    buf, cur_len = [tail], len(tail)
+                else:
+                    buf, cur_len = [], 0
+            buf.append(sp)
+            cur_len += len(sp) + 2
+    if buf:
+        chunks.append(unmask("\n\n".join(buf)))
+    return chunks
+
+
+def legacy_chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = OVERLAP) -> List[str]:
+    text = re.sub(r"\s+\n", "\n", text)
+    chunks, start, n = [], 0, len(text)
+    while start < n:
+        end = min(start + chunk_size, n)
+        chunks.append(text[start:end])
+        if end == n:
+            break
+        start = max(0, end - overlap)
+    return chunks
+
+
+def synthetic_latex(n_blocks: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = ["solve", "the", "equation", "where", "we", "have", "therefore", "hence", "let", "consider"]
+    blocks = [
+        lambda: f"$$ \\int_0^{{{rng.randint(1, 9)}}} x^{rng.randint(2, 5)} \\, dx = {rng.random():.3f} $$",
+        lambda: f"\\[ a_{rng.randint(0, 9)} + b = {rng.randint(10, 99)} \\]",
+        lambda: "\\begin{align} u_t &= u_{xx} \\\\ u(0) &= 1 \\end{align}",
+    ]
+    paras = []
+    for _ in range(n_blocks):
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(8, 40))) + "."
+        paras.append(sentence + " " + rng.choice(blocks)() + " " + sentence)
+    return "\\section*{Problem}\n" + "\n\n".join(paras)
+
+
+def synthetic_code(n_lines: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n_lines):
+        lines.append(" " * rng.choice([0, 4, 8]) + f"value_{i} = compute({i}, {rng.random():.4f})" + " " * rng.randint(0, 3))
+        if rng.random() < 0.1:
+            lines.append(" " * rng.randint(0, 200))
+    return "\n".join(lines)
+
+
+def dataset_texts(hf_repo: str, limit: int) -> List[str]:
+    from datasets import load_dataset
+    from pro_solver.modules.collection.dataset_load.dataset_process import iter_batches, to_q_a_batch, make_doc_texts
+
+    ds = load_dataset(hf_repo, split="train", streaming=True)
+    texts = []
+    for batch in iter_batches(ds, limit, 256):
+        qs, answers, _ = to_q_a_batch(hf_repo, batch)
+        texts.extend(t for q, t in zip(qs, make_doc_texts(qs, answers)) if q)
+    return texts
+
+
+def repo_texts(root: Path, limit: int) -> List[str]:
+    texts = []
+    for path in sorted(root.rglob("*.py"))[:limit]:
+        texts.append(path.read_text(encoding="utf-8", errors="ignore"))
+    return texts
+
+
+def time_chunker(fn: Callable[[str], List[str]], texts: List[str], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n_chunks = sum(len(fn(t)) for t in texts)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    total_chars = sum(len(t) for t in texts)
+    return {
+        "median_s": timings[len(timings) // 2],
+        "best_s": timings[0],
+        "chunks": n_chunks,
+        "mb_per_s": total_chars / 1e6 / timings[len(timings) // 2],
+    }
+
+
+def compare(name: str, new_fn: Callable, old_fn: Callable, texts: List[str], repeat: int) -> Dict:
+    new = time_chunker(new_fn, texts, repeat)
+    old = time_chunker(old_fn, texts, repeat)
+    same = all(new_fn(t) == old_fn(t) for t in texts)
+    return {
+        "case": name,
+        "docs": len(texts),
+        "chars": sum(len(t) for t in texts),
+        "new": new,
+        "legacy": old,
+        "speedup": old["median_s"] / max(new["median_s"], 1e-12),
+        "identical_chunks": same,
+    }
+
+
+def benchmark(sizes=(10, 100, 1000), repeat: int = 5, dataset: str | None = None, dataset_limit: int = 500,
+              output: str | None = None):
+    """
+    Time chunk_latex and chunk_text against their previous implementations on
+    synthetic LaTeX/code documents of growing size and, optionally, on real
+    dataset rows (`--dataset TIGER-Lab/MathInstruct`) and this repo's sources.
+    """
+    results = []
+    for n in sizes:
+        results.append(compare(f"latex_{n}_blocks", chunk_latex, legacy_chunk_latex,
+                               [synthetic_latex(n, seed) for seed in range(3)], repeat))
+        results.append(compare(f"code_{n * 10}_lines", chunk_text, legacy_chunk_text,
+                               [synthetic_code(n * 10, seed) for seed in range(3)], repeat))
+
+    results.append(compare("repo_sources", chunk_text, legacy_chunk_text,
+                           repo_texts(Path(__file__).resolve().parents[2], 200), repeat))
+    if dataset:
+        results.append(compare(f"dataset_{dataset}", chunk_latex, legacy_chunk_latex,
+                               dataset_texts(dataset, dataset_limit), repeat))
+
+    for r in results:
+        print(f"{r['case']:<40} new {r['new']['median_s'] * 1e3:9.2f} ms  "
+              f"legacy {r['legacy']['median_s'] * 1e3:9.2f} ms  "
+              f"x{r['speedup']:6.1f}  identical={r['identical_chunks']}")
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    fire.Fire(benchmark)
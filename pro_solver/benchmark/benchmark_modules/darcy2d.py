@@ -0,0 +1,157 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+# -div(a(x) grad u) = F on [0, 1]^2, u = 0 on the boundary (PDEBench Darcy, beta = 0.1)
+F = 0.1
+
+
+class DarcyOperator:
+    """
+    Cell-centred finite-volume 5-point operator on an (Nx, Ny) grid. Interior
+    faces use the harmonic mean of the two cell coefficients, boundary faces
+    the cell coefficient over half a cell (Dirichlet 0). The CSC pattern is
+    fixed by the grid, so assembling a field only computes the values.
+    """
+    def __init__(self, nx: int, ny: int, dx: float, dy: float):
+        self.nx, self.ny = nx, ny
+        self.dx, self.dy = dx, dy
+        idx = np.arange(nx * ny).reshape(nx, ny)
+        rows = [idx.ravel(),
+                idx[1:, :].ravel(), idx[:-1, :].ravel(),
+                idx[:, 1:].ravel(), idx[:, :-1].ravel()]
+        cols = [idx.ravel(),
+                idx[:-1, :].ravel(), idx[1:, :].ravel(),
+                idx[:, :-1].ravel(), idx[:, 1:].ravel()]
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        # Position p of the CSC data holds entry order[p] of the list above.
+        pattern = sparse.csc_matrix((np.arange(1, rows.size + 1, dtype=np.float64), (rows, cols)))
+        self.order = pattern.data.astype(np.int64) - 1
+        self.pattern = pattern
+
+    def values(self, a: np.ndarray) -> np.ndarray:
+        """CSC data for a batch of coefficient fields (B, Nx, Ny) -> (B, nnz)."""
+        a = np.asarray(a, dtype=np.float64)
+        inv_dx2, inv_dy2 = 1.0 / self.dx ** 2, 1.0 / self.dy ** 2
+        tx = 2.0 * a[:, 1:, :] * a[:, :-1, :] / (a[:, 1:, :] + a[:, :-1, :]) * inv_dx2
+        ty = 2.0 * a[:, :, 1:] * a[:, :, :-1] / (a[:, :, 1:] + a[:, :, :-1]) * inv_dy2
+
+        diag = np.zeros_like(a)
+        diag[:, 1:, :] += tx
+        diag[:, :-1, :] += tx
+        diag[:, :, 1:] += ty
+        diag[:, :, :-1] += ty
+        diag[:, 0, :] += 2.0 * a[:, 0, :] * inv_dx2
+        diag[:, -1, :] += 2.0 * a[:, -1, :] * inv_dx2
+        diag[:, :, 0] += 2.0 * a[:, :, 0] * inv_dy2
+        diag[:, :, -1] += 2.0 * a[:, :, -1] * inv_dy2
+
+        batch = a.shape[0]
+        coo = np.concatenate([diag.reshape(batch, -1),
+                              -tx.reshape(batch, -1), -tx.reshape(batch, -1),
+                              -ty.reshape(batch, -1), -ty.reshape(batch, -1)], axis=1)
+        return np.ascontiguousarray(coo[:, self.order])
+
+    def matrix(self, values: np.ndarray) -> sparse.csc_matrix:
+        m = self.pattern.copy()
+        m.data = values
+        return m
+
+
+class _SpluSolver:
+    """
+    LU with the fill-reducing ordering (minimum degree on A + A^T) computed for
+    the first field and reused for the rest: the pattern never changes, so
+    later fields are permuted up front and factorised in natural order.
+    """
+    _options = {"diag_pivot_thresh": 0.0, "options": {"SymmetricMode": True}}
+
+    def __init__(self):
+        self.perm = None
+
+    def __call__(self, A: sparse.csc_matrix, b: np.ndarray) -> np.ndarray:
+        if self.perm is None:
+            lu = splu(A, permc_spec="MMD_AT_PLUS_A", **self._options)
+            self.perm = np.argsort(lu.perm_c)
+            return lu.solve(b)
+        p = self.perm
+        # Symmetric permutation keeps the matrix SPD, so no pivoting is needed.
+        lu = splu(A[p][:, p].tocsc(), permc_spec="NATURAL", **self._options)
+        u = np.empty_like(b)
+        u[p] = lu.solve(b[p])
+        return u
+
+
+class _AmgSolver:
+    """
+    CG preconditioned by smoothed-aggregation AMG. The aggregates (strength of
+    connection and aggregation, the graph part of the setup) come from the
+    first field and are reused; prolongation smoothing and the Galerkin coarse
+    operators are recomputed per field, since a hierarchy built for another
+    coefficient field converges poorly on high-contrast media.
+    """
+    def __init__(self, rtol: float = 1e-10):
+        try:
+            import pyamg
+        except ImportError as e:
+            raise ImportError("method='amg' needs pyamg: pip install pyamg") from e
+        self.pyamg = pyamg
+        self.rtol = rtol
+        self.aggregate = None
+        self.iterations = []
+
+    def __call__(self, A: sparse.csc_matrix, b: np.ndarray) -> np.ndarray:
+        from pyamg.krylov import cg
+
+        A = A.tocsr()
+        if self.aggregate is None:
+            ml = self.pyamg.smoothed_aggregation_solver(A, symmetry="symmetric", keep=True)
+            self.aggregate = [("predefined", {"AggOp": level.AggOp.tocsr()}) for level in ml.levels[:-1]]
+        else:
+            ml = self.pyamg.smoothed_aggregation_solver(A, symmetry="symmetric", aggregate=self.aggregate,
+                                                        max_levels=len(self.aggregate) + 1, max_coarse=1)
+        residuals = []
+        u, info = cg(A, b, M=ml.aspreconditioner(cycle="V"), tol=self.rtol, maxiter=500, residuals=residuals)
+        if info != 0:
+            raise RuntimeError(f"CG did not converge ({info})")
+        self.iterations.append(len(residuals) - 1)
+        return u
+
+
+def solve_batch(x, y, a, f: float = F, method: str = "splu", **kwargs) -> np.ndarray:
+    """Coefficient fields (B, Nx, Ny) -> solutions (B, Nx, Ny); assembly is vectorised over the batch."""
+    a = np.asarray(a, dtype=np.float64)
+    single = a.ndim == 2
+    a = a[None] if single else a
+    op = DarcyOperator(a.shape[1], a.shape[2], x[1] - x[0], y[1] - y[0])
+    values = op.values(a)
+    rhs = np.full(a.shape[1] * a.shape[2], float(f))
+
+    if method == "splu":
+        solver = _SpluSolver()
+    elif method == "amg":
+        solver = _AmgSolver(**kwargs)
+    else:
+        raise ValueError(f"Unknown method {method!r}")
+
+    u = np.stack([solver(op.matrix(values[i]), rhs) for i in range(a.shape[0])]).reshape(a.shape)
+    return u[0] if single else u
+
+
+def solve_pde(x, y, a, method: str = "splu"):
+    """
+    Solve the steady-state Darcy flow -div(a(x) * grad(u)) = 0.1 with u = 0 on the boundary
+
+    Parameters:
+    x : np.ndarray
+        1D array of x-coordinates (cell centres), shape (Nx,)
+    y : np.ndarray
+        1D array of y-coordinates (cell centres), shape (Ny,)
+    a : np.ndarray
+        2D coefficient array, shape (Nx, Ny), or a batch (B, Nx, Ny)
+
+    Returns:
+    u : np.ndarray
+        Solution with the shape of `a`
+    """
+    return solve_batch(x, y, a, method=method)
@@ -0,0 +1,59 @@
+import json
+import time
+from typing import Dict, List
+
+import fire
+import numpy as np
+from scipy.sparse.linalg import spsolve
+
+from pro_solver.benchmark.data_modules.load_data import equation_to_numpy
+from pro_solver.benchmark.benchmark_modules.harness import relative_l2
+from pro_solver.benchmark.benchmark_modules.darcy2d import DarcyOperator, solve_batch, F
+
+
+def spsolve_batch(x, y, a):
+    """Per-field spsolve, which recomputes the ordering every time; the baseline for the reused one."""
+    op = DarcyOperator(a.shape[1], a.shape[2], x[1] - x[0], y[1] - y[0])
+    values = op.values(a)
+    rhs = np.full(a.shape[1] * a.shape[2], F)
+    return np.stack([spsolve(op.matrix(values[i]), rhs) for i in range(len(a))]).reshape(a.shape)
+
+
+def score(name: str, u: np.ndarray, target: np.ndarray, elapsed: float) -> Dict:
+    errors = [relative_l2(u[i], target[i]) for i in range(len(u))]
+    return {"solver": name, "samples": len(u), "seconds": elapsed, "seconds_per_sample": elapsed / len(u),
+            "rel_l2_mean": float(np.mean(errors)), "rel_l2_max": float(np.max(errors))}
+
+
+def benchmark(samples: int | None = None, amg: bool = True, output: str | None = None):
+    """Reference Darcy solvers on the HDF5 samples: time per field and relative L2 against `tensor`."""
+    features, x, y, target = equation_to_numpy('darcy2d', lazy=True)
+    n = len(features) if samples is None else min(samples, len(features))
+    a = np.asarray(features[:n], dtype=np.float64)
+    ref = np.asarray(target[:n]).reshape(a.shape)
+
+    results: List[Dict] = []
+    runs = [("spsolve", lambda: spsolve_batch(x, y, a)),
+            ("splu_reused_ordering", lambda: solve_batch(x, y, a, method="splu"))]
+    if amg:
+        runs.append(("amg_cg", lambda: solve_batch(x, y, a, method="amg")))
+    for name, fn in runs:
+        start = time.perf_counter()
+        try:
+            u = fn()
+        except ImportError as e:
+            print(f"{name}: skipped ({e})")
+            continue
+        results.append(score(name, u, ref, time.perf_counter() - start))
+
+    for r in results:
+        print(f"{r['solver']:<22} {r['samples']:5d} samples  {r['seconds']:8.2f}s  "
+              f"{r['seconds_per_sample'] * 1e3:8.1f} ms/sample  rel L2 mean {r['rel_l2_mean']:.3e}  "
+              f"max {r['rel_l2_max']:.3e}")
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    fire.Fire(benchmark)
@@ -0,0 +1,195 @@
+import importlib
+import importlib.util
+import json
+import os
+import resource
+import time
+import traceback
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+import fire
+import numpy as np
+
+from pro_solver.benchmark.data_modules.load_data import equation_to_numpy
+
+
+def load_solver(solver: str, function: str = "solve_pde") -> Callable:
+    """`solve_pde` from a .py file path or an importable module name."""
+    if solver.endswith(".py") or os.path.sep in solver:
+        path = Path(solver).resolve()
+        spec = importlib.util.spec_from_file_location(path.stem, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(solver)
+    return getattr(module, function)
+
+
+def load_equation(equation: str) -> tuple:
+    """Lazy per-sample arrays; memory maps are created here once and re-opened by workers."""
+    data = equation_to_numpy(equation, lazy=True)
+    for arr in data:
+        if hasattr(arr, "array"):
+            arr.array()
+    return data
+
+
+def num_samples(data: tuple) -> int:
+    return len(data[-1])
+
+
+def sample_args(equation: str, data: tuple, i: int) -> tuple:
+    """(solve_pde positional args, target) for sample i, in the EquationVar argument order."""
+    if equation == 'rec_diff':
+        t, x, u_0, target = data
+        return (x, t, u_0[i]), target[i]
+    if equation == 'darcy2d':
+        features, x, y, target = data
+        # tensor is (N, 1, Nx, Ny), the solver returns (Nx, Ny)
+        return (x, y, features[i]), target[i].reshape(features[i].shape)
+    raise ValueError(f"No benchmark adapter for {equation!r}")
+
+
+def relative_l2(u: np.ndarray, target: np.ndarray) -> float:
+    u = np.asarray(u, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    if u.shape != target.shape:
+        raise ValueError(f"solution shape {u.shape} != target shape {target.shape}")
+    return float(np.sqrt(np.sum((u - target) ** 2) / np.sum(target ** 2)))
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def evaluate_sample(solve_fn: Callable, equation: str, data: tuple, i: int, trace_memory: bool = True) -> Dict:
+    """
+    Runs one sample. Peak memory is what tracemalloc sees (numpy buffers
+    included, numba's own allocator not), plus the process RSS high-water mark.
+    """
+    args, target = sample_args(equation, data, i)
+    record = {"sample": int(i)}
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        u = solve_fn(*args)
+        record["wall_time"] = time.perf_counter() - start
+        record["rel_l2"] = relative_l2(u, target)
+    except Exception as e:
+        record["wall_time"] = time.perf_counter() - start
+        record["rel_l2"] = None
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["traceback"] = traceback.format_exc(limit=5)
+    finally:
+        if trace_memory:
+            record["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+    record["max_rss_mb"] = _max_rss_mb()
+    return record
+
+
+def evaluate_samples(solve_fn: Callable, equation: str, indices: Sequence[int] | None = None,
+                     data: tuple | None = None, trace_memory: bool = True) -> List[Dict]:
+    """Sequential, in-process version of `run` for a solver that is already loaded."""
+    data = data if data is not None else load_equation(equation)
+    indices = range(num_samples(data)) if indices is None else indices
+    return [evaluate_sample(solve_fn, equation, data, i, trace_memory) for i in indices]
+
+
+_worker = {}
+
+
+def _init_worker(solver: str, equation: str, data: tuple, warmup: bool, trace_memory: bool) -> None:
+    _worker["solve_fn"] = load_solver(solver)
+    _worker["equation"] = equation
+    _worker["data"] = data
+    _worker["trace_memory"] = trace_memory
+    if warmup:
+        # Pays JIT compilation and first-call imports outside the measured runs.
+        evaluate_sample(_worker["solve_fn"], equation, _worker["data"], 0, trace_memory=False)
+
+
+def _run_sample(i: int) -> Dict:
+    return evaluate_sample(_worker["solve_fn"], _worker["equation"], _worker["data"], i, _worker["trace_memory"])
+
+
+def _stats(values: Sequence[float]) -> Dict:
+    a = np.asarray(values, dtype=np.float64)
+    if a.size == 0:
+        return {"n": 0}
+    std = float(a.std(ddof=1)) if a.size > 1 else 0.0
+    return {
+        "n": int(a.size),
+        "mean": float(a.mean()),
+        "std": std,
+        # normal approximation of the 95% confidence interval of the mean
+        "ci95": 1.96 * std / np.sqrt(a.size),
+        "min": float(a.min()),
+        "median": float(np.median(a)),
+        "p95": float(np.percentile(a, 95)),
+        "max": float(a.max()),
+    }
+
+
+def aggregate(records: List[Dict]) -> Dict:
+    ok = [r for r in records if r.get("rel_l2") is not None and np.isfinite(r["rel_l2"])]
+    return {
+        "samples": len(records),
+        "failed": len(records) - len(ok),
+        "rel_l2": _stats([r["rel_l2"] for r in ok]),
+        "wall_time": _stats([r["wall_time"] for r in ok]),
+        "peak_traced_mb": _stats([r["peak_traced_mb"] for r in ok if "peak_traced_mb" in r]),
+        "max_rss_mb": max((r["max_rss_mb"] for r in records), default=None),
+    }
+
+
+def run(solver: str, equation: str, indices: Sequence[int] | None = None, workers: int | None = None,
+        warmup: bool = True, trace_memory: bool = True, output: str | None = None) -> Dict:
+    """
+    Evaluates `solver` (module name or .py path exposing solve_pde) on every
+    sample of `equation`'s HDF5 file over a process pool.
+    """
+    if isinstance(indices, str):
+        indices = [int(i) for i in indices.split(",") if i.strip()]
+    data = load_equation(equation)
+    indices = list(range(num_samples(data))) if indices is None else list(indices)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(indices)))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(solver, equation, data, warmup, trace_memory)) as pool:
+        records = list(pool.map(_run_sample, indices))
+    elapsed = time.perf_counter() - start
+
+    report = {"solver": solver, "equation": equation, "workers": workers, "elapsed": elapsed,
+              "summary": aggregate(records), "samples": records}
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def print_summary(report: Dict) -> None:
+    s = report["summary"]
+    print(f"{report['solver']} on {report['equation']}: {s['samples']} samples, {s['failed']} failed, "
+          f"{report['workers']} workers, {report['elapsed']:.1f}s")
+    if s["rel_l2"]["n"]:
+        print(f"  rel L2   mean {s['rel_l2']['mean']:.3e} ± {s['rel_l2']['ci95']:.1e}  "
+              f"median {s['rel_l2']['median']:.3e}  max {s['rel_l2']['max']:.3e}")
+        print(f"  time     mean {s['wall_time']['mean']:.3f}s  median {s['wall_time']['median']:.3f}s  "
+              f"p95 {s['wall_time']['p95']:.3f}s")
+    if s["peak_traced_mb"].get("n"):
+        print(f"  memory   peak traced {s['peak_traced_mb']['max']:.1f} MB, max RSS {s['max_rss_mb']:.0f} MB")
+
+
+def main(solver: str, equation: str, indices=None, workers: int | None = None, warmup: bool = True,
+         trace_memory: bool = True, output: str | None = None):
+    print_summary(run(solver, equation, indices, workers, warmup, trace_memory, output))
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import fire
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+# Entry points that must stay cheap to import, with their budget in milliseconds
+# (cumulative time of the module itself as reported by -X importtime).
+IMPORT_BUDGETS_MS = {
+    "pro_solver.infer.inference": 300,
+    "pro_solver.infer.batch_inference": 300,
+    "pro_solver.infer.service": 300,
+    "pro_solver.modules.rag_pipeline.full_pipeline": 150,
+    "pro_solver.modules.collection.collection": 50,
+}
+
+# Heavy dependencies that may only be imported on first use.
+FORBIDDEN_MODULES = ("chromadb", "sentence_transformers", "torch", "transformers", "langchain_core",
+                     "langchain_mistralai", "langchain_community", "datasets", "git", "nbformat", "pydantic")
+
+
+def import_profile(module: str) -> List[Dict]:
+    """Parsed `-X importtime` lines for a fresh interpreter importing `module`."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")]))}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, env=env, cwd=REPO_ROOT)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({"module": name.strip(), "depth": (len(name) - len(name.lstrip())) // 2,
+                     "self_ms": int(self_us) / 1e3, "cumulative_ms": int(cumulative_us) / 1e3})
+    return rows
+
+
+def measure(module: str, repeat: int) -> Dict:
+    # The fastest run is the least disturbed by the OS page cache and scheduling.
+    best = min((import_profile(module) for _ in range(repeat)),
+               key=lambda rows: next(r["cumulative_ms"] for r in rows if r["module"] == module))
+    total = next(r["cumulative_ms"] for r in best if r["module"] == module)
+    imported = {r["module"] for r in best}
+    forbidden = sorted(m for m in imported if m.split(".")[0] in FORBIDDEN_MODULES)
+    return {"module": module, "total_ms": total, "forbidden": forbidden, "rows": best}
+
+
+def benchmark(modules: List[str] | None = None, repeat: int = 3, top: int = 15, output: str | None = None,
+              budget_scale: float = 1.0):
+    """
+    Import each entry point in a fresh interpreter, print the slowest imports
+    and fail (exit 1) when a module goes over its budget or pulls in a heavy
+    dependency eagerly. tests/test_import_time.py runs the same checks under pytest.
+    """
+    if isinstance(modules, str):
+        modules = [m.strip() for m in modules.split(",") if m.strip()]
+    modules = modules or list(IMPORT_BUDGETS_MS)
+
+    failures = []
+    report = []
+    for module in modules:
+        result = measure(module, repeat)
+        budget = IMPORT_BUDGETS_MS.get(module)
+        budget = budget * budget_scale if budget is not None else None
+        print(f"\n{module}: {result['total_ms']:.1f} ms"
+              + (f" (budget {budget:.0f} ms)" if budget is not None else ""))
+        for row in sorted(result["rows"], key=lambda r: r["self_ms"], reverse=True)[:top]:
+            print(f"  {row['self_ms']:8.2f} self  {row['cumulative_ms']:8.2f} cumulative  {row['module']}")
+
+        if budget is not None and result["total_ms"] > budget:
+            failures.append(f"{module} took {result['total_ms']:.1f} ms, budget {budget:.0f} ms")
+        if result["forbidden"]:
+            failures.append(f"{module} eagerly imports {', '.join(result['forbidden'])}")
+        report.append({k: result[k] for k in ("module", "total_ms", "forbidden")} | {"budget_ms": budget})
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if failures:
+        print()
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        raise SystemExit(1)
+    print("\nAll import budgets met")
+
+
+if __name__ == "__main__":
+    fire.Fire(benchmark)
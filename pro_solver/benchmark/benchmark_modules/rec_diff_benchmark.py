@@ -0,0 +1,74 @@
+import json
+import time
+from typing import Dict, List
+
+import fire
+import numpy as np
+from numba import njit
+from scipy.integrate import solve_ivp
+
+from pro_solver.benchmark.data_modules.load_data import equation_to_numpy
+from pro_solver.benchmark.benchmark_modules.harness import relative_l2
+from pro_solver.benchmark.benchmark_modules.rec_diff import solve_batch
+
+
+def legacy_solve_pde(x, t, u0):
+    """The previous reference solver, kept verbatim (including its reaction sign) for comparison."""
+    @njit
+    def pde_func(t, u):
+        du = np.zeros_like(u)
+        du[1:-1] = 0.5 * (u[2:] - 2 * u[1:-1] + u[:-2]) / (x[1] - x[0])**2 - 2 * u[1:-1] * (1 - u[1:-1])
+        du[0] = 0.5 * (u[1] - 2 * u[0] + u[-1]) / (x[1] - x[0])**2 - 2 * u[0] * (1 - u[0])
+        du[-1] = 0.5 * (u[0] - 2 * u[-1] + u[-2]) / (x[1] - x[0])**2 - 2 * u[-1] * (1 - u[-1])
+        return du
+
+    sol = solve_ivp(pde_func, [t[0], t[-1]], u0, t_eval=t, method='BDF')
+    return sol.y.T
+
+
+def score(name: str, u: np.ndarray, target: np.ndarray, elapsed: float) -> Dict:
+    errors = [relative_l2(u[i], target[i]) for i in range(len(u))]
+    return {"solver": name, "samples": len(u), "seconds": elapsed, "seconds_per_sample": elapsed / len(u),
+            "rel_l2_mean": float(np.mean(errors)), "rel_l2_max": float(np.max(errors))}
+
+
+def benchmark(samples: int | None = None, legacy_samples: int = 2, batch_size: int = 64, dt: float = 1e-3,
+              output: str | None = None):
+    """
+    Legacy per-sample solver (dense finite-difference Jacobian, recompiled every
+    call) against the batched BDF with analytic sparse Jacobian, BDF with
+    jac_sparsity and Strang splitting, all scored against the dataset target.
+    """
+    t, x, u_0, target = equation_to_numpy('rec_diff', lazy=True)
+    n = len(target) if samples is None else min(samples, len(target))
+    u0 = np.asarray(u_0[:n])
+    ref = np.asarray(target[:n])
+
+    # JIT compilation (cached on disk after the first run) is not part of the timings.
+    solve_batch(x, t[:2], u0[:1])
+
+    results: List[Dict] = []
+    m = min(legacy_samples, n)
+    start = time.perf_counter()
+    legacy = np.stack([legacy_solve_pde(x, t, u0[i]) for i in range(m)]) if m else None
+    if m:
+        results.append(score("legacy", legacy, ref[:m], time.perf_counter() - start))
+
+    for name, kwargs in [("bdf_analytic_jac", {"method": "bdf", "batch_size": batch_size}),
+                         ("bdf_jac_sparsity", {"method": "bdf", "batch_size": batch_size, "jacobian": "sparsity"}),
+                         ("strang_split", {"method": "strang", "dt": dt})]:
+        start = time.perf_counter()
+        u = solve_batch(x, t, u0, **kwargs)
+        results.append(score(name, u, ref, time.perf_counter() - start))
+
+    for r in results:
+        print(f"{r['solver']:<18} {r['samples']:5d} samples  {r['seconds']:8.2f}s  "
+              f"{r['seconds_per_sample'] * 1e3:9.1f} ms/sample  rel L2 mean {r['rel_l2_mean']:.3e}  "
+              f"max {r['rel_l2_max']:.3e}")
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    fire.Fire(benchmark)
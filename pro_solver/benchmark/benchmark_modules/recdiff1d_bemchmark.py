@@ -1,12 +1,12 @@
-from pro_solver.benchmark.data_modules.load_data import equation_to_numpy
-from pro_solver.benchmark.benchmark_modules.rec_diff import solve_pde
-import numpy as np
+import fire
+
+from pro_solver.benchmark.benchmark_modules.harness import run, print_summary
+
+
+def benchmark(solver: str = "pro_solver.benchmark.benchmark_modules.rec_diff", indices=None,
+              workers: int | None = None, output: str | None = None):
+    print_summary(run(solver, 'rec_diff', indices, workers, output=output))
 
-def benchmark():
-    t, x, u_0, target = equation_to_numpy('rec_diff')
-    u = solve_pde(x, t, u_0[0])
-    rel_loss = np.sum((u - target[0]) ** 2) / np.sum((target[0]) ** 2)
-    print(rel_loss)
 
 if __name__ == "__main__":
-    benchmark()
\ No newline at end of file
+    fire.Fire(benchmark)
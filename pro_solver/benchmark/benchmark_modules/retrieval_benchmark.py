@@ -0,0 +1,172 @@
+import itertools
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import fire
+import numpy as np
+
+from pro_solver.modules.collection.collection import hnsw_metadata
+from pro_solver.modules.collection.embedding_cache import EmbeddingCache
+from pro_solver.modules.collection.exact_backend import ExactCollection, write_exact_index
+
+SECTIONS = ("code", "math")
+EMBEDDING_CACHE_DIR = Path(__file__).resolve().parents[3] / "data" / "embedding_cache"
+
+
+def load_vectors(size: int, num_queries: int, cache_dir: str | Path | None, embedding_model: str,
+                 dim: int = 384, seed: int = 0):
+    """
+    Document and query vectors: rows of the embedding cache when it exists
+    (queries are held-out rows, jittered copies pad the corpus up to `size`),
+    random unit vectors otherwise. Sections are assigned at random.
+    """
+    rng = np.random.default_rng(seed)
+    cache = None
+    if cache_dir is not None and (Path(cache_dir) / embedding_model.replace("/", "__")).exists():
+        cache = EmbeddingCache(cache_dir, embedding_model)
+    if cache is not None and len(cache) > num_queries:
+        rows = rng.permutation(len(cache))
+        queries = cache.get(np.sort(rows[:num_queries]))
+        base = cache.get(np.sort(rows[num_queries:]))
+        reps = -(-size // len(base))
+        docs = np.tile(base, (reps, 1))[:size]
+        if reps > 1:
+            docs[len(base):] += rng.normal(0, 0.01, (size - len(base), docs.shape[1])).astype(np.float32)
+        source = f"cache ({len(cache)} rows)"
+    else:
+        docs = rng.normal(size=(size, dim)).astype(np.float32)
+        queries = rng.normal(size=(num_queries, dim)).astype(np.float32)
+        source = "random"
+    sections = np.asarray(SECTIONS)[rng.integers(0, len(SECTIONS), size)]
+    return docs, queries, sections, source
+
+
+def exact_top_k(docs: np.ndarray, queries: np.ndarray, k: int, mask: np.ndarray | None = None) -> List[set]:
+    """Brute-force cosine neighbours, the ground truth for recall."""
+    idx = np.arange(len(docs)) if mask is None else np.flatnonzero(mask)
+    d = docs[idx] / np.linalg.norm(docs[idx], axis=1, keepdims=True)
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = q @ d.T
+    k = min(k, len(idx))
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(idx[row].tolist()) for row in top]
+
+
+def build_collection(client, docs: np.ndarray, sections: np.ndarray, hnsw: Dict, batch_size: int = 5000):
+    name = "retrieval_benchmark"
+    if name in [c if isinstance(c, str) else c.name for c in client.list_collections()]:
+        client.delete_collection(name)
+    # No embedding function: vectors go in and queries come in precomputed.
+    collection = client.create_collection(name=name, metadata=hnsw_metadata(hnsw), embedding_function=None)
+    batch_size = min(batch_size, getattr(client, "max_batch_size", batch_size) or batch_size)
+    start = time.perf_counter()
+    for lo in range(0, len(docs), batch_size):
+        hi = min(lo + batch_size, len(docs))
+        collection.add(ids=[str(i) for i in range(lo, hi)], embeddings=docs[lo:hi].tolist(),
+                       metadatas=[{"section": str(s)} for s in sections[lo:hi]])
+    return collection, time.perf_counter() - start
+
+
+def build_exact(index_dir: Path, docs: np.ndarray, sections: np.ndarray, dtype: str = "float32"):
+    start = time.perf_counter()
+    write_exact_index(index_dir, "retrieval_benchmark", [str(i) for i in range(len(docs))], [docs],
+                      [""] * len(docs), [{"section": str(s)} for s in sections], dtype)
+    return time.perf_counter() - start
+
+
+def run_batched(collection, queries: np.ndarray, k: int, section: str | None) -> float:
+    """Throughput when the whole query set goes in one call."""
+    where = {"section": section} if section is not None else None
+    start = time.perf_counter()
+    collection.query(query_embeddings=queries, n_results=k, where=where)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def run_queries(collection, queries: np.ndarray, k: int, truth: List[set], section: str | None) -> Dict:
+    """One query per call, like search_rag_res, so latency percentiles are per lookup."""
+    where = {"section": section} if section is not None else None
+    latencies, recalls = [], []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        res = collection.query(query_embeddings=[q.tolist()], n_results=k, where=where)
+        latencies.append(time.perf_counter() - start)
+        found = {int(i) for i in res["ids"][0]}
+        recalls.append(len(found & expected) / max(len(expected), 1))
+    lat_ms = np.asarray(latencies) * 1e3
+    return {
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+        "qps": len(latencies) / float(np.sum(latencies)),
+        "recall": float(np.mean(recalls)),
+    }
+
+
+def benchmark(sizes=(1000, 10000, 50000), num_queries: int = 200, k: int = 5, M=(16, 32),
+              construction_ef=(100, 200), search_ef=(10, 50, 100), section: str = "code",
+              exact: bool = True, exact_threads=(1, 4), exact_dtype: str = "float32",
+              cache_dir: str | None = str(EMBEDDING_CACHE_DIR),
+              embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2", seed: int = 0,
+              output: str | None = None):
+    """
+    Latency (p50/p95/p99), QPS and recall@k of Chroma HNSW lookups against exact
+    brute force, with and without the `where={"section": ...}` filter, for each
+    collection size and each (M, construction_ef, search_ef) combination.
+    Query embedding is excluded, it does not depend on the index. Every
+    combination gets a fresh in-memory collection, since Chroma reads the HNSW
+    settings only when the collection is created. With `exact`, the same
+    vectors also go through ExactCollection (the "exact" retrieval backend)
+    for each thread count, plus its throughput on the batched query set.
+    """
+    import chromadb
+
+    client = chromadb.EphemeralClient()
+    exact_threads = [exact_threads] if isinstance(exact_threads, int) else list(exact_threads)
+    index_root = Path(tempfile.mkdtemp(prefix="exact_index_"))
+    sizes = [sizes] if isinstance(sizes, int) else list(sizes)
+    grid = list(itertools.product(*[[v] if isinstance(v, int) else list(v) for v in (M, construction_ef, search_ef)]))
+
+    results = []
+    for size in sizes:
+        docs, queries, sections, source = load_vectors(size, num_queries, cache_dir, embedding_model, seed=seed)
+        truth = {"all": exact_top_k(docs, queries, k),
+                 "section": exact_top_k(docs, queries, k, sections == section)}
+        print(f"size {size}: vectors from {source}")
+        for m, c_ef, s_ef in grid:
+            hnsw = {"M": m, "construction_ef": c_ef, "search_ef": s_ef}
+            collection, build_s = build_collection(client, docs, sections, hnsw)
+            for mode, where in (("all", None), ("section", section)):
+                r = run_queries(collection, queries, k, truth[mode], where)
+                results.append({"size": size, "filter": mode, "backend": "chroma", **hnsw, "build_s": build_s, "k": k, **r})
+                print(f"  M {m:3d}  c_ef {c_ef:4d}  s_ef {s_ef:4d}  {mode:<8}  p50 {r['p50_ms']:7.2f} ms  "
+                      f"p95 {r['p95_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms  {r['qps']:8.0f} q/s  "
+                      f"recall@{k} {r['recall']:.3f}  build {build_s:6.1f}s")
+        client.delete_collection("retrieval_benchmark")
+
+        if exact:
+            build_s = build_exact(index_root / str(size), docs, sections, exact_dtype)
+            for threads in exact_threads:
+                collection = ExactCollection(index_root / str(size), threads=threads)
+                for mode, where in (("all", None), ("section", section)):
+                    r = run_queries(collection, queries, k, truth[mode], where)
+                    r["batch_qps"] = run_batched(collection, queries, k, where)
+                    results.append({"size": size, "filter": mode, "backend": "exact", "threads": threads,
+                                    "build_s": build_s, "k": k, **r})
+                    print(f"  exact threads {threads:2d}  {mode:<8}  p50 {r['p50_ms']:7.2f} ms  "
+                          f"p95 {r['p95_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms  {r['qps']:8.0f} q/s  "
+                          f"(batched {r['batch_qps']:8.0f} q/s)  recall@{k} {r['recall']:.3f}  build {build_s:6.1f}s")
+                collection.close()
+            shutil.rmtree(index_root / str(size), ignore_errors=True)
+    shutil.rmtree(index_root, ignore_errors=True)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    fire.Fire(benchmark)
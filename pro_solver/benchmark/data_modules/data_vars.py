@@ -6,4 +6,9 @@ darcy2d_name = 'Darcy_subset'
 darcy2d_path =  data_path / f"{darcy2d_name}.hdf5"
 
 reacdiff1d_name = 'ReacDiff_Nu0.5_Rho2.0_subset'
-reacdiff1d_path = data_path / f"{reacdiff1d_name}.hdf5"
\ No newline at end of file
+reacdiff1d_path = data_path / f"{reacdiff1d_name}.hdf5"
+
+# Memory-mapped .npy copies of chunked/compressed HDF5 datasets (see LazyH5Dataset)
+npy_cache_path = data_path / 'npy_cache'
+# Rows per block when copying or iterating a contiguous dataset
+read_chunk_bytes = 64 * 2 ** 20
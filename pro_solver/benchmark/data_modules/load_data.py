@@ -1,9 +1,142 @@
+import os
+from pathlib import Path
+from typing import Iterator, Tuple
+
 import h5py
-from pro_solver.benchmark.data_modules.data_vars import darcy2d_path, reacdiff1d_path
+import numpy as np
+from pro_solver.benchmark.data_modules.data_vars import darcy2d_path, reacdiff1d_path, npy_cache_path, \
+    read_chunk_bytes
+
+
+class LazyH5Dataset:
+    """
+    Read-only view of one HDF5 dataset, indexed by sample along axis 0.
+    `sample_index` is applied to every sample (e.g. (0,) keeps only the first
+    time step). Samples come from a memory map when possible: the HDF5 file
+    itself if the dataset is stored contiguous and unfiltered, otherwise an
+    .npy copy written to `cache_dir` on first use. Without either, reads go
+    through h5py. Pickles as (path, key), so worker processes re-open the
+    same mapping and share its pages through the OS page cache.
+    """
+    def __init__(self, path: str | Path, key: str, sample_index: tuple = (), cache_dir: str | Path | None = None):
+        self.path = Path(path)
+        self.key = key
+        self.sample_index = tuple(sample_index)
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        with h5py.File(self.path, 'r') as f:
+            dset = f[key]
+            self.full_shape = dset.shape
+            self.dtype = dset.dtype
+            self.h5_chunks = dset.chunks
+            # None for chunked (possibly compressed) or not yet allocated storage
+            self._offset = dset.id.get_offset() if dset.chunks is None else None
+        self.shape = (self.full_shape[0], *np.empty(self.full_shape[1:], dtype=np.bool_)[self.sample_index].shape)
+        self._array = None
+        self._h5 = None
+        self._pid = None
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k not in ("_array", "_h5", "_pid")}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._array = None
+        self._h5 = None
+        self._pid = None
+
+    def __len__(self) -> int:
+        return self.full_shape[0]
+
+    @property
+    def cache_path(self) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        stat = self.path.stat()
+        return self.cache_dir / f"{self.path.stem}.{self.key}.{stat.st_size}-{stat.st_mtime_ns}.npy"
+
+    def _convert(self, cache_path: Path) -> None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        out = np.lib.format.open_memmap(tmp, mode='w+', dtype=self.dtype, shape=self.full_shape)
+        with h5py.File(self.path, 'r') as f:
+            dset = f[self.key]
+            for start, stop in self._row_blocks():
+                dset.read_direct(out, np.s_[start:stop], np.s_[start:stop])
+        out.flush()
+        del out
+        os.replace(tmp, cache_path)
+
+    def array(self) -> np.ndarray | None:
+        """The memory map over all samples, or None when samples are read through h5py."""
+        if self._array is None:
+            if self._offset is not None:
+                self._array = np.memmap(self.path, dtype=self.dtype, mode='r', offset=self._offset,
+                                        shape=self.full_shape)
+            elif self.cache_dir is not None:
+                cache_path = self.cache_path
+                if not cache_path.exists():
+                    self._convert(cache_path)
+                self._array = np.load(cache_path, mmap_mode='r')
+        return self._array
+
+    def _dataset(self):
+        # h5py handles do not survive fork, so every process opens its own.
+        if self._h5 is None or self._pid != os.getpid():
+            self._h5 = h5py.File(self.path, 'r')
+            self._pid = os.getpid()
+        return self._h5[self.key]
+
+    def __getitem__(self, item) -> np.ndarray:
+        if isinstance(item, (int, np.integer)) and item < 0:
+            item += len(self)
+        selection = (item, *self.sample_index)
+        arr = self.array()
+        if arr is not None:
+            return arr[selection]
+        if isinstance(item, (list, np.ndarray)):
+            # h5py wants increasing fancy indices
+            order = np.argsort(item)
+            data = self._dataset()[(np.asarray(item)[order], *self.sample_index)]
+            return data[np.argsort(order)]
+        return self._dataset()[selection]
+
+    def _row_blocks(self, rows: int | None = None) -> Iterator[Tuple[int, int]]:
+        if rows is None:
+            if self.h5_chunks is not None:
+                rows = self.h5_chunks[0]
+            else:
+                row_bytes = max(1, int(np.prod(self.full_shape[1:])) * self.dtype.itemsize)
+                rows = max(1, read_chunk_bytes // row_bytes)
+        for start in range(0, len(self), rows):
+            yield start, min(start + rows, len(self))
+
+    def iter_chunks(self, rows: int | None = None) -> Iterator[Tuple[int, np.ndarray]]:
+        """(first sample index, block of samples), blocks aligned to the HDF5 chunking along axis 0."""
+        for start, stop in self._row_blocks(rows):
+            yield start, self[start:stop]
+
+    def __iter__(self):
+        for _, block in self.iter_chunks():
+            yield from block
+
+    def __array__(self, dtype=None, copy=None):
+        data = np.asarray(self[:])
+        return data.astype(dtype) if dtype is not None else data
+
 
-def equation_to_numpy(equation_name: str):
+def equation_to_numpy(equation_name: str, lazy: bool = False, cache_dir: str | Path | None = npy_cache_path):
+    """
+    Coordinates are always read into memory. With lazy=True the per-sample
+    arrays are LazyH5Dataset objects that load samples on access.
+    """
     if equation_name == 'darcy2d':
         file_path = darcy2d_path
+        if lazy:
+            with h5py.File(file_path, 'r') as f:
+                x = f['x-coordinate'][:]
+                y = f['y-coordinate'][:]
+            return (LazyH5Dataset(file_path, 'nu', cache_dir=cache_dir), x, y,
+                    LazyH5Dataset(file_path, 'tensor', cache_dir=cache_dir))
         with h5py.File(file_path, 'r') as f:
             features = f['nu'][:]
             target = f['tensor'][:]
@@ -13,6 +146,13 @@ def equation_to_numpy(equation_name: str):
 
     elif equation_name == 'rec_diff':
         file_path = reacdiff1d_path
+        if lazy:
+            with h5py.File(file_path, 'r') as f:
+                t = f['t-coordinate'][:-1]
+                x = f['x-coordinate'][:]
+            target = LazyH5Dataset(file_path, 'tensor', cache_dir=cache_dir)
+            u_0 = LazyH5Dataset(file_path, 'tensor', sample_index=(0,), cache_dir=cache_dir)
+            return t, x, u_0, target
         with h5py.File(file_path, 'r') as f:
             t = f['t-coordinate'][:-1]
             x = f['x-coordinate'][:]
@@ -24,4 +164,4 @@ def equation_to_numpy(equation_name: str):
 
 
 if __name__ == "__main__":
-    t,x,u0,tar = equation_to_numpy('rec_diff')
\ No newline at end of file
+    t,x,u0,tar = equation_to_numpy('rec_diff')
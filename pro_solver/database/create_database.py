@@ -1,28 +1,108 @@
 import hydra
 from omegaconf import DictConfig
 from pathlib import Path
+import shutil
 
 from pro_solver.modules.collection.collection import initialize_collection, get_collection_count
+from pro_solver.modules.collection.embedding_cache import EmbeddingCache, ChunkEmbedder
+from pro_solver.modules.collection.exact_backend import export_exact_index
+from pro_solver.modules.collection.bm25_index import BM25Builder
+from pro_solver.modules.collection.dedup import MinHashDeduper
+from pro_solver.modules.collection.metrics import IngestMetrics
+from pro_solver.modules.collection.manifest import collection_manifest_dir
 from pro_solver.modules.collection.dataset_load.dataset_load import upsert_dataset, pdf_load
+from pro_solver.modules.collection.dataset_load.token_process import TokenChunker
 from pro_solver.modules.collection.repo_load.github_process import add_repos_to_chroma
-from pro_solver.modules.collection.repo_load.vars import DATASETS, ALL_REPOS, FINITE_DIFF_REPOS, PDF_PATHS
+from pro_solver.modules.rag_pipeline.retrieval_cache import RetrievalCache
+from pro_solver.infer.vars.infer_vars.model_var import retrieval_cache_dir
+from pro_solver.modules.collection.repo_load.vars import DATASETS, ALL_REPOS, FINITE_DIFF_REPOS, PDF_PATHS, MANIFEST_DIR
 
 data_config = Path(__file__).resolve().parents[2]/'config'
 
 
 @hydra.main(version_base=None, config_path=str(data_config), config_name='config')
 def main(config: DictConfig) -> None:
-    client, collection = initialize_collection(config["database"]["db_dir"],
-                                               config["database"]["collection_name"],
-                                               config["database"]["embedding_model"])
+    metrics_cfg = config["database"]["metrics"]
+    metrics = IngestMetrics(sample_interval=metrics_cfg["sample_interval"] or None)
+    run_dir = Path(metrics_cfg["report_dir"]) / metrics.run_name
+    if metrics_cfg["profile"]:
+        metrics.profile_dir = run_dir / "profiles"
+    try:
+        ingest(config, metrics)
+    finally:
+        # Written for failed runs too, that is when the numbers are needed most.
+        metrics.close()
+        print(metrics.report())
+        print(f"Run report: {metrics.write_json(run_dir / 'report.json')}")
+        if metrics_cfg["prometheus_textfile"]:
+            metrics.write_prometheus(metrics_cfg["prometheus_textfile"])
+        if metrics.profile_dir is not None:
+            metrics.write_profiles()
+        if metrics.sampler is not None:
+            metrics.sampler.write(run_dir / "stacks.folded")
+
+
+def ingest(config: DictConfig, metrics: IngestMetrics) -> None:
+    with metrics.stage("init"):
+        client, collection = initialize_collection(config["database"]["db_dir"],
+                                                   config["database"]["collection_name"],
+                                                   config["database"]["embedding_model"],
+                                                   reset=config["database"]["rebuild"],
+                                                   cache_folder=config["database"]["embedding_model_dir"],
+                                                   hnsw=config["database"]["hnsw"])
+    bm25 = BM25Builder(Path(config["database"]["bm25_index_dir"]) / config["database"]["collection_name"])
+    dedup_cfg = config["database"]["dedup"]
+    deduper = None
+    if dedup_cfg["enabled"]:
+        deduper = MinHashDeduper(Path(dedup_cfg["db_dir"]) / f'{config["database"]["collection_name"]}.sqlite',
+                                 threshold=dedup_cfg["threshold"], num_perm=dedup_cfg["num_perm"],
+                                 bands=dedup_cfg["bands"])
+    if config["database"]["rebuild"]:
+        # Vectors come back from the embedding cache, only the manifests must go.
+        shutil.rmtree(collection_manifest_dir(MANIFEST_DIR, config["database"]["collection_name"]), ignore_errors=True)
+        bm25.reset()
+        if deduper is not None:
+            deduper.reset()
+    elif not bm25.log_path.exists():
+        # Unchanged files are skipped below, so their chunks must come from the collection.
+        with metrics.stage("bm25_seed"):
+            bm25.seed(collection)
+
+    embedding_cache = EmbeddingCache(config["database"]["embedding_cache_dir"],
+                                     config["database"]["embedding_model"],
+                                     dtype=config["database"]["embedding_dtype"])
+    embedder = ChunkEmbedder(config["database"]["embedding_model"],
+                             embedding_cache,
+                             batch_size=config["database"]["embedding_batch_size"],
+                             cache_folder=config["database"]["embedding_model_dir"])
+    token_chunker = TokenChunker.from_model(config["database"]["embedding_model"],
+                                            config["database"]["chunk_overlap_tokens"],
+                                            cache_dir=config["database"]["embedding_model_dir"])
+    chunk_mode = config["database"]["chunk_mode"]
     
    # for repo in DATASETS:
-    #    upsert_dataset(collection, repo, config["database"]["max_records_per_dataset"])
+    #    upsert_dataset(collection, repo, config["database"]["max_records_per_dataset"], embedder=embedder,
+    #                   token_chunker=token_chunker, chunk_mode=chunk_mode, lexical_index=bm25, deduper=deduper,
+    #                   metrics=metrics)
     
-    add_repos_to_chroma(collection, FINITE_DIFF_REPOS) # CHANGE TO ALL_REPOS FOR INFERENCE
+    add_repos_to_chroma(collection, FINITE_DIFF_REPOS, embedder=embedder,
+                        token_chunker=token_chunker, chunk_mode=chunk_mode,
+                        lexical_index=bm25, deduper=deduper, metrics=metrics) # CHANGE TO ALL_REPOS FOR INFERENCE
     for pdf_path in PDF_PATHS:
-        pdf_load(collection, pdf_path)
+        pdf_load(collection, pdf_path, embedder=embedder, lexical_index=bm25, metrics=metrics)
+    with metrics.stage("bm25_build"):
+        bm25.build()
 
+    # Cached query results may point at chunks that were just replaced.
+    RetrievalCache(cache_dir=retrieval_cache_dir).invalidate()
+    if config["database"]["export_exact_index"]:
+        # Snapshot for the "exact" retrieval backend, stale after every ingestion otherwise.
+        with metrics.stage("export_exact"):
+            export_exact_index(collection,
+                               Path(config["database"]["exact_index_dir"]) / config["database"]["collection_name"])
+    if deduper is not None:
+        print(deduper.report(dim=embedding_cache.dim, dtype_bytes=embedding_cache.dtype.itemsize))
+        deduper.close()
     print(f"Total documents in collection: {get_collection_count(collection)}")
 
 
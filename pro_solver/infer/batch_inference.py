@@ -0,0 +1,134 @@
+import json
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict
+from pathlib import Path
+from typing import List, Tuple
+
+import fire
+from pro_solver.modules.rag_pipeline.full_pipeline import RagPipeline
+from pro_solver.modules.collection.collection import load_collection
+from pro_solver.modules.rag_pipeline.retrieval_cache import RetrievalCache
+from pro_solver.modules.validation.sandbox import SandboxPool
+from pro_solver.modules.validation.acceptance import acceptance_for
+
+from pro_solver.infer.inference import build_model, load_lexical_index
+from pro_solver.infer.cfg_utils import equation_cfg_from_dict
+from pro_solver.infer.vars.infer_vars.equation_var import EQUATIONS_DATASET
+from pro_solver.infer.vars.infer_vars.model_var import db_dir, collection_name, embedding_model, \
+    embedding_model_dir, embedding_local_files_only, retrieval_backend, exact_index_dir, exact_search_threads, \
+    retrieval_mode, \
+    retrieval_cache_size, retrieval_cache_dir, generation_concurrency, max_attempts, time_budget, sandbox_workers, \
+    accept_candidates, select_candidates
+
+
+def load_specs(names=None, specs: str | None = None) -> List[Tuple[str, dict]]:
+    """
+    (name, equation dict) pairs from EQUATIONS_DATASET keys and/or a JSONL file whose
+    lines are {"name": ..., "equation": {...}}, a bare EquationVar dict with a
+    "name" key, or {"name": <EQUATIONS_DATASET key>}.
+    """
+    result = []
+    if isinstance(names, str):
+        names = [n.strip() for n in names.split(",") if n.strip()]
+    for name in names or []:
+        result.append((name, EQUATIONS_DATASET[name]))
+
+    if specs:
+        with open(specs, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                spec = json.loads(line)
+                name = spec.get("name") or f"equation_{line_no}"
+                if "equation" in spec and isinstance(spec["equation"], dict):
+                    equation = spec["equation"]
+                elif name in EQUATIONS_DATASET and "inputs_var" not in spec:
+                    equation = EQUATIONS_DATASET[name]
+                else:
+                    equation = {k: v for k, v in spec.items() if k != "name"}
+                result.append((name, equation))
+    return result
+
+
+def run_one(name: str, equation: dict, model, collection, retrieval_cache, sandbox, output_dir: Path,
+            concurrency: int, attempts: int | None, budget: float | None,
+            accept: bool = accept_candidates, select: int = select_candidates,
+            lexical_index=None, mode: str = "vector") -> dict:
+    start = time.perf_counter()
+    record = {"name": name, "output": str(output_dir / f"{name}.py")}
+    try:
+        math_cfg, code_cfg = equation_cfg_from_dict(equation)
+        pipeline = RagPipeline(model, math_cfg, code_cfg, collection, retrieval_cache=retrieval_cache,
+                               concurrency=concurrency, max_attempts=attempts, time_budget=budget,
+                               sandbox=sandbox, acceptance=acceptance_for(name) if accept else None,
+                               select=select, lexical_index=lexical_index, retrieval_mode=mode)
+        result = asdict(pipeline(str(output_dir / name)))
+        result.pop("code", None)
+        record.update(result)
+    except Exception as e:
+        record.update({"success": False, "error": f"{type(e).__name__}: {e}",
+                       "traceback": traceback.format_exc(), "elapsed": time.perf_counter() - start})
+    return record
+
+
+def main(api_key: str,
+         names=None,
+         specs: str | None = None,
+         output_dir: str = ".",
+         report: str = "batch_report.jsonl",
+         workers: int = 4,
+         concurrency: int = generation_concurrency,
+         attempts: int = max_attempts,
+         budget: float = time_budget,
+         sandbox_size: int = sandbox_workers,
+         cache_responses: bool = False,
+         replay: bool = False,
+         accept: bool = accept_candidates,
+         select: int = select_candidates,
+         backend: str = retrieval_backend,
+         mode: str = retrieval_mode
+         ):
+    equations = load_specs(names, specs)
+    if not equations:
+        raise ValueError("Nothing to do: pass --names and/or --specs")
+
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    # Loaded once and shared by every equation.
+    startup = time.perf_counter()
+    model = build_model(api_key, cache_responses, replay)
+    collection = load_collection(db_dir, collection_name, embedding_model,
+                                 embedding_model_dir, embedding_local_files_only,
+                                 backend, exact_index_dir, exact_search_threads)
+    lexical_index = load_lexical_index(mode)
+    retrieval_cache = RetrievalCache(retrieval_cache_size, retrieval_cache_dir)
+    sandbox = SandboxPool(workers=sandbox_size) if sandbox_size > 0 else None
+    print(f"Startup: {time.perf_counter() - startup:.1f}s, {len(equations)} equations, {workers} workers")
+
+    succeeded = 0
+    started = time.perf_counter()
+    try:
+        with open(report, "w", encoding="utf-8") as report_f, ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_one, name, equation, model, collection, retrieval_cache, sandbox, out,
+                                   concurrency, attempts, budget, accept, select, lexical_index, mode)
+                       for name, equation in equations]
+            for future in as_completed(futures):
+                record = future.result()
+                report_f.write(json.dumps(record) + "\n")
+                report_f.flush()
+                succeeded += bool(record.get("success"))
+                print(f"{record['name']}: success={record.get('success')} "
+                      f"attempts={record.get('attempts')} elapsed={record.get('elapsed', 0):.1f}s")
+    finally:
+        if sandbox is not None:
+            sandbox.close()
+
+    print(f"Done: {succeeded}/{len(equations)} solvers in {time.perf_counter() - started:.1f}s, report: {report}")
+    print(f"Retrieval cache: {retrieval_cache.stats()}")
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -2,9 +2,17 @@ from pro_solver.infer.vars.infer_vars.math_prompt_var import system_math_prompt,
 from pro_solver.infer.vars.infer_vars.code_prompt_var import system_code_prompt, question_code_prompt
 from pro_solver.infer.vars.infer_vars.equation_var import EQUATIONS_DATASET
 
+EQUATION_KEYS = ('equation', 'right_part', 'definition_area', 'boundary_condition',
+                 'init_condition', 'inputs_var', 'outputs_var')
+
 def equation_cfg_generate(equation_name: str) -> tuple:
+    return equation_cfg_from_dict(EQUATIONS_DATASET[equation_name])
+
+def equation_cfg_from_dict(equation: dict) -> tuple:
+    missing = [k for k in EQUATION_KEYS if k not in equation]
+    if missing:
+        raise ValueError(f"Equation spec is missing keys: {missing}")
 
-    equation = EQUATIONS_DATASET[equation_name]
     math_cfg = {
                 'rag_prompt': question_math_prompt,
                 'rag_vars': equation,
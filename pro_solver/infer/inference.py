@@ -2,21 +2,119 @@ import fire
 from pro_solver.modules.rag_pipeline.base_model import LLMModel
 from pro_solver.modules.rag_pipeline.full_pipeline import RagPipeline
 from pro_solver.modules.collection.collection import load_collection
+from pro_solver.modules.rag_pipeline.retrieval_cache import RetrievalCache
+from pro_solver.modules.rag_pipeline.response_cache import ResponseCache
+from pro_solver.modules.validation.sandbox import SandboxPool
+from pro_solver.modules.validation.acceptance import acceptance_for
 
 from pro_solver.infer.cfg_utils import equation_cfg_generate
-from pro_solver.infer.vars.infer_vars.model_var import llm_name, db_dir, collection_name, embedding_model
+from pro_solver.infer.vars.infer_vars.equation_var import EQUATIONS_DATASET
+from pro_solver.infer.vars.infer_vars.model_var import llm_name, db_dir, collection_name, embedding_model, \
+    embedding_model_dir, embedding_local_files_only, retrieval_backend, exact_index_dir, exact_search_threads, \
+    retrieval_mode, bm25_index_dir, \
+    retrieval_cache_size, retrieval_cache_dir, response_cache_dir, response_cache_max_entries, response_cache_ttl, \
+    generation_concurrency, max_attempts, time_budget, sandbox_workers, accept_candidates, select_candidates
+
+# Every module above imports only the standard library; chromadb, langchain and
+# sentence-transformers are loaded on first use, so --help and --check stay fast.
+
+def embedding_model_cached(model_name: str = embedding_model, model_dir=embedding_model_dir) -> bool:
+    # hub cache layout (sentence-transformers >= 3) or the older flat folder name
+    return ((model_dir / ('models--' + model_name.replace('/', '--'))).is_dir()
+            or (model_dir / model_name.replace('/', '_')).is_dir())
+
+def check_setup(api_key: str, name: str, workers: int = sandbox_workers, replay: bool = False,
+                mode: str = retrieval_mode) -> list:
+    """Config problems that would make a run fail, found without loading any model."""
+    problems = []
+    if name not in EQUATIONS_DATASET:
+        problems.append(f"unknown equation {name!r}, expected one of {sorted(EQUATIONS_DATASET)}")
+    else:
+        try:
+            equation_cfg_generate(name)
+        except ValueError as e:
+            problems.append(str(e))
+    if not api_key and not replay:
+        problems.append("empty api key")
+    if not db_dir.exists():
+        problems.append(f"ChromaDB directory not found: {db_dir}")
+    if embedding_local_files_only and not embedding_model_cached():
+        problems.append(f"{embedding_model} is not in {embedding_model_dir}, run create_database first")
+    if workers < 0:
+        problems.append("workers must be >= 0")
+    if mode not in ("vector", "lexical", "hybrid"):
+        problems.append(f"unknown retrieval mode {mode!r}, expected 'vector', 'lexical' or 'hybrid'")
+    elif mode != "vector" and not (bm25_index_dir / collection_name / "index" / "meta.json").exists():
+        problems.append(f"no BM25 index in {bm25_index_dir / collection_name}, run create_database first")
+    return problems
+
+def load_lexical_index(mode: str = retrieval_mode):
+    """The BM25 index for "lexical"/"hybrid" retrieval, None for "vector"."""
+    if mode == "vector":
+        return None
+    from pro_solver.modules.collection.bm25_index import BM25Index
+    return BM25Index(bm25_index_dir / collection_name)
+
+def build_model(api_key: str, cache_responses: bool = False, replay: bool = False) -> LLMModel:
+    response_cache = None
+    if cache_responses or replay:
+        response_cache = ResponseCache(response_cache_dir, response_cache_max_entries, response_cache_ttl, replay)
+    return LLMModel(api_key = api_key, model_name = llm_name, cache = response_cache)
 
 def main(api_key: str,
          name: str,
-         output_name: str
+         output_name: str,
+         cache_responses: bool = False,
+         replay: bool = False,
+         concurrency: int = generation_concurrency,
+         attempts: int = max_attempts,
+         budget: float = time_budget,
+         workers: int = sandbox_workers,
+         accept: bool = accept_candidates,
+         select: int = select_candidates,
+         max_rel_l2: float | None = None,
+         max_seconds: float | None = None,
+         backend: str = retrieval_backend,
+         mode: str = retrieval_mode,
+         check: bool = False
          ):
-    model = LLMModel(api_key = api_key, model_name = llm_name)
-    collection = load_collection(db_dir, collection_name, embedding_model)
+    if check:
+        problems = check_setup(api_key, name, workers, replay, mode)
+        for problem in problems:
+            print(f"Config error: {problem}")
+        if problems:
+            raise SystemExit(1)
+        print("Config OK")
+        return
+    model = build_model(api_key, cache_responses, replay)
+    collection = load_collection(db_dir, collection_name, embedding_model,
+                                 embedding_model_dir, embedding_local_files_only,
+                                 backend, exact_index_dir, exact_search_threads)
+    lexical_index = load_lexical_index(mode)
     math_cfg, code_cfg = equation_cfg_generate(name)
     #----- RAG ------
-    pipeline = RagPipeline(model, math_cfg, code_cfg, collection)
+    retrieval_cache = RetrievalCache(retrieval_cache_size, retrieval_cache_dir)
+    sandbox = SandboxPool(workers=workers) if workers > 0 else None
+    acceptance = acceptance_for(name, max_rel_l2=max_rel_l2, max_seconds_per_sample=max_seconds) if accept else None
+    if accept and acceptance is None:
+        print(f"No benchmark data for {name}, candidates are only checked to run")
+    pipeline = RagPipeline(model, math_cfg, code_cfg, collection, retrieval_cache=retrieval_cache,
+                           concurrency=concurrency, max_attempts=attempts, time_budget=budget,
+                           sandbox=sandbox, acceptance=acceptance, select=select,
+                           lexical_index=lexical_index, retrieval_mode=mode)
 
-    pipeline(output_name)
+    try:
+        result = pipeline(output_name)
+    finally:
+        if sandbox is not None:
+            sandbox.close()
+    print(f"Success: {result.success}, attempts: {result.attempts}, elapsed: {result.elapsed:.1f}s")
+    if result.metrics is not None:
+        print(f"Selected solver: rel L2 {result.metrics['rel_l2']:.3g}, "
+              f"{result.metrics['seconds_per_sample']:.2f}s per sample, metrics in {output_name}.metrics.json")
+    print(f"Retrieval cache: {retrieval_cache.stats()}")
+    if model.cache is not None:
+        print(f"LLM response cache: {model.cache.stats()}")
 
 if __name__ == "__main__":
     fire.Fire(main)
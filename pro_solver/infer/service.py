@@ -0,0 +1,249 @@
+import asyncio
+import json
+import re
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+import fire
+
+from pro_solver.infer.cfg_utils import equation_cfg_from_dict
+from pro_solver.infer.vars.infer_vars.equation_var import EQUATIONS_DATASET
+from pro_solver.infer.vars.infer_vars.model_var import db_dir, collection_name, embedding_model, \
+    embedding_model_dir, embedding_local_files_only, retrieval_backend, exact_index_dir, exact_search_threads, \
+    retrieval_mode, \
+    retrieval_cache_size, retrieval_cache_dir, generation_concurrency, max_attempts, time_budget, sandbox_workers, \
+    accept_candidates, select_candidates
+
+
+# Solver names become file names under output_dir, so no separators or "..".
+SOLVER_NAME = re.compile(r"[A-Za-z0-9_-]+")
+
+
+class StubLLM:
+    """Offline stand-in for LLMModel: answers every prompt from a fixed list of responses (cycled)."""
+    def __init__(self, responses=None):
+        self.responses = responses or [json.dumps({
+            "install": "",
+            "function": "import numpy as np\n\ndef solve_pde(*args):\n    return np.zeros(1)",
+            "example": "print(solve_pde())",
+        })]
+        self.calls = 0
+
+    def __call__(self, prompt_template, input_data: dict, attempt: int = 0):
+        from langchain_core.messages import AIMessage
+        self.calls += 1
+        return AIMessage(content=self.responses[attempt % len(self.responses)])
+
+
+class StubCollection:
+    """Offline stand-in for a Chroma collection: every query returns the same documents."""
+    name = "stub"
+
+    def __init__(self, documents=None):
+        self.documents = documents or ["stub context"]
+
+    def count(self):
+        return len(self.documents)
+
+    def query(self, query_texts, n_results, where=None):
+        docs = self.documents[:n_results]
+        return {"ids": [[str(i) for i in range(len(docs))]], "documents": [docs],
+                "metadatas": [[{} for _ in docs]], "distances": [[0.0 for _ in docs]]}
+
+
+class SolverService:
+    """
+    ASGI app that keeps the model, collection and sandbox resident.
+
+    POST /solve  with {"name": ..., "equation": {EquationVar dict}} (or just an
+                 EQUATIONS_DATASET name) streams NDJSON status lines:
+                 queued -> started -> done. Answers 429 when `max_queue` requests
+                 are already waiting for one of the `max_concurrency` slots.
+    GET /health  returns running/queued counts.
+    """
+    def __init__(self, model, collection, retrieval_cache=None, sandbox=None,
+                 max_concurrency: int = 2, max_queue: int = 16, output_dir: str | Path = "solvers",
+                 concurrency: int = generation_concurrency, attempts: int | None = max_attempts,
+                 budget: float | None = time_budget, accept: bool = accept_candidates,
+                 select: int = select_candidates, lexical_index=None, mode: str = "vector"):
+        self.model = model
+        self.collection = collection
+        self.retrieval_cache = retrieval_cache
+        self.sandbox = sandbox
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.output_dir = Path(output_dir)
+        self.pipeline_kwargs = {"concurrency": concurrency, "max_attempts": attempts, "time_budget": budget,
+                                "select": select, "lexical_index": lexical_index, "retrieval_mode": mode}
+        self.accept = accept
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self._slots = None
+
+    def run_pipeline(self, name: str, equation: dict) -> dict:
+        from pro_solver.modules.rag_pipeline.full_pipeline import RagPipeline
+        from pro_solver.modules.validation.acceptance import acceptance_for
+
+        if not SOLVER_NAME.fullmatch(name):
+            raise ValueError(f"Invalid solver name {name!r}")
+        math_cfg, code_cfg = equation_cfg_from_dict(equation)
+        pipeline = RagPipeline(self.model, math_cfg, code_cfg, self.collection,
+                               retrieval_cache=self.retrieval_cache, sandbox=self.sandbox,
+                               acceptance=acceptance_for(name) if self.accept else None,
+                               **self.pipeline_kwargs)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        return asdict(pipeline(str(self.output_dir / name)))
+
+    @staticmethod
+    def parse_spec(body: bytes) -> tuple:
+        """(name, equation dict) from a request body; raises ValueError for anything the pipeline cannot run."""
+        spec = json.loads(body or b"{}")
+        if not isinstance(spec, dict):
+            raise ValueError(f"Request body must be a JSON object, got {type(spec).__name__}")
+        name = spec.get("name")
+        equation = spec.get("equation")
+        if equation is None:
+            if not isinstance(name, str) or name not in EQUATIONS_DATASET:
+                raise ValueError(f"Unknown equation name {name!r} and no 'equation' given")
+            equation = EQUATIONS_DATASET[name]
+        name = "solver" if name is None else name
+        if not isinstance(name, str) or not SOLVER_NAME.fullmatch(name):
+            raise ValueError(f"Invalid solver name {name!r}, use letters, digits, '_' and '-'")
+        if not isinstance(equation, dict):
+            raise ValueError(f"'equation' must be an object, got {type(equation).__name__}")
+        equation_cfg_from_dict(equation)
+        return name, equation
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+        method, path = scope["method"], scope["path"]
+        if method == "GET" and path == "/health":
+            await self._json(send, 200, {"status": "ok", "running": self.running, "queued": self.queued,
+                                         "completed": self.completed})
+        elif method == "POST" and path == "/solve":
+            await self._solve(receive, send)
+        else:
+            await self._json(send, 404, {"error": "not found"})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.sandbox is not None:
+                    self.sandbox.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _solve(self, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        try:
+            name, equation = self.parse_spec(body)
+        except (ValueError, json.JSONDecodeError) as e:
+            await self._json(send, 400, {"error": str(e)})
+            return
+
+        if self.queued >= self.max_queue:
+            await self._json(send, 429, {"error": "queue full", "queued": self.queued}, [(b"retry-after", b"5")])
+            return
+
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/x-ndjson")]})
+        start = time.perf_counter()
+        self.queued += 1
+        queued = True
+        try:
+            await self._line(send, {"status": "queued", "name": name, "position": self.queued})
+            async with self._slots:
+                self.queued -= 1
+                queued = False
+                self.running += 1
+                try:
+                    await self._line(send, {"status": "started", "name": name,
+                                            "waited": time.perf_counter() - start})
+                    try:
+                        result = await asyncio.to_thread(self.run_pipeline, name, equation)
+                        payload = {"status": "done", "name": name, **result}
+                    except Exception as e:
+                        payload = {"status": "error", "name": name, "error": f"{type(e).__name__}: {e}"}
+                finally:
+                    self.running -= 1
+                    self.completed += 1
+        finally:
+            # Client went away while waiting for a slot.
+            if queued:
+                self.queued -= 1
+        payload["total_time"] = time.perf_counter() - start
+        await self._line(send, payload, more_body=False)
+
+    @staticmethod
+    async def _line(send, payload: dict, more_body: bool = True):
+        await send({"type": "http.response.body", "body": (json.dumps(payload) + "\n").encode("utf-8"),
+                    "more_body": more_body})
+
+    @staticmethod
+    async def _json(send, status: int, payload: dict, headers=None):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), *(headers or [])]})
+        await send({"type": "http.response.body", "body": json.dumps(payload).encode("utf-8")})
+
+
+def create_app(api_key: str | None = None, offline: bool = False, max_concurrency: int = 2,
+               max_queue: int = 16, output_dir: str = "solvers", sandbox_size: int = sandbox_workers,
+               cache_responses: bool = False, backend: str = retrieval_backend,
+               mode: str = retrieval_mode) -> SolverService:
+    from pro_solver.modules.rag_pipeline.retrieval_cache import RetrievalCache
+    from pro_solver.modules.validation.sandbox import SandboxPool
+
+    if offline:
+        model, collection, lexical_index = StubLLM(), StubCollection(), None
+        retrieval_cache = RetrievalCache(retrieval_cache_size)
+        mode = "vector"
+    else:
+        from pro_solver.infer.inference import build_model, load_lexical_index
+        from pro_solver.modules.collection.collection import load_collection
+        model = build_model(api_key, cache_responses)
+        collection = load_collection(db_dir, collection_name, embedding_model,
+                                     embedding_model_dir, embedding_local_files_only,
+                                     backend, exact_index_dir, exact_search_threads)
+        lexical_index = load_lexical_index(mode)
+        retrieval_cache = RetrievalCache(retrieval_cache_size, retrieval_cache_dir)
+    sandbox = SandboxPool(workers=sandbox_size) if sandbox_size > 0 else None
+    return SolverService(model, collection, retrieval_cache, sandbox, max_concurrency, max_queue, output_dir,
+                         lexical_index=lexical_index, mode=mode)
+
+
+def serve(api_key: str | None = None, host: str = "127.0.0.1", port: int = 8000, offline: bool = False,
+          max_concurrency: int = 2, max_queue: int = 16, output_dir: str = "solvers",
+          sandbox_size: int = sandbox_workers, cache_responses: bool = False, backend: str = retrieval_backend,
+          mode: str = retrieval_mode):
+    try:
+        import uvicorn
+    except ImportError as e:
+        raise ImportError("Serving needs an ASGI server: pip install uvicorn") from e
+    if api_key is None and not offline:
+        raise ValueError("Pass an api key or --offline")
+
+    app = create_app(api_key, offline, max_concurrency, max_queue, output_dir, sandbox_size, cache_responses,
+                     backend, mode)
+    uvicorn.run(app, host=host, port=port, lifespan="on")
+
+
+if __name__ == "__main__":
+    fire.Fire(serve)
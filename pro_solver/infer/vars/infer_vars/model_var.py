@@ -4,4 +4,31 @@ llm_name = "mistral-small-latest"
 db_dir = Path(__file__).resolve().parents[4] /'data' / 'chroma'
 collection_name = "chroma_db"
 out_name = 'shit'
-embedding_model = "sentence-transformers/all-MiniLM-L6-v2"
\ No newline at end of file
+embedding_model = "sentence-transformers/all-MiniLM-L6-v2"
+# Filled by create_database; inference then loads the model from here without touching the hub
+embedding_model_dir = Path(__file__).resolve().parents[4] / 'data' / 'models'
+embedding_local_files_only = True
+retrieval_cache_size = 256
+retrieval_cache_dir = Path(__file__).resolve().parents[4] / 'data' / 'retrieval_cache'
+# "chroma" (HNSW) or "exact" (brute-force top-k over an export of the collection in exact_index_dir)
+retrieval_backend = "chroma"
+exact_index_dir = Path(__file__).resolve().parents[4] / 'data' / 'exact_index'
+exact_search_threads = 1
+# "vector", "lexical" (BM25 over bm25_index_dir, no embedding call) or "hybrid" (both, reciprocal-rank fused)
+retrieval_mode = "vector"
+bm25_index_dir = Path(__file__).resolve().parents[4] / 'data' / 'bm25_index'
+
+response_cache_dir = Path(__file__).resolve().parents[4] / 'data' / 'llm_cache'
+response_cache_max_entries = 10000
+response_cache_ttl = None
+
+generation_concurrency = 1
+max_attempts = 20
+time_budget = 900
+
+# 0 validates every candidate in a cold `python` subprocess
+sandbox_workers = 2
+
+# Run accepted candidates on benchmark samples (equations with data only) and keep the best of `select_candidates`
+accept_candidates = True
+select_candidates = 1
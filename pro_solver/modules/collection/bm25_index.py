@@ -0,0 +1,237 @@
+import json
+import re
+import shutil
+import threading
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from pro_solver.modules.collection.manifest import load_json
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_SUBWORD = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+# Query posting lists shorter than count / _SPARSE_RATIO are merged with np.unique, longer ones with a dense bincount.
+_SPARSE_RATIO = 8
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased identifiers and numbers; snake_case and CamelCase identifiers
+    also contribute their parts, so `solve_ivp` matches "solve" and
+    `ScalarField` matches "scalar field".
+    """
+    tokens = []
+    for word in _WORD.findall(text):
+        tokens.extend(_word_tokens(word))
+    return tokens
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_tokens(word: str) -> tuple:
+    # Identifiers repeat heavily across code chunks, so the split is cached per word.
+    parts = [p.lower() for piece in word.split("_") if piece for p in _SUBWORD.findall(piece)]
+    if len(parts) > 1:
+        return (word.lower(), *(p for p in parts if len(p) > 1))
+    return (word.lower(),)
+
+
+class BM25Builder:
+    """
+    Ingestion side of the lexical index. Upserted and deleted chunks are
+    appended to a log (`docs.log.jsonl`, last entry per id wins), so
+    incremental ingestion runs keep the index in step with the collection;
+    `build()` compacts the log and writes the postings that BM25Index loads.
+    """
+    def __init__(self, index_dir: str | Path, k1: float = 1.5, b: float = 0.75):
+        self.dir = Path(index_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.log_path = self.dir / "docs.log.jsonl"
+        self.k1, self.b = k1, b
+        self.lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.log_path.unlink(missing_ok=True)
+            shutil.rmtree(self.dir / "index", ignore_errors=True)
+
+    def add(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[dict | None]) -> None:
+        lines = [json.dumps({"id": i, "document": d, "metadata": m}, ensure_ascii=False) + "\n"
+                 for i, d, m in zip(ids, docs, metas)]
+        with self.lock, open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self.lock, open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps({"id": i, "deleted": True}) + "\n" for i in ids))
+
+    def seed(self, collection, batch_size: int = 5000) -> None:
+        """Starts the log from a collection ingested before the BM25 index existed."""
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            got = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            self.add(got["ids"], got["documents"], got["metadatas"])
+        print(f"BM25 log seeded with {total} chunks")
+
+    def _replay(self) -> Dict[str, dict]:
+        live = {}
+        if self.log_path.exists():
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line of an interrupted run
+                    if entry.get("deleted"):
+                        live.pop(entry["id"], None)
+                    else:
+                        live[entry["id"]] = entry
+        return live
+
+    def build(self) -> Path:
+        with self.lock:
+            live = self._replay()
+            tmp_log = self.log_path.with_suffix(".tmp")
+            with open(tmp_log, "w", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in live.values()))
+            tmp_log.replace(self.log_path)
+        path = write_bm25_index(self.dir / "index", list(live.values()), self.k1, self.b)
+        print(f"BM25 index: {len(live)} chunks -> {path}")
+        return path
+
+
+def write_bm25_index(index_dir: str | Path, entries: List[dict], k1: float = 1.5, b: float = 0.75) -> Path:
+    """
+    Postings as flat arrays: `offsets[t]:offsets[t+1]` of `rows`/`weights` are
+    the chunks containing term t and their precomputed BM25 term weights, so a
+    query is a few slices and a sum. Records (id, document, metadata) are JSON
+    lines behind a byte-offset index. The directory is replaced atomically.
+    """
+    index_dir = Path(index_dir)
+    tmp_dir = index_dir.with_name(index_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    vocab: Dict[str, int] = {}
+    sections: Dict[str, int] = {}
+    term_ids, doc_rows, tfs, doc_len, doc_section = [], [], [], [], []
+    offsets = [0]
+    with open(tmp_dir / "records.jsonl", "wb") as f:
+        for row, entry in enumerate(entries):
+            counts = Counter(tokenize(entry["document"] or ""))
+            term_ids.append(np.fromiter((vocab.setdefault(t, len(vocab)) for t in counts), np.int64, len(counts)))
+            tfs.append(np.fromiter(counts.values(), np.float32, len(counts)))
+            doc_rows.append(np.full(len(counts), row, dtype=np.int32))
+            doc_len.append(sum(counts.values()))
+            section = (entry.get("metadata") or {}).get("section")
+            doc_section.append(sections.setdefault(str(section), len(sections)) if section is not None else -1)
+            line = json.dumps({"id": entry["id"], "document": entry["document"], "metadata": entry.get("metadata")},
+                              ensure_ascii=False).encode("utf-8")
+            f.write(line + b"\n")
+            offsets.append(offsets[-1] + len(line) + 1)
+
+    term_ids = np.concatenate(term_ids) if term_ids else np.empty(0, dtype=np.int64)
+    order = np.argsort(term_ids, kind="stable")
+    rows = (np.concatenate(doc_rows) if doc_rows else np.empty(0, dtype=np.int32))[order]
+    tf = (np.concatenate(tfs) if tfs else np.empty(0, dtype=np.float32))[order]
+    df = np.bincount(term_ids, minlength=len(vocab))
+    term_offsets = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+    n = len(entries)
+    doc_len = np.asarray(doc_len, dtype=np.float32)
+    avgdl = float(doc_len.mean()) if n else 0.0
+    idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+    norm = k1 * (1.0 - b + b * doc_len[rows] / max(avgdl, 1e-9))
+    weights = np.repeat(idf, df) * tf * (k1 + 1.0) / (tf + norm)
+
+    np.save(tmp_dir / "offsets.npy", term_offsets)
+    np.save(tmp_dir / "rows.npy", rows)
+    np.save(tmp_dir / "weights.npy", weights.astype(np.float32))
+    np.save(tmp_dir / "sections.npy", np.asarray(doc_section, dtype=np.int16))
+    np.save(tmp_dir / "record_offsets.npy", np.asarray(offsets, dtype=np.int64))
+    with open(tmp_dir / "vocab.json", "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"count": n, "terms": len(vocab), "avgdl": avgdl, "k1": k1, "b": b, "sections": sections}, f)
+
+    shutil.rmtree(index_dir, ignore_errors=True)
+    tmp_dir.rename(index_dir)
+    return index_dir
+
+
+class BM25Index:
+    """
+    Read side: postings memory-mapped from a BM25Builder directory. Lookups
+    need no embedding call; `query()` mirrors the Chroma result layout with
+    BM25 `scores` in place of distances.
+    """
+    def __init__(self, index_dir: str | Path):
+        path = Path(index_dir)
+        path = path / "index" if (path / "index" / "meta.json").exists() else path
+        meta = load_json(path / "meta.json", None)
+        if meta is None:
+            raise FileNotFoundError(f"BM25 index not found: {path}, run create_database first")
+        self.count = meta["count"]
+        self.sections = meta["sections"]
+        with open(path / "vocab.json", "r", encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        self.rows = np.load(path / "rows.npy", mmap_mode="r")
+        self.weights = np.load(path / "weights.npy", mmap_mode="r")
+        self.doc_section = np.load(path / "sections.npy", mmap_mode="r")
+        self.record_offsets = np.load(path / "record_offsets.npy", mmap_mode="r")
+        self._records = (np.memmap(path / "records.jsonl", dtype=np.uint8, mode="r") if self.count
+                         else np.empty(0, dtype=np.uint8))
+
+    def record(self, row: int) -> dict:
+        return json.loads(bytes(self._records[self.record_offsets[row]:self.record_offsets[row + 1]]))
+
+    def search(self, query_text: str, n_results: int, section: str | None = None):
+        """Top chunk rows and their BM25 scores, best first."""
+        terms = {self.vocab[t] for t in tokenize(query_text) if t in self.vocab}
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if not terms or (section is not None and str(section) not in self.sections):
+            return empty
+        rows = np.concatenate([self.rows[self.offsets[t]:self.offsets[t + 1]] for t in terms])
+        weights = np.concatenate([self.weights[self.offsets[t]:self.offsets[t + 1]] for t in terms])
+        if section is not None:
+            keep = self.doc_section[rows] == self.sections[str(section)]
+            rows, weights = rows[keep], weights[keep]
+        if rows.size == 0:
+            return empty
+
+        if rows.size * _SPARSE_RATIO < self.count:
+            rows, inverse = np.unique(rows, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights)
+        else:
+            scores = np.bincount(rows, weights=weights, minlength=self.count)
+            rows = np.flatnonzero(scores)
+            scores = scores[rows]
+        k = min(n_results, rows.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return rows[top].astype(np.int64), scores[top].astype(np.float32)
+
+    def query(self, query_texts: List[str], n_results: int = 10, where: dict | None = None) -> Dict:
+        section = (where or {}).get("section")
+        results = {"ids": [], "documents": [], "metadatas": [], "scores": []}
+        for text in query_texts:
+            rows, scores = self.search(text, n_results, section)
+            records = [self.record(int(r)) for r in rows]
+            results["ids"].append([r["id"] for r in records])
+            results["documents"].append([r["document"] for r in records])
+            results["metadatas"].append([r["metadata"] for r in records])
+            results["scores"].append(scores.tolist())
+        return results
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[tuple]:
+    """Merges ranked id lists by sum(1 / (k + rank)); returns (id, score) pairs, best first."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: -item[1])
@@ -1,17 +1,38 @@
-import chromadb
-from chromadb.utils import embedding_functions
 from pathlib import Path
 
-def initialize_collection(db_dir: str, collection_name: str, embedding_model: str):
-    client = chromadb.PersistentClient(path=db_dir)
-    embed_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
+# chromadb (and sentence-transformers/torch behind it) are imported inside the
+# functions so that importing this module stays cheap.
+
+def embedding_function(embedding_model: str, cache_folder: str | Path | None = None, local_files_only: bool = False,
+                       **kwargs):
+    from chromadb.utils import embedding_functions
+    if cache_folder is not None:
+        kwargs['cache_folder'] = str(cache_folder)
+    if local_files_only:
+        kwargs['local_files_only'] = True
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
         model_name=embedding_model,
-        model_kwargs={'token': False}
+        **kwargs
     )
+
+def hnsw_metadata(hnsw: dict | None = None) -> dict:
+    """Collection metadata for HNSW settings given without the "hnsw:" prefix, e.g. {"M": 32, "search_ef": 100}."""
+    metadata = {"hnsw:space": "cosine"}
+    for key, value in dict(hnsw or {}).items():
+        metadata[key if key.startswith("hnsw:") else f"hnsw:{key}"] = value
+    return metadata
+
+def initialize_collection(db_dir: str, collection_name: str, embedding_model: str, reset: bool = False,
+                          cache_folder: str | Path | None = None, hnsw: dict | None = None):
+    import chromadb
+    client = chromadb.PersistentClient(path=db_dir)
+    if reset and collection_name in [c if isinstance(c, str) else c.name for c in client.list_collections()]:
+        client.delete_collection(collection_name)
+    embed_fn = embedding_function(embedding_model, cache_folder, model_kwargs={'token': False})
     collection = client.get_or_create_collection(
         name=collection_name,
         embedding_function=embed_fn,
-        metadata={"hnsw:space": "cosine"}
+        metadata=hnsw_metadata(hnsw)
     )
     
     print(f"Chroma path: {db_dir}")
@@ -27,26 +48,31 @@ def query_collection(collection, query_text, n_results=3):
         n_results=n_results
     )
 
-def load_collection(db_path: str, collection_name: str, embedding_model: str):
+def load_collection(db_path: str, collection_name: str, embedding_model: str,
+                    cache_folder: str | Path | None = None, local_files_only: bool = False,
+                    backend: str = "chroma", index_dir: str | Path | None = None, threads: int | None = None):
+    """
+    backend="chroma" returns the Chroma collection; backend="exact" returns an
+    ExactCollection (same query interface, exact top-k) from `index_dir`,
+    exporting it from the Chroma collection first if it does not exist yet.
+    """
+    if backend not in ("chroma", "exact"):
+        raise ValueError(f"Unknown retrieval backend {backend!r}, expected 'chroma' or 'exact'")
     try:
         abs_db_path = Path(db_path).resolve()
-        
-        if not abs_db_path.exists():
-            raise FileNotFoundError(f"ChromaDB directory not found: {abs_db_path}")
-        
-        print(f"Loading ChromaDB from: {abs_db_path}")
-        
-        client = chromadb.PersistentClient(path=str(abs_db_path))
-        
-        embed_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=embedding_model
-        )
-        
-        collection = client.get_collection(
-            name=collection_name,
-            embedding_function=embed_fn
-        )
-        
+        embed_fn = embedding_function(embedding_model, cache_folder, local_files_only)
+
+        if backend == "exact":
+            from pro_solver.modules.collection.exact_backend import ExactCollection, export_exact_index
+            index_path = Path(index_dir) if index_dir is not None else abs_db_path.parent / "exact_index"
+            index_path = index_path / collection_name
+            if not (index_path / "meta.json").exists():
+                export_exact_index(_chroma_collection(abs_db_path, collection_name, embed_fn), index_path)
+            print(f"Loading exact index from: {index_path}")
+            collection = ExactCollection(index_path, embed_fn, threads=threads)
+        else:
+            collection = _chroma_collection(abs_db_path, collection_name, embed_fn)
+
         print(f"✓ Collection '{collection_name}' loaded successfully")
         print(f"✓ Total documents: {collection.count()}")
         
@@ -56,6 +82,19 @@ def load_collection(db_path: str, collection_name: str, embedding_model: str):
         print(f"Error loading collection: {e}")
         raise
 
+def _chroma_collection(abs_db_path: Path, collection_name: str, embed_fn):
+    import chromadb
+    if not abs_db_path.exists():
+        raise FileNotFoundError(f"ChromaDB directory not found: {abs_db_path}")
+
+    print(f"Loading ChromaDB from: {abs_db_path}")
+
+    client = chromadb.PersistentClient(path=str(abs_db_path))
+    return client.get_collection(
+        name=collection_name,
+        embedding_function=embed_fn
+    )
+
 def print_results(results, query_text: str):
     if not results or not results["documents"]:
         print("No results found.")
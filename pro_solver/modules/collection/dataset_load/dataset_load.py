@@ -1,76 +1,204 @@
-from pro_solver.modules.collection.dataset_load.dataset_process import to_q_a, make_doc_text, iter_rows
+from pro_solver.modules.collection.dataset_load.dataset_process import to_q_a_batch, make_doc_texts, iter_batches, \
+    first_truthy_column, skip_rows, _batch_len
 from pro_solver.modules.collection.dataset_load.text_process import chunk_latex
-from pro_solver.modules.collection.dataset_load.vars import MAX_CHARS, OVERLAP, BATCH_SIZE
-import uuid
-from datasets import load_dataset, DatasetDict
-from chromadb.api.models.Collection import Collection
-from langchain_community.document_loaders import PyPDFLoader
+from pro_solver.modules.collection.dataset_load.vars import MAX_CHARS, OVERLAP, BATCH_SIZE, STREAMING, READ_BATCH_SIZE, \
+    CHUNK_MODE
+from pro_solver.modules.collection.manifest import DatasetCheckpoint, collection_manifest_dir, content_hash
+from pro_solver.modules.collection.repo_load.vars import MANIFEST_DIR
+from pro_solver.modules.collection.metrics import IngestMetrics
+from typing import TYPE_CHECKING, Any, Dict
 from pathlib import Path
 
-def upsert_dataset(collection, hf_repo: str, limit: int | None):
-    print(f"\n=== Loading {hf_repo} ===")
+if TYPE_CHECKING:
+    from chromadb.api.models.Collection import Collection
+
+def _upsert(collection, ids, docs, metas, embedder=None, lexical_index=None, deduper=None,
+            metrics: IngestMetrics | None = None) -> int:
+    """Upserts the chunks the deduper lets through; returns how many were written."""
+    metrics = metrics if metrics is not None else IngestMetrics()
+    if deduper is not None:
+        with metrics.stage("dedup", items=len(ids)):
+            ids, docs, metas = deduper.filter(ids, docs, metas)
+        if not ids:
+            return 0
+    nbytes = sum(len(d.encode("utf-8")) for d in docs)
+    if embedder is not None:
+        with metrics.stage("embed", items=len(ids), nbytes=nbytes):
+            embeddings = embedder(docs).tolist()
+        with metrics.stage("upsert", items=len(ids), nbytes=nbytes):
+            collection.upsert(ids=ids, documents=docs, metadatas=metas, embeddings=embeddings)
+    else:
+        with metrics.stage("upsert", items=len(ids), nbytes=nbytes):
+            collection.upsert(ids=ids, documents=docs, metadatas=metas)
+    if lexical_index is not None:
+        with metrics.stage("bm25", items=len(ids)):
+            lexical_index.add(ids, docs, metas)
+    return len(ids)
 
+def load_splits(hf_repo: str, streaming: bool) -> Dict[str, Any]:
+    from datasets import load_dataset
     try:
-        data = load_dataset(hf_repo, split="train")
-        splits = {"train": data}
+        data = load_dataset(hf_repo, split="train", streaming=streaming)
+        return {"train": data}
     except Exception:
-        dd: DatasetDict = load_dataset(hf_repo)
-        splits = {k: v for k, v in dd.items()}
+        dd = load_dataset(hf_repo, streaming=streaming)
+        return {k: v for k, v in dd.items()}
+
+def upsert_dataset(collection, hf_repo: str, limit: int | None, embedder=None,
+                   streaming: bool = STREAMING, read_batch_size: int = READ_BATCH_SIZE,
+                   token_chunker=None, chunk_mode: str = CHUNK_MODE, lexical_index=None, deduper=None,
+                   metrics: IngestMetrics | None = None, manifest_dir: str | Path | None = MANIFEST_DIR,
+                   resume: bool = True):
+    """
+    Chunks and upserts the first `limit` rows of every split. Chunk ids come
+    from the dataset's own row id or, failing that, a hash of the row text, so
+    a rerun upserts the same ids instead of adding copies. After every upsert
+    the row offset it covers is committed to a DatasetCheckpoint under the
+    collection's manifests in `manifest_dir` (cleared with them on rebuild;
+    None disables checkpoints); with `resume`, a rerun skips the committed
+    rows and splits that are already complete.
+    """
+    print(f"\n=== Loading {hf_repo} ===")
+    metrics = metrics if metrics is not None else IngestMetrics()
+
+    with metrics.stage("download"):
+        splits = load_splits(hf_repo, streaming)
+
+    by_tokens = token_chunker is not None and chunk_mode == "tokens"
+    settings = {"chunk_mode": "tokens" if by_tokens else "chars", "max_chars": MAX_CHARS, "overlap": OVERLAP}
+    if by_tokens:
+        settings.update({"budget": token_chunker.budget, "overlap_tokens": token_chunker.overlap})
+
+    checkpoint_dir = None
+    if manifest_dir is not None:
+        checkpoint_dir = collection_manifest_dir(manifest_dir, collection.name) / "datasets"
 
     total_added = 0
+    repeated = 0
     for split_name, ds in splits.items():
-        print(f" Split: {split_name} (size={len(ds)})")
+        size = getattr(ds, "num_rows", None)
+        print(f" Split: {split_name} (size={size if size is not None else 'streaming'})")
+
+        checkpoint = None
+        if checkpoint_dir is not None:
+            checkpoint = DatasetCheckpoint.load(checkpoint_dir, hf_repo, split_name, settings)
+            if not resume:
+                checkpoint.reset()
+            elif checkpoint.is_complete(limit):
+                print(f"  ... already ingested ({checkpoint.rows} rows, {checkpoint.chunks} chunks), skipping")
+                continue
+            elif checkpoint.rows:
+                print(f"  ... resuming at row {checkpoint.rows} "
+                      f"({len(checkpoint.batches)} batches, {checkpoint.chunks} chunks committed)")
+        start_row = checkpoint.rows if checkpoint is not None else 0
+        ds = skip_rows(ds, start_row)
+        remaining = max(limit - start_row, 0) if limit is not None else None
 
         ids, docs, metas = [], [], []
+        # Identical rows hash to the same ids, and Chroma rejects an upsert with repeated ids.
+        batch_ids = set()
         batch_counter = 0
+        row_offset = start_row
 
-        for idx, row in enumerate(iter_rows(ds, limit)):
-            q, a, meta = to_q_a(hf_repo, row)
-            if not q:
-                continue
-            text = make_doc_text(q, a)
-
-            chunks = chunk_latex(text, max_chars=MAX_CHARS, overlap=OVERLAP)
-            base_id = str(row.get("id") or row.get("_id") or row.get("problem_id") or uuid.uuid4())
-
-            for j, ch in enumerate(chunks):
-                ids.append(f"{hf_repo}:{split_name}:{base_id}:{j}")
-                docs.append(ch)
-                m = dict(meta)
-                m.update({
-                    "split": split_name,
-                    "chunk_index": j,
-                    "num_chunks": len(chunks),
-                })
-                metas.append(m)
-
-            if len(ids) >= BATCH_SIZE:
-                collection.upsert(ids=ids, documents=docs, metadatas=metas)
-                batch_counter += 1
-                total_added += len(ids)
-                ids, docs, metas = [], [], []
-
-                if batch_counter % 5 == 0:
-                    print(f"  ... upserted ~{total_added} chunks so far")
+        for batch in metrics.timed_iter("read", iter_batches(ds, remaining, read_batch_size), size=_batch_len):
+            with metrics.stage("parse"):
+                qs, answers, row_metas = to_q_a_batch(hf_repo, batch)
+                texts = make_doc_texts(qs, answers)
+                base_ids = first_truthy_column(batch, ["id", "_id", "problem_id"], len(qs), default=None)
+                rows = [i for i, q in enumerate(qs) if q]
+
+            with metrics.stage("chunk") as counts:
+                tokens = token_chunker.tokens if token_chunker is not None else 0
+                if token_chunker is not None and chunk_mode == "tokens":
+                    row_chunks = token_chunker.chunk_many([texts[i] for i in rows], protect_math=True)
+                else:
+                    row_chunks = [chunk_latex(texts[i], max_chars=MAX_CHARS, overlap=OVERLAP) for i in rows]
+                    if token_chunker is not None:
+                        token_chunker.count_truncated([ch for chunks in row_chunks for ch in chunks])
+                counts["items"] = sum(len(chunks) for chunks in row_chunks)
+                counts["tokens"] = token_chunker.tokens - tokens if token_chunker is not None else 0
+
+            for i, chunks in zip(rows, row_chunks):
+                meta = row_metas[i]
+                base_id = str(base_ids[i] or content_hash(texts[i])[:16])
+
+                for j, ch in enumerate(chunks):
+                    doc_id = f"{hf_repo}:{split_name}:{base_id}:{j}"
+                    if doc_id in batch_ids:
+                        repeated += 1
+                        continue
+                    batch_ids.add(doc_id)
+                    ids.append(doc_id)
+                    docs.append(ch)
+                    m = dict(meta)
+                    m.update({
+                        "split": split_name,
+                        "chunk_index": j,
+                        "num_chunks": len(chunks),
+                    })
+                    metas.append(m)
+
+                if len(ids) >= BATCH_SIZE:
+                    written = _upsert(collection, ids, docs, metas, embedder, lexical_index, deduper, metrics)
+                    batch_counter += 1
+                    total_added += written
+                    if checkpoint is not None:
+                        # Rows after i have nothing in this batch yet, rows up to i are fully written.
+                        checkpoint.commit(row_offset + i + 1, written)
+                    ids, docs, metas = [], [], []
+                    batch_ids = set()
+
+                    if batch_counter % 5 == 0:
+                        print(f"  ... upserted ~{total_added} chunks so far")
+            row_offset += _batch_len(batch)
 
         if ids:
-            collection.upsert(ids=ids, documents=docs, metadatas=metas)
-            total_added += len(ids)
+            written = _upsert(collection, ids, docs, metas, embedder, lexical_index, deduper, metrics)
+            total_added += written
+            if checkpoint is not None:
+                checkpoint.commit(row_offset, written)
             print(f"  ... final flush: total {total_added} chunks added for {hf_repo}")
+        if checkpoint is not None:
+            # Fewer rows than asked for means the split ran out.
+            checkpoint.finish(row_offset, exhausted=limit is None or row_offset < limit)
 
+    if repeated:
+        print(f"  ... {repeated} chunks skipped as exact repeats of a row in the same batch")
+    if embedder is not None:
+        print(f"  ... {embedder.report()}")
+    if token_chunker is not None:
+        print(f"  ... {token_chunker.report()}")
+    if deduper is not None:
+        print(f"  ... {deduper.report()}")
     print(f" Done: {hf_repo}")
 
 
-def pdf_load(collection: Collection, pdf_path: Path) -> None:
-    loader = PyPDFLoader(pdf_path)
-    pages = loader.load_and_split()
+def pdf_load(collection: "Collection", pdf_path: Path, embedder=None, lexical_index=None,
+             metrics: IngestMetrics | None = None) -> None:
+    from langchain_community.document_loaders import PyPDFLoader
+    metrics = metrics if metrics is not None else IngestMetrics()
+    with metrics.stage("pdf_read") as counts:
+        loader = PyPDFLoader(pdf_path)
+        pages = loader.load_and_split()
+        counts["items"] = len(pages)
 
     texts = [page.page_content for page in pages]
     ids = [f"page_{i}" for i in range(len(texts))]
 
+    metadatas = [{"section": "math"} for _ in ids]
+
     ###MATH COLLECTION
-    collection.add(
-                    ids=ids,
-                    documents=texts,
-                    metadatas=[{"section": "math"} for _ in ids]
-                    )
\ No newline at end of file
+    embeddings = None
+    if embedder is not None:
+        with metrics.stage("embed", items=len(texts)):
+            embeddings = embedder(texts).tolist()
+    with metrics.stage("upsert", items=len(texts)):
+        collection.add(
+                        ids=ids,
+                        documents=texts,
+                        metadatas=metadatas,
+                        embeddings=embeddings
+                        )
+    if lexical_index is not None:
+        with metrics.stage("bm25", items=len(texts)):
+            lexical_index.add(ids, texts, metadatas)
\ No newline at end of file
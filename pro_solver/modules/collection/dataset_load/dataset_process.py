@@ -1,5 +1,7 @@
-from typing import Dict, Any, Iterable, List, Tuple
-from datasets import Dataset
+from typing import TYPE_CHECKING, Dict, Any, Iterable, List, Tuple
+
+if TYPE_CHECKING:
+    from datasets import Dataset, IterableDataset
 
 def pick_first(d: Dict[str, Any], candidates: List[str]) -> str:
     for c in candidates:
@@ -7,48 +9,105 @@ def pick_first(d: Dict[str, Any], candidates: List[str]) -> str:
             return d[c]
     return ""
 
-def to_q_a(dataset_name: str, row: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+def _batch_len(batch: Dict[str, List[Any]]) -> int:
+    return len(next(iter(batch.values()))) if batch else 0
+
+def pick_first_column(batch: Dict[str, List[Any]], candidates: List[str], n: int) -> List[str]:
+    out = [""] * n
+    todo = list(range(n))
+    for c in candidates:
+        col = batch.get(c)
+        if col is None or not todo:
+            continue
+        rest = []
+        for i in todo:
+            v = col[i]
+            if v and isinstance(v, str) and v.strip():
+                out[i] = v
+            else:
+                rest.append(i)
+        todo = rest
+    return out
+
+def first_truthy_column(batch: Dict[str, List[Any]], candidates: List[str], n: int, default: Any = "") -> List[Any]:
+    out = [default] * n
+    todo = list(range(n))
+    for c in candidates:
+        col = batch.get(c)
+        if col is None or not todo:
+            continue
+        rest = []
+        for i in todo:
+            if col[i]:
+                out[i] = col[i]
+            else:
+                rest.append(i)
+        todo = rest
+    return out
+
+def str_column(batch: Dict[str, List[Any]], name: str, n: int, default: str = "") -> List[str]:
+    col = batch.get(name)
+    if col is None:
+        return [default] * n
+    return [str(v) for v in col]
+
+def to_q_a_batch(dataset_name: str, batch: Dict[str, List[Any]]) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """
+    Column-wise `to_q_a` over a record batch (a dict of equally long columns,
+    as yielded by `Dataset.iter(batch_size=...)`).
+    """
     dn = dataset_name.lower()
+    n = _batch_len(batch)
 
     if ("tiger-lab" in dn) and ("mathinstruct" in dn):
-        q = pick_first(row, ["instruction", "question", "problem", "prompt", "input", "query", "title"])
-        a = pick_first(row, ["output", "solution", "answer", "response", "rationale", "cot", "explanation"])
-        meta = {
+        qs = pick_first_column(batch, ["instruction", "question", "problem", "prompt", "input", "query", "title"], n)
+        answers = pick_first_column(batch, ["output", "solution", "answer", "response", "rationale", "cot", "explanation"], n)
+        sources = str_column(batch, "source", n)
+        subsets = str_column(batch, "subset", n) if "subset" in batch else str_column(batch, "type", n)
+        ids = first_truthy_column(batch, ["id", "_id", "problem_id", "qid"], n)
+        metas = [{
             "dataset": dataset_name,
-            "source": str(row.get("source", "")),
-            "subset": str(row.get("subset", row.get("type", ""))),
-            "id_in_source": str(row.get("id") or row.get("_id") or row.get("problem_id") or row.get("qid") or ""),
-        }
-        return q, a, meta
+            "source": sources[i],
+            "subset": subsets[i],
+            "id_in_source": str(ids[i]),
+        } for i in range(n)]
+        return qs, answers, metas
 
     if ("open-r1" in dn) and ("openr1-math-220k" in dn):
-        q = pick_first(row, ["problem", "question", "prompt"])
-        a = pick_first(row, ["solution"])
-        
-        if not a:
-            gens = row.get("generations")
+        qs = pick_first_column(batch, ["problem", "question", "prompt"], n)
+        answers = pick_first_column(batch, ["solution"], n)
+
+        gens_col = batch.get("generations")
+        msgs_col = batch.get("messages")
+        for i in range(n):
+            if answers[i]:
+                continue
+            a = ""
+            gens = gens_col[i] if gens_col is not None else None
             if isinstance(gens, list) and gens:
                 a = "\n\n---\n\n".join([g for g in gens if isinstance(g, str) and g.strip()])
-            if not a and isinstance(row.get("messages"), list):
-                msgs = [m.get("content", "") for m in row["messages"]
+            messages = msgs_col[i] if msgs_col is not None else None
+            if not a and isinstance(messages, list):
+                msgs = [m.get("content", "") for m in messages
                         if isinstance(m, dict) and m.get("content")]
                 if msgs:
                     a = "\n\n".join(msgs)
+            answers[i] = a
 
-        meta = {
-            "dataset": dataset_name,
-            "answer": str(row.get("answer", "")),
-            "problem_type": str(row.get("problem_type", "")),
-            "question_type": str(row.get("question_type", "")),
-            "source": str(row.get("source", "")),
-            "uuid": str(row.get("uuid", "")),
-        }
-        return q, a, meta
-
-    q = pick_first(row, ["question", "problem", "instruction", "prompt", "title", "query"])
-    a = pick_first(row, ["solution", "answer", "output", "response", "explanation"])
-    meta = {"dataset": dataset_name}
-    return q, a, meta
+        columns = {name: str_column(batch, name, n)
+                   for name in ["answer", "problem_type", "question_type", "source", "uuid"]}
+        metas = [{"dataset": dataset_name, **{name: col[i] for name, col in columns.items()}}
+                 for i in range(n)]
+        return qs, answers, metas
+
+    qs = pick_first_column(batch, ["question", "problem", "instruction", "prompt", "title", "query"], n)
+    answers = pick_first_column(batch, ["solution", "answer", "output", "response", "explanation"], n)
+    metas = [{"dataset": dataset_name} for _ in range(n)]
+    return qs, answers, metas
+
+def to_q_a(dataset_name: str, row: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+    qs, answers, metas = to_q_a_batch(dataset_name, {k: [v] for k, v in row.items()})
+    return qs[0], answers[0], metas[0]
 
 def make_doc_text(q: str, a: str) -> str:
     q = q.strip()
@@ -60,8 +119,40 @@ def make_doc_text(q: str, a: str) -> str:
         + ("\n\n\\section*{Solution}\n" + a if a else "")
     )
 
-def iter_rows(ds: Dataset, limit: int | None) -> Iterable[Dict[str, Any]]:
+def make_doc_texts(qs: List[str], answers: List[str]) -> List[str]:
+    return [make_doc_text(q, a) for q, a in zip(qs, answers)]
+
+def iter_rows(ds: "Dataset", limit: int | None) -> Iterable[Dict[str, Any]]:
     n = len(ds)
     count = n if limit is None else min(limit, n)
     for i in range(count):
         yield ds[i]
+
+def skip_rows(ds: "Dataset | IterableDataset", n: int) -> "Dataset | IterableDataset":
+    """
+    `ds` without its first n rows. Map-style datasets select by index; streaming
+    ones still download the skipped rows, but nothing is chunked or embedded.
+    """
+    if n <= 0:
+        return ds
+    num_rows = getattr(ds, "num_rows", None)
+    if num_rows is not None:
+        return ds.select(range(min(n, num_rows), num_rows))
+    return ds.skip(n)
+
+def iter_batches(ds: "Dataset | IterableDataset", limit: int | None, batch_size: int) -> Iterable[Dict[str, List[Any]]]:
+    """
+    Record batches as dicts of columns. Works for both map-style and streaming
+    datasets, so memory stays bounded by `batch_size` rows.
+    """
+    seen = 0
+    for batch in ds.iter(batch_size=batch_size):
+        n = _batch_len(batch)
+        if limit is not None and seen + n > limit:
+            n = limit - seen
+            batch = {k: v[:n] for k, v in batch.items()}
+        if n:
+            yield batch
+        seen += n
+        if limit is not None and seen >= limit:
+            break
@@ -1,26 +1,77 @@
 import re
 from typing import Dict, List, Tuple
-from pro_solver.modules.collection.dataset_load.vars import MATH_BLOCK_PATTERNS, MAX_CHARS, OVERLAP, CHUNK_SIZE
-import nbformat
+from pro_solver.modules.collection.dataset_load.vars import MATH_DELIMITERS, MAX_CHARS, OVERLAP, CHUNK_SIZE
 import pathlib
 
+_MASK_KEY_RE = re.compile(r"__MATHBLOCK_\d+__")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+# Same matches as r"\s+\n", but only tried at the start of a whitespace run,
+# which keeps long runs without a newline linear instead of quadratic.
+_SPACE_BEFORE_NEWLINE_RE = re.compile(r"\s(?<!\s\s)\s*\n")
+
+def _math_block_end(text: str, start: int, kind: int) -> int:
+    opener, closers = MATH_DELIMITERS[kind]
+    pos = start + len(opener)
+    for closer in closers:
+        pos = text.find(closer, pos)
+        if pos < 0:
+            return -1
+        pos += len(closer)
+    return pos
+
+def math_spans(text: str) -> List[Tuple[int, int, int]]:
+    """
+    (start, end, kind) of every math block in one left-to-right scan with
+    str.find, matching what the MATH_BLOCK_PATTERNS regexes would match.
+    `kind` indexes MATH_DELIMITERS.
+    """
+    spans = []
+    nxt = [text.find(opener) for opener, _ in MATH_DELIMITERS]
+    pos = 0
+    while True:
+        for kind, p in enumerate(nxt):
+            if 0 <= p < pos:
+                nxt[kind] = text.find(MATH_DELIMITERS[kind][0], pos)
+        open_kinds = [(p, kind) for kind, p in enumerate(nxt) if p >= 0]
+        if not open_kinds:
+            return spans
+        start, kind = min(open_kinds)
+        end = _math_block_end(text, start, kind)
+        if end < 0:
+            # No closer after this opener means none after any later one either.
+            nxt[kind] = -1
+            continue
+        spans.append((start, end, kind))
+        pos = end
+
 def _mask_math(text: str) -> Tuple[str, Dict[str, str]]:
-    masks = {}
+    spans = math_spans(text)
+
+    # Number the masks pattern by pattern, the way the former sequential passes
+    # did, so the masked text (and therefore every chunk boundary) is unchanged.
+    numbers = {}
     i = 0
-    for pat, flags in MATH_BLOCK_PATTERNS:
-        def repl(m):
-            nonlocal i
-            key = f"__MATHBLOCK_{i}__"
-            masks[key] = m.group(0)
-            i += 1
-            return key
-        text = re.sub(pat, repl, text, flags=flags)
-    return text, masks
+    for kind in range(len(MATH_DELIMITERS)):
+        for span in spans:
+            if span[2] == kind:
+                numbers[span] = i
+                i += 1
+
+    masks = {}
+    parts = []
+    pos = 0
+    for span in spans:
+        start, end, _ = span
+        key = f"__MATHBLOCK_{numbers[span]}__"
+        masks[key] = text[start:end]
+        parts.append(text[pos:start])
+        parts.append(key)
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts), masks
 
 def _unmask_math(text: str, masks: Dict[str, str]) -> str:
-    for k, v in masks.items():
-        text = text.replace(k, v)
-    return text
+    return _MASK_KEY_RE.sub(lambda m: masks.get(m.group(0), m.group(0)), text)
 
 def chunk_latex(text: str, max_chars: int = MAX_CHARS, overlap: int = OVERLAP) -> List[str]:
     masked, masks = _mask_math(text)
@@ -31,7 +82,7 @@ def chunk_latex(text: str, max_chars: int = MAX_CHARS, overlap: int = OVERLAP) -
 
     for p in paras:
         if len(p) > max_chars * 1.25:
-            sentence_parts = re.split(r"(?<=[.!?])\s+", p)
+            sentence_parts = _SENTENCE_SPLIT_RE.split(p)
             for sp in sentence_parts:
                 if cur_len + len(sp) + 2 > max_chars and buf:
                     chunk = _unmask_math("\n\n".join(buf), masks)
@@ -65,6 +116,7 @@ def chunk_latex(text: str, max_chars: int = MAX_CHARS, overlap: int = OVERLAP) -
 def safe_read_text(path: pathlib.Path) -> str:
     try:
         if path.suffix == ".ipynb":
+            import nbformat
             with path.open("r", encoding="utf-8") as f:
                 nb = nbformat.read(f, as_version=4)
             parts = []
@@ -80,7 +132,7 @@ def safe_read_text(path: pathlib.Path) -> str:
         return f""
     
 def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = OVERLAP) -> List[str]:
-    text = re.sub(r"\s+\n", "\n", text)
+    text = _SPACE_BEFORE_NEWLINE_RE.sub("\n", text)
     chunks = []
     start = 0
     n = len(text)
@@ -0,0 +1,106 @@
+import json
+from bisect import bisect_left
+from typing import List, Tuple
+
+from pro_solver.modules.collection.dataset_load.text_process import math_spans
+from pro_solver.modules.collection.dataset_load.vars import TOKEN_OVERLAP
+
+
+def model_max_seq_length(embedding_model: str, tokenizer, cache_dir: str | None = None) -> int:
+    """max_seq_length from the sentence-transformers config, which is what encode() truncates at."""
+    try:
+        from huggingface_hub import hf_hub_download
+        with open(hf_hub_download(embedding_model, "sentence_bert_config.json", cache_dir=cache_dir),
+                  "r", encoding="utf-8") as f:
+            return int(json.load(f)["max_seq_length"])
+    except Exception:
+        return int(tokenizer.model_max_length)
+
+
+class TokenChunker:
+    """
+    Chunks text by the embedding model's own (fast, batched) tokenizer so that
+    every chunk fits the model window, with overlap counted in tokens.
+    Also measures how many character-based chunks the model would truncate.
+    """
+    def __init__(self, tokenizer, max_seq_length: int, overlap_tokens: int = TOKEN_OVERLAP):
+        self.tokenizer = tokenizer
+        # [CLS] and [SEP] take two positions of the window.
+        self.budget = max_seq_length - tokenizer.num_special_tokens_to_add()
+        self.overlap = min(overlap_tokens, self.budget // 2)
+        self.chunks = 0
+        self.tokens = 0
+        self.truncated = 0
+        self.truncated_tokens = 0
+
+    @classmethod
+    def from_model(cls, embedding_model: str, overlap_tokens: int = TOKEN_OVERLAP,
+                   cache_dir: str | None = None) -> "TokenChunker":
+        from transformers import AutoTokenizer
+        cache_dir = str(cache_dir) if cache_dir is not None else None
+        tokenizer = AutoTokenizer.from_pretrained(embedding_model, use_fast=True, cache_dir=cache_dir)
+        return cls(tokenizer, model_max_seq_length(embedding_model, tokenizer, cache_dir), overlap_tokens)
+
+    def _encode(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        enc = self.tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True,
+                             return_attention_mask=False, return_token_type_ids=False, verbose=False)
+        return enc["offset_mapping"]
+
+    def _split(self, text: str, offsets: List[Tuple[int, int]], protect_math: bool) -> List[str]:
+        n = len(offsets)
+        if n == 0:
+            return [text] if text.strip() else []
+        if n <= self.budget:
+            return [text]
+
+        starts = [o[0] for o in offsets]
+        spans = math_spans(text) if protect_math else []
+        span_starts = [s for s, _, _ in spans]
+
+        chunks = []
+        start = 0
+        while start < n:
+            end = min(start + self.budget, n)
+            if spans and end < n:
+                # Pull the cut back to the start of a math block it would split.
+                cut = starts[end]
+                k = bisect_left(span_starts, cut) - 1
+                if k >= 0 and spans[k][1] > cut:
+                    block_start = bisect_left(starts, spans[k][0])
+                    if block_start > start + self.overlap:
+                        end = block_start
+            chunks.append(text[offsets[start][0]:offsets[end - 1][1]])
+            if end == n:
+                break
+            start = max(end - self.overlap, start + 1)
+        return chunks
+
+    def chunk_many(self, texts: List[str], protect_math: bool = False) -> List[List[str]]:
+        result = []
+        for text, offsets in zip(texts, self._encode(texts)):
+            chunks = self._split(text, offsets, protect_math)
+            self.chunks += len(chunks)
+            self.tokens += len(offsets)
+            result.append(chunks)
+        return result
+
+    def chunk(self, text: str, protect_math: bool = False) -> List[str]:
+        return self.chunk_many([text], protect_math)[0]
+
+    def count_truncated(self, chunks: List[str]) -> int:
+        """Number of chunks longer than the model window, i.e. whose tail is never embedded."""
+        if not chunks:
+            return 0
+        truncated = 0
+        for offsets in self._encode(chunks):
+            if len(offsets) > self.budget:
+                truncated += 1
+                self.truncated_tokens += len(offsets) - self.budget
+            self.tokens += len(offsets)
+        self.chunks += len(chunks)
+        self.truncated += truncated
+        return truncated
+
+    def report(self) -> str:
+        return (f"{self.chunks} chunks, {self.tokens} tokens, {self.truncated} truncated at the "
+                f"{self.budget}-token window ({self.truncated_tokens} tokens never embedded)")
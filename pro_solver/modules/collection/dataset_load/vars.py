@@ -6,7 +6,22 @@ MATH_BLOCK_PATTERNS = [
     (r"\\begin\{.*?\}.*?\\end\{.*?\}", re.DOTALL)
 ]
 
+# Plain-string form of MATH_BLOCK_PATTERNS for the single-pass scanner:
+# opener, then the closers that must follow it in order.
+MATH_DELIMITERS = [
+    ("$$", ("$$",)),
+    ("\\[", ("\\]",)),
+    ("\\begin{", ("}", "\\end{", "}")),
+]
+
 MAX_CHARS = 1200
 OVERLAP = 150
 CHUNK_SIZE = 1200
 BATCH_SIZE = 512
+
+STREAMING = True
+READ_BATCH_SIZE = 1000
+
+# "chars" cuts by MAX_CHARS/CHUNK_SIZE, "tokens" fills the embedding model window.
+CHUNK_MODE = "chars"
+TOKEN_OVERLAP = 32
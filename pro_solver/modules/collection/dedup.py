@@ -0,0 +1,173 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+_PRIME = np.uint64((1 << 31) - 1)
+
+Batch = Tuple[List[str], List[str], List[dict]]
+
+
+def shingles(text: str, size: int = 5) -> np.ndarray:
+    """crc32 of every `size`-word window (a single window for shorter texts)."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in set(grams)), dtype=np.uint64)
+
+
+class MinHashDeduper:
+    """
+    Near-duplicate filter for ingestion batches. Every kept chunk's MinHash
+    signature is split into `bands` LSH buckets stored in SQLite, so the index
+    persists across runs. A chunk whose estimated Jaccard similarity with an
+    already kept chunk of the same section reaches `threshold` is dropped before
+    embedding, and the mapping (duplicate id -> kept id, plus the duplicate's
+    document and metadata) goes to the `duplicates` table. When a kept chunk is
+    deleted or replaced, its duplicates are handed back for re-ingestion.
+    """
+    def __init__(self, db_path: str | Path, threshold: float = 0.85, num_perm: int = 64, bands: int = 8,
+                 shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm, self.bands, self.rows = num_perm, bands, num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        # Batches arrive on the upsert thread, deletions on the main one.
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS signatures (id TEXT PRIMARY KEY, section TEXT, sig BLOB);
+            CREATE TABLE IF NOT EXISTS bands (key BLOB, id TEXT);
+            CREATE INDEX IF NOT EXISTS bands_key ON bands(key);
+            CREATE INDEX IF NOT EXISTS bands_id ON bands(id);
+            CREATE TABLE IF NOT EXISTS duplicates (id TEXT PRIMARY KEY, canonical TEXT, similarity REAL,
+                                                   document TEXT, metadata TEXT);
+            CREATE INDEX IF NOT EXISTS duplicates_canonical ON duplicates(canonical);
+        """)
+        self.kept = 0
+        self.skipped = 0
+        self.skipped_bytes = 0
+        # Skipped duplicates handed back because their kept chunk went away; they are no longer a saving.
+        self.released = 0
+        self.released_bytes = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        h = shingles(text, self.shingle_size)
+        # (a * h + b) mod p for every permutation; h < 2^32 and a < 2^31 keep it inside uint64.
+        return ((self._a[:, None] * h[None, :] + self._b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, sig: np.ndarray, section: str) -> List[bytes]:
+        return [hashlib.blake2b(section.encode("utf-8") + bytes([band]) +
+                                sig[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).digest()
+                for band in range(self.bands)]
+
+    def _best_match(self, sig: np.ndarray, keys: List[bytes], doc_id: str) -> Tuple[str | None, float]:
+        placeholders = ",".join("?" * len(keys))
+        candidates = self.conn.execute(
+            f"SELECT DISTINCT s.id, s.sig FROM bands b JOIN signatures s ON s.id = b.id "
+            f"WHERE b.key IN ({placeholders}) AND s.id != ?", (*keys, doc_id)).fetchall()
+        best, best_sim = None, 0.0
+        for cand_id, cand_sig in candidates:
+            sim = float(np.mean(np.frombuffer(cand_sig, dtype=np.uint32) == sig))
+            if sim > best_sim:
+                best, best_sim = cand_id, sim
+        return best, best_sim
+
+    def _forget(self, ids: Sequence[str]) -> Batch:
+        """Drops `ids` from the index; returns the duplicates of dropped kept chunks that are not dropped themselves."""
+        gone = set(ids)
+        orphans: Batch = ([], [], [])
+        for start in range(0, len(ids), 500):
+            chunk = list(ids[start:start + 500])
+            marks = ",".join("?" * len(chunk))
+            for dup_id, doc, meta in self.conn.execute(
+                    f"SELECT id, document, metadata FROM duplicates WHERE canonical IN ({marks})", chunk):
+                if dup_id not in gone:
+                    orphans[0].append(dup_id)
+                    orphans[1].append(doc)
+                    orphans[2].append(json.loads(meta) if meta else None)
+                    self.released += 1
+                    self.released_bytes += len((doc or "").encode("utf-8"))
+            self.conn.execute(f"DELETE FROM duplicates WHERE canonical IN ({marks}) OR id IN ({marks})",
+                              chunk + chunk)
+            self.conn.execute(f"DELETE FROM bands WHERE id IN ({marks})", chunk)
+            self.conn.execute(f"DELETE FROM signatures WHERE id IN ({marks})", chunk)
+        return orphans
+
+    def filter(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[dict | None]) -> Batch:
+        """
+        The part of a batch to embed and upsert: new chunks that are not near
+        duplicates of a kept one (earlier in this batch included), plus
+        previously skipped duplicates whose kept chunk is replaced by this batch.
+        """
+        with self.lock, self.conn:
+            orphans = self._forget(list(ids))
+            queue = list(zip(ids, docs, metas)) + list(zip(*orphans))
+            out: Batch = ([], [], [])
+            for doc_id, doc, meta in queue:
+                section = str((meta or {}).get("section", ""))
+                sig = self.signature(doc or "")
+                keys = self._band_keys(sig, section)
+                match, sim = self._best_match(sig, keys, doc_id)
+                if match is not None and sim >= self.threshold:
+                    self.conn.execute("INSERT OR REPLACE INTO duplicates VALUES (?, ?, ?, ?, ?)",
+                                      (doc_id, match, sim, doc, json.dumps(meta, ensure_ascii=False)))
+                    self.skipped += 1
+                    self.skipped_bytes += len((doc or "").encode("utf-8"))
+                    continue
+                self.conn.execute("INSERT OR REPLACE INTO signatures VALUES (?, ?, ?)",
+                                  (doc_id, section, sig.tobytes()))
+                self.conn.executemany("INSERT INTO bands VALUES (?, ?)", [(k, doc_id) for k in keys])
+                self.kept += 1
+                out[0].append(doc_id)
+                out[1].append(doc)
+                out[2].append(meta)
+            return out
+
+    def remove(self, ids: Sequence[str]) -> Batch:
+        """For deleted chunks: forgets them and returns their duplicates, which must be ingested in their place."""
+        with self.lock, self.conn:
+            return self._forget(list(ids))
+
+    def duplicates_of(self, doc_id: str) -> List[Tuple[str, float, dict | None]]:
+        with self.lock:
+            rows = self.conn.execute("SELECT id, similarity, metadata FROM duplicates WHERE canonical = ?",
+                                     (doc_id,)).fetchall()
+        return [(i, sim, json.loads(meta) if meta else None) for i, sim, meta in rows]
+
+    def reset(self) -> None:
+        with self.lock, self.conn:
+            self.conn.executescript("DELETE FROM signatures; DELETE FROM bands; DELETE FROM duplicates;")
+
+    def report(self, dim: int | None = None, dtype_bytes: int = 4) -> str:
+        # A released duplicate comes through filter() again and is counted there as kept or skipped.
+        skipped = self.skipped - self.released
+        total = self.kept + skipped
+        rate = 100 * skipped / total if total else 0.0
+        saved = f"{(self.skipped_bytes - self.released_bytes) / 1e6:.1f} MB of text"
+        if dim:
+            saved += f", {skipped * dim * dtype_bytes / 1e6:.1f} MB of vectors"
+        released = f", {self.released} earlier duplicates re-admitted" if self.released else ""
+        return (f"dedup: {skipped} of {total} chunks skipped as near duplicates ({rate:.0f}%), "
+                f"saved {saved}{released}")
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
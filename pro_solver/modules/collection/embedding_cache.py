@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+
+from pro_solver.modules.collection.manifest import content_hash
+
+
+class EmbeddingCache:
+    """
+    Append-only on-disk store of embedding vectors keyed by chunk content hash.
+    One directory per embedding model holds a raw float16/float32 matrix
+    (`vectors.bin`, memory-mapped for reads) and the row keys (`keys.txt`).
+    """
+    def __init__(self, cache_dir: str | Path, model_name: str, dtype: str = "float16"):
+        self.dir = Path(cache_dir) / model_name.replace("/", "__")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.dir / "vectors.bin"
+        self.keys_path = self.dir / "keys.txt"
+        self.meta_path = self.dir / "meta.json"
+        self.lock = threading.Lock()
+
+        meta = {}
+        if self.meta_path.exists():
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        self.dtype = np.dtype(meta.get("dtype", dtype))
+        self.dim = meta.get("dim")
+        self.index = {}
+        self._mmap = None
+
+        if self.dim is not None and self.keys_path.exists() and self.vectors_path.exists():
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                keys = f.read().split()
+            # A crash between the two appends leaves extra keys or a partial row, drop both.
+            rows = min(len(keys), os.path.getsize(self.vectors_path) // self.row_bytes)
+            self.index = {k: i for i, k in enumerate(keys[:rows])}
+            self._truncate(rows, keys)
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dim * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _truncate(self, rows: int, keys: List[str]) -> None:
+        if os.path.getsize(self.vectors_path) != rows * self.row_bytes:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(rows * self.row_bytes)
+        if len(keys) != rows:
+            with open(self.keys_path, "w", encoding="utf-8") as f:
+                f.write("".join(k + "\n" for k in keys[:rows]))
+
+    def _matrix(self) -> np.memmap:
+        rows = len(self.index)
+        if self._mmap is None or self._mmap.shape[0] != rows:
+            self._mmap = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+        return self._mmap
+
+    def lookup(self, keys: Sequence[str]) -> np.ndarray:
+        return np.array([self.index.get(k, -1) for k in keys], dtype=np.int64)
+
+    def get(self, rows: np.ndarray) -> np.ndarray:
+        with self.lock:
+            if len(rows) == 0:
+                return np.empty((0, self.dim or 0), dtype=np.float32)
+            return np.asarray(self._matrix()[rows], dtype=np.float32)
+
+    def add(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        with self.lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+
+            new_keys, new_rows, seen = [], [], set()
+            for k, v in zip(keys, vectors):
+                if k not in self.index and k not in seen:
+                    seen.add(k)
+                    new_keys.append(k)
+                    new_rows.append(v)
+            if not new_keys:
+                return
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.asarray(new_rows, dtype=self.dtype).tobytes())
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                f.write("".join(k + "\n" for k in new_keys))
+            start = len(self.index)
+            for i, k in enumerate(new_keys):
+                self.index[k] = start + i
+
+
+class ChunkEmbedder:
+    """
+    Explicit embedding stage for ingestion: batch-encodes only the chunks missing
+    from the cache and returns vectors to pass to `collection.upsert(embeddings=...)`.
+    """
+    def __init__(self, model_name: str, cache: EmbeddingCache | None = None,
+                 batch_size: int = 256, device: str | None = None,
+                 cache_folder: str | None = None, local_files_only: bool = False):
+        self.model_name = model_name
+        self.cache_folder = str(cache_folder) if cache_folder is not None else None
+        self.local_files_only = local_files_only
+        self.cache = cache
+        self.batch_size = batch_size
+        self.device = device
+        self._model = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device=self.device, cache_folder=self.cache_folder,
+                                              local_files_only=self.local_files_only)
+        return self._model
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        # Same settings as chromadb's SentenceTransformerEmbeddingFunction, so
+        # query embeddings stay comparable with the cached document vectors.
+        return self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                 normalize_embeddings=False, show_progress_bar=False)
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        if self.cache is None:
+            self.misses += len(texts)
+            return np.asarray(self.encode(texts), dtype=np.float32)
+
+        keys = [content_hash(t) for t in texts]
+        rows = self.cache.lookup(keys)
+        missing = {}
+        for i, (k, r) in enumerate(zip(keys, rows)):
+            if r < 0 and k not in missing:
+                missing[k] = i
+        self.hits += int((rows >= 0).sum())
+        self.misses += len(texts) - int((rows >= 0).sum())
+
+        if missing:
+            vectors = self.encode([texts[i] for i in missing.values()])
+            self.cache.add(list(missing), vectors)
+            rows = self.cache.lookup(keys)
+        return self.cache.get(rows)
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0.0
+        return f"embedding cache: {self.hits} hits, {self.misses} encoded ({rate:.0f}% hit rate)"
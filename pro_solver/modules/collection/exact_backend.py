@@ -0,0 +1,202 @@
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+# Rows scored per matmul; float16 blocks are upcast one at a time, never the whole matrix.
+BLOCK_ROWS = 32768
+
+
+def write_exact_index(index_dir: str | Path, name: str, ids: Sequence[str], vectors: Iterable[np.ndarray],
+                      documents: Iterable[str], metadatas: Iterable[dict | None], dtype: str = "float32") -> Path:
+    """
+    Writes an ExactCollection directory: L2-normalised vectors as a raw matrix
+    (`vectors.bin`), one JSON record per row (`records.jsonl` plus byte
+    `offsets.npy`) and the row indices of every `section` (`sections.npz`).
+    Rows are grouped by section, so a filtered query scans one contiguous
+    slice instead of gathering rows. `vectors` may be a generator of row
+    blocks. The directory is replaced atomically.
+    """
+    index_dir = Path(index_dir)
+    tmp_dir = index_dir.with_name(index_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    dtype = np.dtype(dtype)
+
+    dim, rows = None, 0
+    with open(tmp_dir / "unsorted.bin", "wb") as f:
+        for block in vectors:
+            block = np.atleast_2d(np.asarray(block, dtype=np.float32))
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            f.write((block / np.maximum(norms, 1e-12)).astype(dtype).tobytes())
+            dim, rows = block.shape[1], rows + len(block)
+
+    records = list(zip(ids, documents, metadatas))
+    if len(records) != rows:
+        raise ValueError(f"{rows} vectors but {len(records)} records")
+    keys = [str((meta or {}).get("section", "")) for _, _, meta in records]
+    order = sorted(range(rows), key=keys.__getitem__)
+
+    offsets, sections = [0], {}
+    with open(tmp_dir / "records.jsonl", "wb") as f:
+        for row, i in enumerate(order):
+            id_, doc, meta = records[i]
+            line = json.dumps({"id": id_, "document": doc, "metadata": meta}, ensure_ascii=False).encode("utf-8")
+            f.write(line + b"\n")
+            offsets.append(offsets[-1] + len(line) + 1)
+            if (meta or {}).get("section") is not None:
+                sections.setdefault(keys[i], []).append(row)
+
+    if rows:
+        unsorted = np.memmap(tmp_dir / "unsorted.bin", dtype=dtype, mode="r", shape=(rows, dim))
+        order = np.asarray(order, dtype=np.int64)
+        with open(tmp_dir / "vectors.bin", "wb") as f:
+            for lo in range(0, rows, BLOCK_ROWS):
+                f.write(np.ascontiguousarray(unsorted[order[lo:lo + BLOCK_ROWS]]).tobytes())
+        del unsorted
+    else:
+        open(tmp_dir / "vectors.bin", "wb").close()
+    (tmp_dir / "unsorted.bin").unlink()
+
+    np.save(tmp_dir / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+    np.savez(tmp_dir / "sections.npz", **{k: np.asarray(v, dtype=np.int64) for k, v in sections.items()})
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"name": name, "count": rows, "dim": dim, "dtype": dtype.name}, f)
+
+    shutil.rmtree(index_dir, ignore_errors=True)
+    tmp_dir.rename(index_dir)
+    return index_dir
+
+
+def export_exact_index(collection, index_dir: str | Path, dtype: str = "float32", batch_size: int = 5000) -> Path:
+    """Copies a Chroma collection (stored embeddings, documents, metadata) into an ExactCollection directory."""
+    total = collection.count()
+    ids, documents, metadatas = [], [], []
+
+    def blocks():
+        for offset in range(0, total, batch_size):
+            got = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+            ids.extend(got["ids"])
+            documents.extend(got["documents"])
+            metadatas.extend(got["metadatas"])
+            yield np.asarray(got["embeddings"], dtype=np.float32)
+
+    # write_exact_index drains the vector generator before reading the records it fills in.
+    path = write_exact_index(index_dir, collection.name, ids, blocks(), documents, metadatas, dtype)
+    print(f"Exported {total} rows of '{collection.name}' to {path}")
+    return path
+
+
+class ExactCollection:
+    """
+    Exact cosine top-k over a memory-mapped matrix of normalised embeddings,
+    answering `query()` with the same arguments and result layout as a Chroma
+    collection. `where` filters on `section` use precomputed row indices.
+    `threads` > 1 scores row blocks in parallel (numpy releases the GIL).
+    """
+    def __init__(self, index_dir: str | Path, embedding_function=None, threads: int | None = None,
+                 in_memory: bool = False):
+        self.dir = Path(index_dir)
+        with open(self.dir / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.name = meta["name"]
+        self.dim = meta["dim"]
+        self._count = meta["count"]
+        self.embedding_function = embedding_function
+
+        if self._count:
+            self.matrix = np.memmap(self.dir / "vectors.bin", dtype=meta["dtype"], mode="r",
+                                    shape=(self._count, self.dim))
+            self._records = np.memmap(self.dir / "records.jsonl", dtype=np.uint8, mode="r")
+        else:
+            self.matrix = np.empty((0, self.dim or 0), dtype=np.float32)
+            self._records = np.empty(0, dtype=np.uint8)
+        if in_memory:
+            self.matrix = np.asarray(self.matrix, dtype=np.float32)
+        self._offsets = np.load(self.dir / "offsets.npy")
+        with np.load(self.dir / "sections.npz") as sections:
+            self.sections = {k: sections[k] for k in sections.files}
+
+        self.threads = threads or 1
+        self._pool = ThreadPoolExecutor(max_workers=self.threads) if self.threads > 1 else None
+
+    def count(self) -> int:
+        return self._count
+
+    def _record(self, row: int) -> dict:
+        return json.loads(bytes(self._records[self._offsets[row]:self._offsets[row + 1]]))
+
+    def _rows_for(self, where: dict | None) -> np.ndarray | None:
+        if not where:
+            return None
+        if set(where) != {"section"}:
+            raise ValueError(f"ExactCollection only filters on 'section', got {where}")
+        value = where["section"]
+        if isinstance(value, dict):
+            if set(value) != {"$eq"}:
+                raise ValueError(f"Unsupported section filter {value}")
+            value = value["$eq"]
+        return self.sections.get(str(value), np.empty(0, dtype=np.int64))
+
+    def _block_top_k(self, queries: np.ndarray, k: int, lo: int, hi: int, rows: np.ndarray | None):
+        block = self.matrix[lo:hi] if rows is None else self.matrix[rows[lo:hi]]
+        scores = queries @ np.asarray(block, dtype=np.float32).T
+        kk = min(k, hi - lo)
+        top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        index = top + lo if rows is None else rows[lo:hi][top]
+        return np.take_along_axis(scores, top, axis=1), index
+
+    def search(self, queries: np.ndarray, k: int, rows: np.ndarray | None = None):
+        """(Q, dim) query vectors -> (scores, row indices), each (Q, k) sorted by decreasing similarity."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        lo, hi = 0, self._count
+        if rows is not None:
+            if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+                # A contiguous section (the layout write_exact_index produces) is a plain slice.
+                lo, hi, rows = int(rows[0]), int(rows[-1]) + 1, None
+            else:
+                lo, hi = 0, len(rows)
+        k = min(k, hi - lo)
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty, empty.astype(np.int64)
+
+        spans = [(s, min(s + BLOCK_ROWS, hi)) for s in range(lo, hi, BLOCK_ROWS)]
+        if self._pool is not None and len(spans) > 1:
+            parts = list(self._pool.map(lambda s: self._block_top_k(queries, k, s[0], s[1], rows), spans))
+        else:
+            parts = [self._block_top_k(queries, k, lo, hi, rows) for lo, hi in spans]
+        scores = np.concatenate([p[0] for p in parts], axis=1)
+        index = np.concatenate([p[1] for p in parts], axis=1)
+        if scores.shape[1] > k:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores, index = np.take_along_axis(scores, top, axis=1), np.take_along_axis(index, top, axis=1)
+        order = np.argsort(-scores, axis=1)
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(index, order, axis=1)
+
+    def query(self, query_texts: List[str] | None = None, query_embeddings=None, n_results: int = 10,
+              where: dict | None = None, include: Sequence[str] = ("documents", "metadatas", "distances")) -> Dict:
+        if query_embeddings is None:
+            if self.embedding_function is None:
+                raise ValueError("query_texts needs an embedding_function")
+            query_embeddings = self.embedding_function(list(query_texts))
+        scores, index = self.search(np.asarray(query_embeddings, dtype=np.float32), n_results,
+                                    self._rows_for(where))
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for q_scores, q_index in zip(scores, index):
+            records = [self._record(int(r)) for r in q_index]
+            results["ids"].append([r["id"] for r in records])
+            results["documents"].append([r["document"] for r in records])
+            results["metadatas"].append([r["metadata"] for r in records])
+            # Chroma's cosine space reports 1 - similarity.
+            results["distances"].append((1.0 - q_scores).tolist())
+        return {k: v for k, v in results.items() if k == "ids" or k in include}
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
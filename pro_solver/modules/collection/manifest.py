@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def load_json(path: Path, default: Any) -> Any:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def save_json_atomic(path: Path, data: Any) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def collection_manifest_dir(manifest_dir: Path, collection_name: str) -> Path:
+    """Manifests of one collection; another collection (or DB) starts without any."""
+    return Path(manifest_dir) / collection_name
+
+
+class RepoManifest:
+    """
+    State of the last ingestion of a repository: the commit it was read at,
+    the chunking `settings` it was read with and, per file, the content hash
+    and the chunk ids upserted for it.
+    """
+    def __init__(self, path: Path, commit: str | None = None, files: Dict[str, Dict[str, Any]] | None = None,
+                 settings: Dict[str, Any] | None = None):
+        self.path = Path(path)
+        self.commit = commit
+        self.files = files or {}
+        self.settings = settings
+
+    @classmethod
+    def load(cls, manifest_dir: Path, repo_name: str, settings: Dict[str, Any] | None = None) -> "RepoManifest":
+        """
+        With other chunking `settings` than the stored ones, commit and file
+        hashes are dropped so every file is re-chunked; the chunk ids are kept,
+        so ids the new chunking no longer produces get deleted.
+        """
+        path = Path(manifest_dir) / f"{repo_name}.json"
+        data = load_json(path, {})
+        manifest = cls(path, data.get("commit"), data.get("files", {}), settings)
+        if data and data.get("settings") != settings:
+            print(f"{repo_name}: chunking settings changed ({data.get('settings')} -> {settings}), re-chunking")
+            manifest.commit = None
+            for entry in manifest.files.values():
+                entry["hash"] = None
+        return manifest
+
+    def chunk_ids(self, rel_path: str) -> List[str]:
+        entry = self.files.get(rel_path)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def is_unchanged(self, rel_path: str, digest: str) -> bool:
+        entry = self.files.get(rel_path)
+        return entry is not None and entry["hash"] == digest
+
+    def save(self) -> None:
+        save_json_atomic(self.path, {"commit": self.commit, "settings": self.settings, "files": self.files})
+
+
+class DatasetCheckpoint:
+    """
+    Ingestion progress of one (dataset, split): how many leading rows have all
+    their chunks committed to the collection, one [row offset, chunks] entry
+    per committed batch, and whether the split was read to its end. The
+    offsets only hold for the chunking `settings` they were written with, so a
+    checkpoint with different settings starts over.
+    """
+    def __init__(self, path: Path, settings: Dict[str, Any], rows: int = 0, chunks: int = 0,
+                 batches: List[List[int]] | None = None, exhausted: bool = False):
+        self.path = Path(path)
+        self.settings = settings
+        self.rows = rows
+        self.chunks = chunks
+        self.batches = batches or []
+        self.exhausted = exhausted
+
+    @classmethod
+    def load(cls, checkpoint_dir: Path, dataset: str, split: str, settings: Dict[str, Any]) -> "DatasetCheckpoint":
+        path = Path(checkpoint_dir) / f"{dataset.replace('/', '__')}__{split}.json"
+        data = load_json(path, {})
+        if data and data.get("settings") != settings:
+            print(f"  checkpoint {path.name} was written with {data.get('settings')}, starting over")
+            data = {}
+        return cls(path, settings, data.get("rows", 0), data.get("chunks", 0), data.get("batches"),
+                   data.get("exhausted", False))
+
+    def is_complete(self, limit: int | None) -> bool:
+        return self.exhausted or (limit is not None and self.rows >= limit)
+
+    def commit(self, rows: int, chunks: int) -> None:
+        """Rows [0, rows) are in the collection, `chunks` of them written by the batch just upserted."""
+        self.rows = rows
+        self.chunks += chunks
+        self.batches.append([rows, chunks])
+        self.save()
+
+    def finish(self, rows: int, exhausted: bool) -> None:
+        self.rows = rows
+        self.exhausted = exhausted
+        self.save()
+
+    def reset(self) -> None:
+        self.rows, self.chunks, self.batches, self.exhausted = 0, 0, [], False
+        self.path.unlink(missing_ok=True)
+
+    def save(self) -> None:
+        save_json_atomic(self.path, {"settings": self.settings, "rows": self.rows, "chunks": self.chunks,
+                                     "batches": self.batches, "exhausted": self.exhausted})
@@ -0,0 +1,305 @@
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+# Errors kept per stage in the run report; the counters keep counting past it.
+MAX_ERRORS = 20
+
+
+def peak_rss_mb(children: bool = False) -> float:
+    """RSS high-water mark of this process (or of its finished child processes), in MB."""
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+class _Stage:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.items = 0
+        self.tokens = 0
+        self.bytes = 0
+        self.failures = 0
+        self.batch_min = None
+        self.batch_max = 0
+        self.peak_rss_mb = 0.0
+        self.errors: List[str] = []
+
+    def to_dict(self) -> Dict:
+        seconds = max(self.seconds, 1e-9)
+        return {
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "items": self.items,
+            "tokens": self.tokens,
+            "bytes": self.bytes,
+            "items_per_s": self.items / seconds if self.items else 0.0,
+            "tokens_per_s": self.tokens / seconds if self.tokens else 0.0,
+            "batch_avg": self.items / self.calls if self.calls else 0.0,
+            "batch_min": self.batch_min or 0,
+            "batch_max": self.batch_max,
+            "failures": self.failures,
+            "peak_rss_mb": self.peak_rss_mb,
+            "errors": self.errors,
+        }
+
+
+class StackSampler(threading.Thread):
+    """
+    py-spy style sampler inside the process: every `interval` seconds it takes
+    the Python stack of each thread that is inside a stage and counts it under
+    that stage. `write()` emits folded stacks ("stage;frame;frame count"), the
+    input format of flamegraph.pl and speedscope.
+    """
+    def __init__(self, metrics: "IngestMetrics", interval: float = 0.01):
+        super().__init__(daemon=True, name="stack-sampler")
+        self.metrics = metrics
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            active = self.metrics.active_stages()
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, stage in active.items():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join([stage, *reversed(stack)])] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def write(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+        return path
+
+
+class IngestMetrics:
+    """
+    Per-stage counters for an ingestion run: wall time, items (chunks, files,
+    rows), tokens and bytes, batch sizes, failures and the RSS high-water mark
+    at the end of each stage. Stages may run on several threads (the upsert
+    stage has its own); work done in worker processes is reported with
+    `record()`. `profile_dir` wraps every outermost stage in cProfile (one
+    .prof per stage, accumulated over calls, main and upsert threads only when
+    the interpreter allows two profilers); `hooks` are called as
+    hook("start" | "stop", stage) for external samplers.
+    """
+    def __init__(self, run_name: str | None = None, profile_dir: str | Path | None = None,
+                 sample_interval: float | None = None, hooks: List[Callable[[str, str], None]] | None = None):
+        self.run_name = run_name or time.strftime("ingest-%Y%m%d-%H%M%S")
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.stages: Dict[str, _Stage] = {}
+        self.lock = threading.Lock()
+        self.hooks = list(hooks or [])
+        self.profile_dir = Path(profile_dir) if profile_dir is not None else None
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._local = threading.local()
+        self._active: Dict[int, str] = {}
+        self.sampler = None
+        if sample_interval:
+            self.sampler = StackSampler(self, sample_interval)
+            self.sampler.start()
+
+    def _get(self, name: str) -> _Stage:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = _Stage()
+        return stage
+
+    def record(self, name: str, seconds: float = 0.0, items: int = 0, tokens: int = 0, nbytes: int = 0,
+               calls: int = 1) -> None:
+        with self.lock:
+            stage = self._get(name)
+            stage.calls += calls
+            stage.seconds += seconds
+            stage.items += items
+            stage.tokens += tokens
+            stage.bytes += nbytes
+            if calls and items:
+                stage.batch_min = items if stage.batch_min is None else min(stage.batch_min, items)
+                stage.batch_max = max(stage.batch_max, items)
+            stage.peak_rss_mb = max(stage.peak_rss_mb, peak_rss_mb())
+
+    def failure(self, name: str, error: BaseException | str | None = None, count: int = 1) -> None:
+        with self.lock:
+            stage = self._get(name)
+            stage.failures += count
+            if error is not None and len(stage.errors) < MAX_ERRORS:
+                stage.errors.append(error if isinstance(error, str) else f"{type(error).__name__}: {error}")
+
+    def active_stages(self) -> Dict[int, str]:
+        with self.lock:
+            return dict(self._active)
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0, tokens: int = 0, nbytes: int = 0):
+        """
+        Times the block as one call of `name`. Counts known only inside the
+        block can be added to the yielded dict ("items", "tokens", "bytes").
+        An exception is counted as a failure and re-raised.
+        """
+        counts = {"items": items, "tokens": tokens, "bytes": nbytes}
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        thread_id = threading.get_ident()
+        with self.lock:
+            outer = self._active.get(thread_id)
+            self._active[thread_id] = name
+        profile = self._start_profile(name) if depth == 0 else None
+        for hook in self.hooks:
+            hook("start", name)
+        start = time.perf_counter()
+        try:
+            yield counts
+        except BaseException as e:
+            self.failure(name, e)
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            for hook in self.hooks:
+                hook("stop", name)
+            if profile is not None:
+                profile.disable()
+            with self.lock:
+                if outer is None:
+                    self._active.pop(thread_id, None)
+                else:
+                    self._active[thread_id] = outer
+            self._local.depth = depth
+            self.record(name, seconds, counts["items"], counts["tokens"], counts["bytes"])
+
+    def timed_iter(self, name: str, iterable: Iterable, size: Callable[[Any], int] | None = None) -> Iterator:
+        """Yields from `iterable`, timing every next() as one call of `name` (for lazy readers)."""
+        it = iter(iterable)
+        while True:
+            with self.stage(name) as counts:
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                counts["items"] = size(item) if size is not None else 1
+            yield item
+
+    def _start_profile(self, name: str) -> cProfile.Profile | None:
+        if self.profile_dir is None:
+            return None
+        with self.lock:
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active (same stage on another thread, or a 3.12+ global profiler).
+            return None
+        return profile
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            stages = {name: stage.to_dict() for name, stage in self.stages.items()}
+        return {
+            "run": self.run_name,
+            "started_at": self.started_at,
+            "wall_seconds": time.perf_counter() - self._start,
+            "peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": peak_rss_mb(children=True),
+            "pid": os.getpid(),
+            "stages": stages,
+        }
+
+    def write_json(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def prometheus(self, prefix: str = "pro_solver_ingest") -> str:
+        """
+        Text exposition format, for node_exporter's textfile collector. Series
+        are labelled by stage only (not by run), so each run replaces the last.
+        """
+        report = self.to_dict()
+        counters = [("calls", "calls", "Stage invocations"),
+                    ("seconds", "seconds", "Wall time spent in the stage"),
+                    ("items", "items", "Items processed (chunks, files or rows)"),
+                    ("tokens", "tokens", "Tokens processed"),
+                    ("bytes", "bytes", "Bytes processed"),
+                    ("failures", "failures", "Failed calls or batches")]
+        lines = []
+        for key, metric, help_text in counters:
+            name = f"{prefix}_stage_{metric}_total"
+            lines += [f"# HELP {name} {help_text}.", f"# TYPE {name} counter"]
+            lines += [f'{name}{{stage="{stage}"}} {values[key]}'
+                      for stage, values in report["stages"].items()]
+        name = f"{prefix}_stage_batch_max_items"
+        lines += [f"# HELP {name} Largest batch seen by the stage.", f"# TYPE {name} gauge"]
+        lines += [f'{name}{{stage="{stage}"}} {values["batch_max"]}'
+                  for stage, values in report["stages"].items()]
+        for metric, value, help_text in (
+                ("peak_rss_bytes", report["peak_rss_mb"] * 2 ** 20, "RSS high-water mark of the ingestion process"),
+                ("children_peak_rss_bytes", report["children_peak_rss_mb"] * 2 ** 20,
+                 "RSS high-water mark of the finished worker processes"),
+                ("wall_seconds", report["wall_seconds"], "Duration of the run"),
+                ("last_run_timestamp_seconds", report["started_at"], "Start time of the run")):
+            name = f"{prefix}_{metric}"
+            lines += [f"# HELP {name} {help_text}.", f"# TYPE {name} gauge",
+                      f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | Path) -> Path:
+        # The textfile collector may read at any moment, so the file is replaced atomically.
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(self.prometheus(), encoding="utf-8")
+        tmp.replace(path)
+        return path
+
+    def write_profiles(self, out_dir: str | Path | None = None) -> List[Path]:
+        out_dir = Path(out_dir) if out_dir is not None else self.profile_dir
+        if out_dir is None:
+            return []
+        out_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        with self.lock:
+            profiles = dict(self._profiles)
+        for name, profile in profiles.items():
+            profile.dump_stats(out_dir / f"{name}.prof")
+            paths.append(out_dir / f"{name}.prof")
+        return paths
+
+    def close(self) -> None:
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def report(self) -> str:
+        report = self.to_dict()
+        lines = [f"ingestion metrics ({report['run']}): {report['wall_seconds']:.1f}s, "
+                 f"peak RSS {report['peak_rss_mb']:.0f} MB (workers {report['children_peak_rss_mb']:.0f} MB)"]
+        for name, s in sorted(report["stages"].items(), key=lambda kv: -kv[1]["seconds"]):
+            rate = f"{s['items_per_s']:10.1f} items/s" if s["items"] else " " * 18
+            tokens = f"  {s['tokens_per_s']:10.0f} tokens/s" if s["tokens"] else ""
+            failed = f"  {s['failures']} failed" if s["failures"] else ""
+            lines.append(f"  {name:<14} {s['seconds']:9.2f}s  {s['calls']:7d} calls  {s['items']:9d} items  "
+                         f"{rate}{tokens}{failed}")
+        return "\n".join(lines)
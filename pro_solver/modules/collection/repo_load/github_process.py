@@ -1,14 +1,22 @@
+import multiprocessing
 import os
 import pathlib
-from typing import List
-from git import Repo, GitCommandError
-import nbformat
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Set
 from pro_solver.modules.collection.dataset_load.text_process import chunk_text, safe_read_text
-from pro_solver.modules.collection.repo_load.vars import INCLUDE, SKIP_DIRS, CHUNK_SIZE, OVERLAP, BATCH_SIZE, REPOS_LOAD_PATH
+from pro_solver.modules.collection.repo_load.vars import INCLUDE, SKIP_DIRS, CHUNK_SIZE, OVERLAP, BATCH_SIZE, REPOS_LOAD_PATH, MANIFEST_DIR, \
+    READ_WORKERS, UPSERT_QUEUE_SIZE, CHUNK_MODE, FETCH_WORKERS
+from pro_solver.modules.collection.manifest import RepoManifest, collection_manifest_dir, content_hash
+from pro_solver.modules.collection.metrics import IngestMetrics
+from pro_solver.modules.collection.repo_load.ingest_pipeline import UpsertStage, bounded_imap
+from pro_solver.modules.collection.repo_load.repo_fetch import RepoFetcher, RepoFetchError, fetch_repo, \
+    report as report_fetch
 
 def safe_read_text(path: pathlib.Path) -> str:
     try:
         if path.suffix == ".ipynb":
+            import nbformat
             with path.open("r", encoding="utf-8") as f:
                 nb = nbformat.read(f, as_version=4)
             parts = []
@@ -32,74 +40,258 @@ def iter_repo_files(root: pathlib.Path):
                 yield p
 
 def shallow_clone(url: str, dest_root: pathlib.Path) -> pathlib.Path:
-    repo_name = url.rstrip("/").split("/")[-1].replace(".git", "")
-    dest = dest_root / repo_name
-    dest_root.mkdir(parents=True, exist_ok=True)
-    
-    if dest.exists() and (dest / ".git").exists():
+    """Single-repo fetch_repo; raises RepoFetchError when there is no checkout to use."""
+    result = fetch_repo(url, dest_root)
+    print(report_fetch(result))
+    if not result.ok:
+        raise RepoFetchError(result.error)
+    return result.path
+
+def head_commit(repo_path: pathlib.Path) -> str | None:
+    from git import Repo, GitCommandError
+    try:
+        return Repo(repo_path).head.commit.hexsha
+    except (GitCommandError, ValueError):
+        return None
+
+def changed_files(repo_path: pathlib.Path, old_commit: str | None, new_commit: str | None) -> Set[str] | None:
+    """
+    Paths touched between two commits, or None when the diff cannot be computed
+    (first ingestion, or the old commit is not in the shallow history).
+    """
+    if not old_commit or not new_commit:
+        return None
+    from git import Repo, GitCommandError
+    try:
+        out = Repo(repo_path).git.diff("--name-only", "--no-renames", old_commit, new_commit)
+    except GitCommandError:
+        return None
+    return {line.strip() for line in out.splitlines() if line.strip()}
+
+def delete_ids(collection, ids: List[str], batch_size=BATCH_SIZE, lexical_index=None, deduper=None,
+               metrics: IngestMetrics | None = None):
+    """Deletes chunks; returns (ids, docs, metas) of skipped duplicates that lost their kept chunk."""
+    metrics = metrics if metrics is not None else IngestMetrics()
+    for start in range(0, len(ids), batch_size):
         try:
-            Repo(dest).git.pull("--ff-only")
-        except GitCommandError:
-            pass
-        return dest
+            with metrics.stage("delete", items=len(ids[start:start + batch_size])):
+                collection.delete(ids=ids[start:start + batch_size])
+                if lexical_index is not None:
+                    lexical_index.delete(ids[start:start + batch_size])
+        except Exception as e:
+            print(f"Delete error: {e}")
+    return deduper.remove(ids) if deduper is not None else ([], [], [])
 
-    Repo.clone_from(url, dest, depth=1, no_single_branch=True)
-    return dest
+_token_chunker = None
+_chunk_mode = CHUNK_MODE
 
-def add_repos_to_chroma(collection, repo_urls: List[str], batch_size=BATCH_SIZE):
-    repos_root = pathlib.Path(REPOS_LOAD_PATH)
-    total_chunks = 0
+def init_chunk_worker(token_chunker, chunk_mode: str):
+    global _token_chunker, _chunk_mode
+    _token_chunker = token_chunker
+    _chunk_mode = chunk_mode
 
-    for url in repo_urls:
-        print(f"Processing {url} ...")
-        repo_path = shallow_clone(url, repos_root)
-        repo_rel_base = repo_path.name
+def read_and_chunk(path: str, rel_path: str, known_hash: str | None):
+    """
+    Worker task: read one file and chunk it. Returns (rel_path, digest, chunks, truncated, stats);
+    digest is None for empty files, chunks is None when the content hash
+    matches `known_hash` and truncated counts chunks longer than the embedding
+    model window (only known when a token chunker is configured). stats is
+    (read seconds, chunk seconds, bytes read, tokens), measured in the worker
+    since its process cannot update the run metrics.
+    """
+    start = time.perf_counter()
+    raw = safe_read_text(pathlib.Path(path))
+    read_s = time.perf_counter() - start
+    if not raw or raw.strip() == "":
+        return rel_path, None, None, 0, (read_s, 0.0, 0, 0)
 
-        to_add_docs, to_add_ids, to_add_metas = [], [], []
+    header = f"# File: {rel_path}\n"
+    text = header + raw
+    nbytes = len(raw.encode("utf-8"))
+    digest = content_hash(text)
+    read_s = time.perf_counter() - start
+    if digest == known_hash:
+        return rel_path, digest, None, 0, (read_s, 0.0, nbytes, 0)
 
-        for fpath in iter_repo_files(repo_path):
-            rel_path = str(fpath.relative_to(repo_path))
-            raw = safe_read_text(fpath)
-            if not raw or raw.strip() == "":
+    start = time.perf_counter()
+    tokens = _token_chunker.tokens if _token_chunker is not None else 0
+    if _token_chunker is not None and _chunk_mode == "tokens":
+        chunks, truncated = _token_chunker.chunk(text), 0
+    else:
+        chunks = chunk_text(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP)
+        truncated = _token_chunker.count_truncated(chunks) if _token_chunker is not None else 0
+    tokens = _token_chunker.tokens - tokens if _token_chunker is not None else 0
+    return rel_path, digest, chunks, truncated, (read_s, time.perf_counter() - start, nbytes, tokens)
+
+def chunk_settings(token_chunker=None, chunk_mode=CHUNK_MODE, embedder=None) -> dict:
+    """Everything that decides the chunk ids and vectors of a file; stored in the repo manifests."""
+    if token_chunker is not None and chunk_mode == "tokens":
+        settings = {"chunk_mode": "tokens", "budget": token_chunker.budget, "overlap_tokens": token_chunker.overlap,
+                    "tokenizer": getattr(token_chunker.tokenizer, "name_or_path", None)}
+    else:
+        settings = {"chunk_mode": "chars", "chunk_size": CHUNK_SIZE, "overlap": OVERLAP}
+    if embedder is not None:
+        settings["embedding_model"] = embedder.model_name
+    return settings
+
+def add_repos_to_chroma(collection, repo_urls: List[str], batch_size=BATCH_SIZE, manifest_dir=MANIFEST_DIR,
+                        workers=READ_WORKERS, max_queue=UPSERT_QUEUE_SIZE, embedder=None,
+                        token_chunker=None, chunk_mode=CHUNK_MODE, lexical_index=None, deduper=None,
+                        fetch_workers=FETCH_WORKERS, metrics: IngestMetrics | None = None):
+    """
+    Fetches, reads, chunks and upserts the repositories. Stages recorded in
+    `metrics`: fetch (per repo, summed over the parallel fetches), wait_fetch,
+    read and chunk (per file, summed over the worker processes), dedup, embed,
+    upsert, bm25, wait_upsert, delete and manifest. Manifests are kept per
+    collection under `manifest_dir`.
+    """
+    metrics = metrics if metrics is not None else IngestMetrics()
+    settings = chunk_settings(token_chunker, chunk_mode, embedder)
+    manifest_dir = collection_manifest_dir(manifest_dir, collection.name)
+    repos_root = pathlib.Path(REPOS_LOAD_PATH)
+    # Every repo is fetched in the background; ingestion takes them in order as they arrive.
+    fetcher = RepoFetcher(repos_root, workers=fetch_workers)
+    fetches = fetcher.submit(repo_urls)
+    failed_fetches = []
+    stage = UpsertStage(collection, max_queue=max_queue, embedder=embedder, lexical_index=lexical_index,
+                        deduper=deduper, metrics=metrics)
+    stage.start()
+    if workers > 1:
+        # The fetch and upsert threads are already running; forking now could copy a held lock
+        # (tokenizer, logging, Chroma client) into the children, so they start from a clean process.
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=init_chunk_worker,
+                                   initargs=(token_chunker, chunk_mode),
+                                   mp_context=multiprocessing.get_context(start_method))
+    else:
+        pool = None
+        init_chunk_worker(token_chunker, chunk_mode)
+
+    try:
+        for url in repo_urls:
+            with metrics.stage("wait_fetch"):
+                fetched = fetches[url].result()
+            print(report_fetch(fetched))
+            metrics.record("fetch", fetched.seconds, items=1)
+            if fetched.status in ("failed", "stale"):
+                failed_fetches.append(fetched)
+                metrics.failure("fetch", f"{url}: {fetched.error}")
+            if not fetched.ok:
                 continue
+            print(f"Processing {url} ...")
+            repo_path = fetched.path
+            repo_rel_base = repo_path.name
+
+            manifest = RepoManifest.load(manifest_dir, repo_rel_base, settings)
+            commit = head_commit(repo_path)
+            if commit is not None and commit == manifest.commit:
+                print(f"{url} is up to date at {commit[:10]}, skipping.")
+                continue
+            candidates = changed_files(repo_path, manifest.commit, commit)
+
+            jobs = []
+            kept_paths: Set[str] = set()
+            for fpath in iter_repo_files(repo_path):
+                rel_path = str(fpath.relative_to(repo_path))
+                if candidates is not None and rel_path in manifest.files and rel_path not in candidates:
+                    kept_paths.add(rel_path)
+                    continue
+                entry = manifest.files.get(rel_path)
+                jobs.append((str(fpath), rel_path, entry["hash"] if entry else None))
+
+            to_add_docs, to_add_ids, to_add_metas = [], [], []
+            batch_paths: Set[str] = set()
+            updates = {}
+            total_new_chunks = 0
+            total_truncated = 0
+            started = time.perf_counter()
+
+            for rel_path, digest, chunks, truncated, stats in bounded_imap(pool, read_and_chunk, jobs,
+                                                                           window=4 * max(workers, 1)):
+                read_s, chunk_s, nbytes, tokens = stats
+                metrics.record("read", read_s, items=1, nbytes=nbytes)
+                if chunks is not None:
+                    metrics.record("chunk", chunk_s, items=len(chunks), tokens=tokens, nbytes=nbytes)
+                if digest is None:
+                    continue
+                if chunks is None:
+                    kept_paths.add(rel_path)
+                    continue
+
+                chunk_ids = [f"{repo_rel_base}:{rel_path}:{i}" for i in range(len(chunks))]
+                updates[rel_path] = {"hash": digest, "chunk_ids": chunk_ids}
+                total_new_chunks += len(chunks)
+                total_truncated += truncated
+
+                for i, (doc_id, ch) in enumerate(zip(chunk_ids, chunks)):
+                    to_add_docs.append(ch)
+                    to_add_ids.append(doc_id)
+                    to_add_metas.append({
+                        "repo": url,
+                        "repo_name": repo_rel_base,
+                        "path": rel_path,
+                        "chunk_index": i,
+                        "section": "code"
+                    })
+                    batch_paths.add(rel_path)
+
+                    if len(to_add_ids) >= batch_size:
+                        stage.submit(to_add_ids, to_add_docs, to_add_metas, batch_paths)
+                        to_add_docs, to_add_ids, to_add_metas = [], [], []
+                        batch_paths = set()
+
+            if to_add_ids:
+                stage.submit(to_add_ids, to_add_docs, to_add_metas, batch_paths)
+            with metrics.stage("wait_upsert"):
+                failed_paths = stage.drain()
+            if failed_paths:
+                metrics.failure("files", f"{url}: {len(failed_paths)} files not written", count=len(failed_paths))
+            elapsed = time.perf_counter() - started
+
+            # Files that are gone or no longer readable lose all their chunks,
+            # files that shrank lose the chunk ids past their new chunk count.
+            stale_ids = []
+            for rel_path in list(manifest.files):
+                if rel_path in kept_paths or rel_path in failed_paths:
+                    continue
+                new_ids = set(updates[rel_path]["chunk_ids"]) if rel_path in updates else set()
+                stale_ids.extend(i for i in manifest.chunk_ids(rel_path) if i not in new_ids)
+                if rel_path not in updates:
+                    del manifest.files[rel_path]
+            if stale_ids:
+                orphan_ids, orphan_docs, orphan_metas = delete_ids(collection, stale_ids, batch_size,
+                                                                   lexical_index, deduper, metrics)
+                if orphan_ids:
+                    # Duplicates skipped in favour of a removed chunk now stand for themselves.
+                    stage.submit(orphan_ids, orphan_docs, orphan_metas, set())
+                    with metrics.stage("wait_upsert"):
+                        stage.drain()
+
+            for rel_path, entry in updates.items():
+                if rel_path not in failed_paths:
+                    manifest.files[rel_path] = entry
+
+            if not failed_paths:
+                manifest.commit = commit
+            with metrics.stage("manifest", items=len(manifest.files)):
+                manifest.save()
 
-            header = f"# File: {rel_path}\n"
-            text = header + raw
-
-            chunks = chunk_text(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP)
-            for i, ch in enumerate(chunks):
-                doc_id = f"{repo_rel_base}:{rel_path}:{i}"
-                to_add_docs.append(ch)
-                to_add_ids.append(doc_id)
-                to_add_metas.append({
-                    "repo": url,
-                    "repo_name": repo_rel_base,
-                    "path": rel_path,
-                    "chunk_index": i,
-                    "section": "code"
-                })
-
-                if len(to_add_ids) >= batch_size:
-                    try:
-                        collection.upsert(
-                            documents=to_add_docs, 
-                            metadatas=to_add_metas, 
-                            ids=to_add_ids
-                        )
-                    except Exception as e:
-                        print(f"Batch error: {e}")
-                    total_chunks += len(to_add_ids)
-                    to_add_docs, to_add_ids, to_add_metas = [], [], []
-
-        if to_add_ids:
-            try:
-                collection.upsert(
-                    documents=to_add_docs, 
-                    metadatas=to_add_metas, 
-                    ids=to_add_ids
-                )
-            except Exception as e:
-                print(f"Final batch error for {url}: {e}")
-            total_chunks += len(to_add_ids)
-
-        print(f"{url} -> added ~{total_chunks} chunks so far.")
\ No newline at end of file
+            print(f"{url} -> {len(jobs)} files read in {elapsed:.1f}s ({len(jobs) / max(elapsed, 1e-9):.1f} files/s), "
+                  f"{len(updates)} changed, {len(stale_ids)} stale chunks removed.")
+            print(f"{url} -> {stage.report()}")
+            if token_chunker is not None and chunk_mode != "tokens":
+                print(f"{url} -> {total_truncated} of {total_new_chunks} chunks exceed the "
+                      f"{token_chunker.budget}-token embedding window and get truncated")
+            if embedder is not None:
+                print(f"{url} -> {embedder.report()}")
+            if deduper is not None:
+                print(f"{url} -> {deduper.report()}")
+    finally:
+        fetcher.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        stage.close()
+    if failed_fetches:
+        print(f"{len(failed_fetches)} of {len(repo_urls)} repositories could not be fetched:")
+        for fetched in failed_fetches:
+            print(f"  {report_fetch(fetched)}")
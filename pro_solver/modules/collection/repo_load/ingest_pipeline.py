@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, Callable, Iterable, Iterator, List, Set, Tuple
+
+from pro_solver.modules.collection.metrics import IngestMetrics
+
+
+Batch = Tuple[List[str], List[str], List[dict], Set[str]]
+
+
+def bounded_imap(executor: Executor | None, fn: Callable, items: Iterable[Tuple], window: int) -> Iterator[Any]:
+    """
+    Ordered map over an executor that never keeps more than `window` tasks in flight,
+    so a slow consumer throttles the producers instead of buffering every result.
+    """
+    if executor is None:
+        for args in items:
+            yield fn(*args)
+        return
+
+    pending = deque()
+    for args in items:
+        pending.append(executor.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class UpsertStage(threading.Thread):
+    """
+    Consumer side of the ingestion pipeline: takes ready batches from a bounded
+    queue and upserts them (which is where Chroma embeds), while the producers
+    keep reading and chunking files. With a deduper, near-duplicate chunks are
+    dropped before embedding; written batches also go to the BM25 builder, if
+    one is given. Dedup, embedding, the collection write and the BM25 append
+    are timed as separate stages in `metrics`.
+    """
+    def __init__(self, collection, max_queue: int = 8, embedder=None, lexical_index=None, deduper=None,
+                 metrics: IngestMetrics | None = None):
+        super().__init__(daemon=True)
+        self.collection = collection
+        self.embedder = embedder
+        self.lexical_index = lexical_index
+        self.deduper = deduper
+        self.metrics = metrics if metrics is not None else IngestMetrics()
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.failed_paths: Set[str] = set()
+        self.chunks = 0
+        self.batches = 0
+        self.busy_time = 0.0
+        self.depth_sum = 0
+        self.depth_max = 0
+        self.started_at = time.perf_counter()
+
+    def submit(self, ids: List[str], docs: List[str], metas: List[dict], paths: Set[str]) -> None:
+        depth = self.queue.qsize()
+        self.depth_sum += depth
+        self.depth_max = max(self.depth_max, depth)
+        self.queue.put((ids, docs, metas, paths))
+
+    def run(self) -> None:
+        while True:
+            batch = self.queue.get()
+            try:
+                if batch is None:
+                    return
+                self._upsert(batch)
+            finally:
+                self.queue.task_done()
+
+    def _upsert(self, batch: Batch) -> None:
+        ids, docs, metas, paths = batch
+        metrics = self.metrics
+        start = time.perf_counter()
+        try:
+            if self.deduper is not None:
+                with metrics.stage("dedup", items=len(ids)):
+                    ids, docs, metas = self.deduper.filter(ids, docs, metas)
+            if ids:
+                nbytes = sum(len(d.encode("utf-8")) for d in docs)
+                if self.embedder is not None:
+                    with metrics.stage("embed", items=len(ids), nbytes=nbytes):
+                        embeddings = self.embedder(docs).tolist()
+                    with metrics.stage("upsert", items=len(ids), nbytes=nbytes):
+                        self.collection.upsert(documents=docs, metadatas=metas, ids=ids, embeddings=embeddings)
+                else:
+                    # Chroma embeds inside upsert, so "upsert" includes the embedding time here.
+                    with metrics.stage("upsert", items=len(ids), nbytes=nbytes):
+                        self.collection.upsert(documents=docs, metadatas=metas, ids=ids)
+                if self.lexical_index is not None:
+                    with metrics.stage("bm25", items=len(ids)):
+                        self.lexical_index.add(ids, docs, metas)
+        except Exception as e:
+            print(f"Batch error: {e}")
+            self.failed_paths.update(paths)
+        self.busy_time += time.perf_counter() - start
+        self.chunks += len(ids)
+        self.batches += 1
+
+    def drain(self) -> Set[str]:
+        """Wait until every submitted batch is written and return (and reset) the failed paths."""
+        self.queue.join()
+        failed, self.failed_paths = self.failed_paths, set()
+        return failed
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.join()
+
+    def report(self) -> str:
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        avg_depth = self.depth_sum / self.batches if self.batches else 0.0
+        return (f"{self.chunks} chunks in {self.batches} batches, "
+                f"{self.chunks / elapsed:.1f} chunks/s, "
+                f"upsert busy {100 * self.busy_time / elapsed:.0f}%, "
+                f"queue depth avg {avg_depth:.1f} / max {self.depth_max}")
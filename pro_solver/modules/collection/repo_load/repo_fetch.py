@@ -0,0 +1,127 @@
+import pathlib
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List
+
+from pro_solver.modules.collection.repo_load.vars import INCLUDE, SKIP_DIRS, FETCH_WORKERS, FETCH_TIMEOUT, \
+    REPO_MIRROR_DIR
+
+
+class RepoFetchError(RuntimeError):
+    pass
+
+
+@dataclass
+class FetchResult:
+    url: str
+    path: pathlib.Path | None
+    # "cloned", "updated", "stale" (update failed, previous checkout kept) or "failed"
+    status: str
+    seconds: float
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.path is not None
+
+
+def repo_name(url: str) -> str:
+    return url.rstrip("/").split("/")[-1].replace(".git", "")
+
+
+def sparse_patterns(include: Iterable[str] = INCLUDE, skip_dirs: Iterable[str] = SKIP_DIRS) -> List[str]:
+    """Non-cone sparse-checkout patterns: the files iter_repo_files reads, minus the skipped directories."""
+    patterns = [f"*{suffix}" for suffix in sorted(include)]
+    patterns += [f"!**/{d}/**" for d in sorted(skip_dirs)]
+    return patterns
+
+
+def _git(*args, cwd: pathlib.Path | None = None) -> str:
+    from git import Git, GitCommandError
+    try:
+        return Git(str(cwd) if cwd is not None else None).execute(["git", *map(str, args)],
+                                                                  kill_after_timeout=FETCH_TIMEOUT)
+    except GitCommandError as e:
+        lines = [line.strip() for line in (e.stderr or "").replace("stderr:", "").strip(" '\n").splitlines()]
+        message = next((line for line in lines if line), str(e))
+        raise RepoFetchError(f"git {args[0]} failed (exit {e.status}): {message}") from None
+
+
+def _as_url(path_or_url: str | pathlib.Path) -> str:
+    # Plain local paths make git ignore --depth and --filter; file:// URLs do not.
+    text = str(path_or_url)
+    return text if "://" in text or text.startswith("git@") else pathlib.Path(text).resolve().as_uri()
+
+
+def update_mirror(url: str, mirror_root: pathlib.Path) -> str:
+    """Full bare mirror of `url` under `mirror_root`, created or refreshed; returns its file:// URL."""
+    mirror = mirror_root / f"{repo_name(url)}.git"
+    mirror_root.mkdir(parents=True, exist_ok=True)
+    if (mirror / "HEAD").exists():
+        _git("remote", "update", "--prune", cwd=mirror)
+    else:
+        _git("clone", "--mirror", "--quiet", _as_url(url), mirror)
+        # Working clones ask the mirror for filtered (blobless) packs.
+        _git("config", "uploadpack.allowFilter", "true", cwd=mirror)
+    return mirror.resolve().as_uri()
+
+
+def fetch_repo(url: str, dest_root: pathlib.Path, mirror_root: pathlib.Path | None = None) -> FetchResult:
+    """
+    Depth-1, blobless clone with a sparse checkout of the INCLUDE suffixes
+    outside SKIP_DIRS, so only the blobs that get ingested are downloaded and
+    written. An existing checkout is updated with fetch --depth 1 + reset
+    instead of pull. With `mirror_root`, clones and updates go through a local
+    bare mirror.
+    """
+    start = time.perf_counter()
+    dest = dest_root / repo_name(url)
+    dest_root.mkdir(parents=True, exist_ok=True)
+    existing = (dest / ".git").exists()
+    try:
+        source = update_mirror(url, mirror_root) if mirror_root is not None else _as_url(url)
+        if existing:
+            _git("remote", "set-url", "origin", source, cwd=dest)
+            _git("sparse-checkout", "set", "--no-cone", *sparse_patterns(), cwd=dest)
+            _git("fetch", "--depth", "1", "--filter=blob:none", "--quiet", "origin", "HEAD", cwd=dest)
+            _git("reset", "--hard", "--quiet", "FETCH_HEAD", cwd=dest)
+            status = "updated"
+        else:
+            _git("clone", "--depth", "1", "--filter=blob:none", "--sparse", "--no-checkout", "--quiet", source, dest)
+            _git("sparse-checkout", "set", "--no-cone", *sparse_patterns(), cwd=dest)
+            _git("checkout", "--quiet", cwd=dest)
+            status = "cloned"
+        return FetchResult(url, dest, status, time.perf_counter() - start)
+    except RepoFetchError as e:
+        if existing:
+            return FetchResult(url, dest, "stale", time.perf_counter() - start, str(e))
+        return FetchResult(url, None, "failed", time.perf_counter() - start, str(e))
+
+
+class RepoFetcher:
+    """
+    Bounded pool that clones/updates repositories concurrently. `submit()`
+    returns futures in input order, so ingestion can start on the first repo
+    while the others are still downloading.
+    """
+    def __init__(self, dest_root: pathlib.Path, workers: int = FETCH_WORKERS,
+                 mirror_root: pathlib.Path | None = REPO_MIRROR_DIR):
+        self.dest_root = pathlib.Path(dest_root)
+        self.mirror_root = pathlib.Path(mirror_root) if mirror_root is not None else None
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="repo-fetch")
+
+    def submit(self, urls: Iterable[str]) -> Dict[str, Future]:
+        return {url: self.pool.submit(fetch_repo, url, self.dest_root, self.mirror_root) for url in urls}
+
+    def close(self) -> None:
+        self.pool.shutdown(cancel_futures=True)
+
+
+def report(result: FetchResult) -> str:
+    if result.status == "failed":
+        return f"{result.url}: FETCH FAILED after {result.seconds:.1f}s, skipping: {result.error}"
+    if result.status == "stale":
+        return (f"{result.url}: UPDATE FAILED after {result.seconds:.1f}s, ingesting the previous checkout: "
+                f"{result.error}")
+    return f"{result.url}: {result.status} in {result.seconds:.1f}s"
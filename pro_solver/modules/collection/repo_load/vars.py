@@ -1,3 +1,4 @@
+import os
 import re
 from pathlib import Path
 
@@ -55,4 +56,13 @@ CHUNK_SIZE = 1200
 OVERLAP = 200
 BATCH_SIZE = 100
 
-REPOS_LOAD_PATH = DB_DIR/"chroma"/"repos"
\ No newline at end of file
+REPOS_LOAD_PATH = DB_DIR/"chroma"/"repos"
+# Local bare mirrors that clones/updates go through, e.g. DB_DIR/"chroma"/"mirrors"; None fetches directly
+REPO_MIRROR_DIR = None
+FETCH_WORKERS = 4
+FETCH_TIMEOUT = 900
+MANIFEST_DIR = DB_DIR/"chroma"/"manifests"
+
+READ_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+UPSERT_QUEUE_SIZE = 8
+CHUNK_MODE = "chars"
@@ -1,14 +1,37 @@
-from langchain_mistralai.chat_models import ChatMistralAI
+from pro_solver.modules.rag_pipeline.response_cache import ResponseCache
 
 class LLMModel:
-    def __init__(self, api_key: str, model_name: str, temperature: float = 0.3):
+    def __init__(self, api_key: str, model_name: str, temperature: float = 0.3, cache: ResponseCache = None):
+        from langchain_mistralai.chat_models import ChatMistralAI
         self.model = ChatMistralAI(
                                    model=model_name,
                                    temperature=temperature,
                                    max_retries=2,
                                    api_key=api_key
                                   )
+        self.model_name = model_name
+        self.temperature = temperature
+        self.cache = cache
+        self._chains = {}
 
-    def __call__(self, prompt_template, input_data: dict):
-        llm_chain = prompt_template | self.model
-        return llm_chain.invoke(input_data)
+    def chain(self, prompt_template):
+        # Keyed by identity; the template is kept alive next to its chain.
+        entry = self._chains.get(id(prompt_template))
+        if entry is None:
+            entry = (prompt_template, prompt_template | self.model)
+            self._chains[id(prompt_template)] = entry
+        return entry[1]
+
+    def __call__(self, prompt_template, input_data: dict, attempt: int = 0):
+        if self.cache is None:
+            return self.chain(prompt_template).invoke(input_data)
+
+        prompt_value = prompt_template.invoke(input_data)
+        key = self.cache.make_key(self.model_name, self.temperature, prompt_value.to_messages(), attempt)
+        content = self.cache.get(key)
+        if content is not None:
+            from langchain_core.messages import AIMessage
+            return AIMessage(content=content)
+        response = self.model.invoke(prompt_value)
+        self.cache.put(key, response.content)
+        return response
@@ -1,7 +1,11 @@
-from chromadb.api.models.Collection import Collection
-from langchain_core.prompts import ChatPromptTemplate
+from typing import TYPE_CHECKING
 from pro_solver.modules.rag_pipeline.pde_prompt import PDEPPrompt
 from pro_solver.modules.rag_pipeline.base_model import LLMModel
+from pro_solver.modules.rag_pipeline.retrieval_cache import RetrievalCache, retrieve
+
+if TYPE_CHECKING:
+  from chromadb.api.models.Collection import Collection
+  from pro_solver.modules.collection.bm25_index import BM25Index
 
 class ModelPipeline():
   def __init__(self,
@@ -11,8 +15,12 @@ class ModelPipeline():
                user_prompt: tuple,
                user_vars: dict,
                system_prompt: tuple,
-               section_name: str
+               section_name: str,
+               retrieval_cache: RetrievalCache = None,
+               lexical_index: "BM25Index" = None,
+               retrieval_mode: str = "vector"
                ):
+    from langchain_core.prompts import ChatPromptTemplate
     self.llm = model
     self.rag_temp = ChatPromptTemplate.from_messages(rag_prompt)
     self.rag_vars = rag_vars
@@ -20,30 +28,35 @@ class ModelPipeline():
     self.user_vars = user_vars
     self.user_prompt = user_prompt
     self.section_name = section_name
+    self.retrieval_cache = retrieval_cache
+    # "vector", "lexical" (BM25 only) or "hybrid" (both, reciprocal-rank fused)
+    self.lexical_index = lexical_index
+    self.retrieval_mode = retrieval_mode
+    # rag_vars never change for a pipeline, so the query text is rendered once.
+    self.rag_query = self.rag_temp.format_messages(**self.rag_vars)[1].content
+    self.prompt_temp = PDEPPrompt(self.system_prompt, self.user_prompt, context = True).template
 
   def search_rag_res(self,
-                     db: Collection,
+                     db: "Collection",
                      num_res: int,
                      additional_info: str = None):
 
-    message = self.rag_temp.format_messages(**self.rag_vars)
+    query_text = self.rag_query
     if additional_info:
-        message[1].content = message[1].content + '\n' + additional_info
+        query_text = query_text + '\n' + additional_info
+    if self.retrieval_cache is not None:
+        results = self.retrieval_cache.query(db, query_text, num_res, self.section_name,
+                                             self.retrieval_mode, self.lexical_index)
     else:
-        pass
-    results = db.query(
-                      query_texts=[message[1].content],
-                      n_results=num_res,
-                      where={"section": self.section_name}
-                      )
+        results = retrieve(db, query_text, num_res, self.section_name, self.retrieval_mode, self.lexical_index)
     if additional_info:
         return additional_info + ' '.join(results['documents'][0])
     return ' '.join(results['documents'][0])
 
   def generate_prompt(self):
-    return PDEPPrompt(self.system_prompt, self.user_prompt, context = True).template
+    return self.prompt_temp
 
-  def generate_response(self, db, num_res, rag_context = None):
+  def generate_response(self, db, num_res, rag_context = None, attempt: int = 0):
     if not rag_context:
       rag_context = self.search_rag_res(db, num_res)
     else:
@@ -53,4 +66,4 @@ class ModelPipeline():
               'context': rag_context
               }
     prompt_temp = self.generate_prompt()
-    return self.llm(prompt_temp, full_request).content
\ No newline at end of file
+    return self.llm(prompt_temp, full_request, attempt=attempt).content
\ No newline at end of file
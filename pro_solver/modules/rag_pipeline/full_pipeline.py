@@ -1,45 +1,185 @@
-from omegaconf import DictConfig
+import json
+import threading
+import time
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
 from pro_solver.modules.rag_pipeline.base_pipeline import ModelPipeline
 from pro_solver.modules.rag_pipeline.base_model import LLMModel
-from pro_solver.modules.validation.output_scheme import PDEOutput
+from pro_solver.modules.rag_pipeline.retrieval_cache import RetrievalCache
 from pro_solver.modules.collection.dataset_load.text_process import safe_json_parse
 
 from pro_solver.modules.validation.code_utils import code_save, code_check
+from pro_solver.modules.validation.sandbox import SandboxPool
+from pro_solver.modules.validation.acceptance import AcceptanceCriteria, CandidateMetrics, evaluate_candidate
 
-from chromadb.api.models.Collection import Collection
+if TYPE_CHECKING:
+    from chromadb.api.models.Collection import Collection
+    from omegaconf import DictConfig
+    from pro_solver.modules.collection.bm25_index import BM25Index
+
+
+def _start_candidate(fn, *args) -> Future:
+    """
+    Runs fn(*args) on a daemon thread. An LLM round-trip cannot be interrupted,
+    so a losing candidate may still be waiting on one when the winner is
+    picked; a daemon thread does not hold up interpreter exit for it.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+@dataclass
+class GenerationResult:
+    success: bool
+    attempts: int
+    elapsed: float
+    time_to_first_valid: float | None = None
+    code: str | None = None
+    metrics: dict | None = None
 
 
 class RagPipeline:
     def __init__(self, model: LLMModel,
-                 math_cfg: DictConfig,
-                 code_cfg: DictConfig,
-                 db: Collection,
-                 info_num: int = 5
+                 math_cfg: "DictConfig",
+                 code_cfg: "DictConfig",
+                 db: "Collection",
+                 info_num: int = 5,
+                 retrieval_cache: RetrievalCache = None,
+                 concurrency: int = 1,
+                 max_attempts: int | None = None,
+                 time_budget: float | None = None,
+                 sandbox: SandboxPool = None,
+                 acceptance: AcceptanceCriteria = None,
+                 select: int = 1,
+                 lexical_index: "BM25Index" = None,
+                 retrieval_mode: str = "vector"
                  ):
         self.model = model
-        self.math_pipeline = ModelPipeline(self.model, **math_cfg)
-        self.code_pipeline = ModelPipeline(self.model, **code_cfg)
+        self.retrieval_cache = retrieval_cache
+        retrieval = {"retrieval_cache": retrieval_cache, "lexical_index": lexical_index,
+                     "retrieval_mode": retrieval_mode}
+        self.math_pipeline = ModelPipeline(self.model, **math_cfg, **retrieval)
+        self.code_pipeline = ModelPipeline(self.model, **code_cfg, **retrieval)
         self.collection = db
         self.page_num = info_num
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self.time_budget = time_budget
+        self.sandbox = sandbox
+        self.acceptance = acceptance
+        # Accepted candidates to collect before picking the best; 1 keeps first-valid-wins.
+        self.select = max(1, select) if acceptance is not None else 1
 
-    def __call__(self, name):
-        math_context = self.math_pipeline.generate_response(self.collection, self.page_num)
-        while (True):
-            code_text = self.code_pipeline.generate_response(self.collection, self.page_num, math_context)
-            try:
-                code_json = safe_json_parse(code_text)
-            except:
-                continue
+    def generate_candidate(self, math_context: str, attempt: int,
+                           stop: threading.Event) -> tuple[str, CandidateMetrics | None] | None:
+        """
+        One generate-parse-validate round; returns (solver code, metrics) if it
+        runs cleanly and, with acceptance criteria set, meets them on benchmark samples.
+        """
+        from pro_solver.modules.validation.output_scheme import PDEOutput
+        # `stop` means another candidate already won: no new LLM call, parse or sandbox run.
+        if stop.is_set():
+            return None
+        try:
+            code_text = self.code_pipeline.generate_response(self.collection, self.page_num, math_context, attempt)
+            if stop.is_set():
+                return None
+            code_json = safe_json_parse(code_text)
             pde_output = PDEOutput(**code_json)
+        except Exception as e:
+            print(f"Attempt {attempt}: unusable response ({type(e).__name__})")
+            return None
+
+        full_code = "\n\n".join([
+            pde_output.function,
+            pde_output.example
+        ])
+        final_code = "\n\n".join([
+            pde_output.function])
+
+        if stop.is_set():
+            return None
+        try:
+            # A run still going when `stop` is set gets killed.
+            if code_check(full_code, self.sandbox, cancel=stop):
+                return None
+        except Exception as e:
+            print(f"Attempt {attempt}: validation failed ({type(e).__name__})")
+            return None
+        if self.acceptance is None:
+            return final_code, None
+
+        if stop.is_set():
+            return None
+        try:
+            metrics = evaluate_candidate(final_code, self.acceptance, self.sandbox, cancel=stop)
+        except Exception as e:
+            print(f"Attempt {attempt}: evaluation failed ({type(e).__name__})")
+            return None
+        if stop.is_set():
+            return None
+        print(f"Attempt {attempt}: {'accepted' if metrics.accepted else 'rejected'} ({metrics.reason})")
+        if not metrics.accepted:
+            return None
+        return final_code, metrics
+
+    def __call__(self, name) -> GenerationResult:
+        start = time.perf_counter()
+        deadline = start + self.time_budget if self.time_budget is not None else None
+        math_context = self.math_pipeline.generate_response(self.collection, self.page_num)
+
+        stop = threading.Event()
+        pending = set()
+        attempts = 0
+        accepted = []
+        try:
+            while len(accepted) < self.select:
+                while (len(pending) < self.concurrency
+                       and (self.max_attempts is None or attempts < self.max_attempts)
+                       and (deadline is None or time.perf_counter() < deadline)):
+                    pending.add(_start_candidate(self.generate_candidate, math_context, attempts, stop))
+                    attempts += 1
+                if not pending:
+                    break
+
+                timeout = max(0.0, deadline - time.perf_counter()) if deadline is not None else None
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    print("Time budget exhausted")
+                    break
+                for future in done:
+                    if future.result() is not None:
+                        accepted.append((future.result(), time.perf_counter() - start))
+        finally:
+            # Cancels the candidates still running: pending sandbox jobs are killed, the rest return early.
+            stop.set()
+
+        elapsed = time.perf_counter() - start
+        if not accepted:
+            print(f"No valid solver after {attempts} attempts in {elapsed:.1f}s")
+            return GenerationResult(False, attempts, elapsed)
 
-            full_code = "\n\n".join([
-                pde_output.function,
-                pde_output.example
-            ])
-            final_code = "\n\n".join([
-                pde_output.function])
+        time_to_first_valid = accepted[0][1]
+        (winner, metrics), _ = min(accepted, key=lambda item: item[0][1].rank_key() if item[0][1] is not None else ())
+        code_save(winner, name)
+        if metrics is None:
+            return GenerationResult(True, attempts, elapsed, time_to_first_valid, winner)
 
-            if not code_check(full_code):
-                code_save(final_code, name)
-                break
\ No newline at end of file
+        report = {"equation": self.acceptance.equation, "criteria": vars(self.acceptance),
+                  "selected": metrics.to_dict(),
+                  "accepted": [m.to_dict() for (_, m), _ in accepted]}
+        with open(f"{name}.metrics.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return GenerationResult(True, attempts, elapsed, time_to_first_valid, winner, metrics.to_dict())
@@ -1,4 +1,7 @@
-from langchain_core.prompts import ChatPromptTemplate
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+  from langchain_core.prompts import ChatPromptTemplate
 
 class PDEPPrompt():
   def __init__(self,
@@ -12,7 +15,8 @@ class PDEPPrompt():
 
 
   @property
-  def template(self) -> ChatPromptTemplate:
+  def template(self) -> "ChatPromptTemplate":
+    from langchain_core.prompts import ChatPromptTemplate
     if self.context:
         prompt_template = [
             self.system_prompt,
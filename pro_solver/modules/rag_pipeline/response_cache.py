@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+# Fraction of max_entries left after an eviction pass.
+EVICT_TO = 0.9
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of LLM responses, keyed by model name,
+    temperature, the rendered messages and the attempt number. Entries older
+    than `ttl` seconds are ignored. Once more than `max_entries` files are
+    written, expired files are deleted and the oldest ones evicted down to
+    EVICT_TO of `max_entries`, so the directory is only scanned every few
+    hundred writes. In `replay` mode a miss is an error instead of an API call.
+    """
+    def __init__(self, cache_dir: str | Path, max_entries: int = 10000, ttl: float | None = None,
+                 replay: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.replay = replay
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._entries = sum(1 for _ in self.cache_dir.glob("*.json"))
+
+    @staticmethod
+    def make_key(model_name: str, temperature: float, messages: List, attempt: int = 0) -> str:
+        rendered = [[m.type, m.content] for m in messages]
+        payload = json.dumps([model_name, temperature, rendered, attempt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            entry = None
+        if entry is not None and self.ttl is not None and time.time() - entry["created"] > self.ttl:
+            entry = None
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                if self.replay:
+                    raise KeyError(f"No cached LLM response for key {key} in replay mode")
+                return None
+            self.hits += 1
+        return entry["content"]
+
+    def put(self, key: str, content: str) -> None:
+        path = self._path(key)
+        tmp_path = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        new = not path.exists()
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "content": content}, f)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self._entries += new
+            full = self._entries > self.max_entries
+        if full:
+            self._evict()
+
+    def _evict(self) -> None:
+        # Files are written once, so mtime is the creation time.
+        entries = []
+        for p in self.cache_dir.glob("*.json"):
+            try:
+                entries.append((p.stat().st_mtime, p))
+            except FileNotFoundError:
+                continue
+        now = time.time()
+        if self.ttl is not None:
+            expired = [p for mtime, p in entries if now - mtime > self.ttl]
+            for p in expired:
+                p.unlink(missing_ok=True)
+            entries = [(mtime, p) for mtime, p in entries if now - mtime <= self.ttl]
+        keep = int(self.max_entries * EVICT_TO)
+        entries.sort()
+        for _, p in entries[:max(0, len(entries) - keep)]:
+            p.unlink(missing_ok=True)
+        with self.lock:
+            self._entries = min(len(entries), keep)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# Candidates per side, as a multiple of n_results, that hybrid retrieval fuses.
+HYBRID_DEPTH = 2
+# Seconds a collection's document count is trusted before it is asked again.
+VERSION_TTL = 30.0
+
+
+class RetrievalCache:
+    """
+    Two-level cache of `collection.query` results: an in-process LRU in front
+    of an optional directory of JSON files. Keys include the collection name
+    and document count (re-read every `version_ttl` seconds, so long-running
+    processes notice a re-ingestion), and `invalidate()` drops everything.
+    """
+    def __init__(self, maxsize: int = 256, cache_dir: str | Path | None = None, version_ttl: float = VERSION_TTL):
+        self.maxsize = maxsize
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.version_ttl = version_ttl
+        self.lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._versions = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def collection_version(self, db) -> str:
+        # The backend is part of the version: exact and HNSW results differ.
+        name = (type(db).__name__, db.name)
+        now = time.monotonic()
+        with self.lock:
+            version, expires = self._versions.get(name, (None, 0.0))
+        if version is None or now >= expires:
+            version = f"{name[0]}:{name[1]}:{db.count()}"
+            with self.lock:
+                self._versions[name] = (version, now + self.version_ttl)
+        return version
+
+    @staticmethod
+    def make_key(query_text: str, section: str, n_results: int, version: str, mode: str = "vector") -> str:
+        payload = json.dumps([query_text, section, n_results, version, mode], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str):
+        with self.lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return self._lru[key]
+
+        if self.cache_dir is not None:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    value = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                value = None
+            if value is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                self._remember(key, value)
+                return value
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key: str, value) -> None:
+        with self.lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+
+    def put(self, key: str, value) -> None:
+        self._remember(key, value)
+        if self.cache_dir is not None:
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, default=float)
+            tmp_path.replace(path)
+
+    def query(self, db, query_text: str, n_results: int, section: str, mode: str = "vector", lexical_index=None):
+        key = self.make_key(query_text, section, n_results, self.collection_version(db), mode)
+        results = self.get(key)
+        if results is None:
+            results = retrieve(db, query_text, n_results, section, mode, lexical_index)
+            results = {k: results[k] for k in ("ids", "documents", "metadatas", "distances", "scores")
+                       if k in results}
+            self.put(key, results)
+        return results
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self._lru.clear()
+            self._versions.clear()
+        if self.cache_dir is not None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "size": len(self._lru)}
+
+
+def retrieve(db, query_text: str, n_results: int, section: str, mode: str = "vector", lexical_index=None) -> dict:
+    """
+    mode="vector" queries the collection, "lexical" the BM25 index (no
+    embedding call) and "hybrid" merges both rankings with reciprocal-rank
+    fusion, each side contributing up to `HYBRID_DEPTH` * n_results candidates.
+    """
+    if mode == "vector":
+        return db.query(query_texts=[query_text], n_results=n_results, where={"section": section})
+    if mode not in ("lexical", "hybrid"):
+        raise ValueError(f"Unknown retrieval mode {mode!r}, expected 'vector', 'lexical' or 'hybrid'")
+    if lexical_index is None:
+        raise ValueError(f"retrieval mode {mode!r} needs a BM25 index")
+    if mode == "lexical":
+        return lexical_index.query([query_text], n_results, where={"section": section})
+
+    from pro_solver.modules.collection.bm25_index import reciprocal_rank_fusion
+    depth = HYBRID_DEPTH * n_results
+    vector = db.query(query_texts=[query_text], n_results=depth, where={"section": section})
+    lexical = lexical_index.query([query_text], depth, where={"section": section})
+    records = {}
+    for res in (lexical, vector):
+        for i, doc, meta in zip(res["ids"][0], res["documents"][0], res["metadatas"][0]):
+            records[i] = (doc, meta)
+    fused = reciprocal_rank_fusion([vector["ids"][0], lexical["ids"][0]])[:n_results]
+    return {"ids": [[i for i, _ in fused]],
+            "documents": [[records[i][0] for i, _ in fused]],
+            "metadatas": [[records[i][1] for i, _ in fused]],
+            "scores": [[score for _, score in fused]]}
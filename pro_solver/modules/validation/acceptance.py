@@ -0,0 +1,136 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+from pro_solver.benchmark.data_modules.data_vars import darcy2d_path, reacdiff1d_path
+from pro_solver.modules.validation.code_utils import run_cancellable
+from pro_solver.modules.validation.vars import ACCEPT_NUM_SAMPLES, ACCEPT_MAX_REL_L2, ACCEPT_MAX_SECONDS_PER_SAMPLE, \
+    ACCEPT_MAX_MEMORY_MB, ACCEPT_OVERHEAD_SECONDS
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+# Equations with benchmark data, keyed like EQUATIONS_DATASET.
+BENCHMARK_FILES = {
+    'darcy2d': darcy2d_path,
+    'rec_diff': reacdiff1d_path,
+}
+
+# Appended to the candidate's function code; runs it through the benchmark harness.
+DRIVER_TEMPLATE = '''
+
+import json as _json
+import sys as _sys
+_sys.path.insert(0, {root!r})
+from pro_solver.benchmark.benchmark_modules.harness import evaluate_samples as _evaluate, aggregate as _aggregate
+_records = _evaluate(solve_pde, {equation!r}, {indices!r})
+with open({out!r}, "w", encoding="utf-8") as _f:
+    _json.dump({{"summary": _aggregate(_records), "samples": _records}}, _f)
+'''
+
+
+@dataclass
+class AcceptanceCriteria:
+    equation: str
+    num_samples: int = ACCEPT_NUM_SAMPLES
+    max_rel_l2: float | None = ACCEPT_MAX_REL_L2
+    max_seconds_per_sample: float | None = ACCEPT_MAX_SECONDS_PER_SAMPLE
+    max_memory_mb: float | None = ACCEPT_MAX_MEMORY_MB
+
+    @property
+    def wall_timeout(self) -> float:
+        per_sample = self.max_seconds_per_sample if self.max_seconds_per_sample is not None else 600.0
+        return per_sample * self.num_samples + ACCEPT_OVERHEAD_SECONDS
+
+
+@dataclass
+class CandidateMetrics:
+    accepted: bool
+    reason: str
+    rel_l2: float | None = None
+    seconds_per_sample: float | None = None
+    peak_memory_mb: float | None = None
+    samples: int = 0
+    failed: int = 0
+    details: dict = field(default_factory=dict)
+
+    def rank_key(self) -> tuple:
+        """Lower is better: error first, then speed."""
+        return (self.rel_l2 if self.rel_l2 is not None else float("inf"),
+                self.seconds_per_sample if self.seconds_per_sample is not None else float("inf"))
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def acceptance_for(name: str, **overrides) -> AcceptanceCriteria | None:
+    """Criteria for an equation name, or None when there is no benchmark data to measure against."""
+    path = BENCHMARK_FILES.get(name)
+    if path is None or not Path(path).exists():
+        return None
+    return AcceptanceCriteria(equation=name, **{k: v for k, v in overrides.items() if v is not None})
+
+
+def _judge(summary: dict, criteria: AcceptanceCriteria, details: dict) -> CandidateMetrics:
+    rel_l2 = summary["rel_l2"].get("max")
+    seconds = summary["wall_time"].get("max")
+    memory = summary.get("max_rss_mb")
+    metrics = CandidateMetrics(False, "", rel_l2, summary["wall_time"].get("mean"), memory,
+                               summary["samples"], summary["failed"], details)
+    if summary["failed"]:
+        metrics.reason = f"{summary['failed']}/{summary['samples']} samples failed"
+    elif criteria.max_rel_l2 is not None and rel_l2 > criteria.max_rel_l2:
+        metrics.reason = f"relative L2 {rel_l2:.3g} > {criteria.max_rel_l2:.3g}"
+    elif criteria.max_seconds_per_sample is not None and seconds > criteria.max_seconds_per_sample:
+        metrics.reason = f"{seconds:.1f}s per sample > {criteria.max_seconds_per_sample:.1f}s"
+    elif criteria.max_memory_mb is not None and memory is not None and memory > criteria.max_memory_mb:
+        metrics.reason = f"{memory:.0f} MB > {criteria.max_memory_mb:.0f} MB"
+    else:
+        metrics.accepted = True
+        metrics.reason = "ok"
+    return metrics
+
+
+def evaluate_candidate(function_code: str, criteria: AcceptanceCriteria, sandbox=None,
+                       cancel: threading.Event | None = None) -> CandidateMetrics:
+    """
+    Runs the candidate's solve_pde on the first `num_samples` benchmark samples,
+    in the sandbox when one is given (otherwise a fresh interpreter), and
+    judges the measurements against `criteria`. Setting `cancel` kills the run.
+    """
+    fd, out_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    code = function_code + DRIVER_TEMPLATE.format(root=str(REPO_ROOT), equation=criteria.equation,
+                                                  indices=list(range(criteria.num_samples)), out=out_path)
+    timeout = criteria.wall_timeout
+    try:
+        if sandbox is not None:
+            result = sandbox.run(code, cancel=cancel, wall_timeout=timeout,
+                                 cpu_time=int(timeout * (os.cpu_count() or 1)))
+            returncode, stderr, timed_out, cancelled = (result.returncode, result.stderr, result.timed_out,
+                                                        result.cancelled)
+        else:
+            with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as tmp:
+                tmp.write(code)
+            try:
+                returncode, _, stderr, timed_out, cancelled = run_cancellable([sys.executable, tmp.name], timeout,
+                                                                              cancel)
+            finally:
+                os.unlink(tmp.name)
+
+        if cancelled:
+            return CandidateMetrics(False, "cancelled")
+        if timed_out:
+            return CandidateMetrics(False, f"timed out after {timeout:.0f}s")
+        with open(out_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        if returncode != 0 or not content:
+            return CandidateMetrics(False, f"benchmark run failed (exit {returncode})",
+                                    details={"stderr": stderr[-2000:]})
+        report = json.loads(content)
+        return _judge(report["summary"], criteria, report)
+    finally:
+        os.unlink(out_path)
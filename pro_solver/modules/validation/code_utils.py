@@ -1,17 +1,49 @@
+import os
 import tempfile
 import subprocess
+import threading
+import time
 
-def code_check(code: str):
+def run_cancellable(args: list, timeout: float, cancel: threading.Event | None = None) -> tuple:
+  """
+  subprocess.run that also stops when `cancel` is set; returns
+  (returncode, stdout, stderr, timed_out, cancelled).
+  """
+  with tempfile.TemporaryFile() as out_f, tempfile.TemporaryFile() as err_f:
+    proc = subprocess.Popen(args, stdout=out_f, stderr=err_f)
+    timed_out = cancelled = False
+    deadline = time.monotonic() + timeout
+    while proc.poll() is None:
+      if cancel is not None and cancel.is_set():
+        cancelled = True
+        break
+      remaining = deadline - time.monotonic()
+      if remaining <= 0:
+        timed_out = True
+        break
+      try:
+        proc.wait(timeout=min(0.05, remaining) if cancel is not None else remaining)
+      except subprocess.TimeoutExpired:
+        pass
+    if proc.poll() is None:
+      proc.kill()
+    proc.wait()
+    out_f.seek(0)
+    err_f.seek(0)
+    return (proc.returncode, out_f.read().decode("utf-8", errors="replace"),
+            err_f.read().decode("utf-8", errors="replace"), timed_out, cancelled)
+
+def code_check(code: str, sandbox=None, cancel: threading.Event | None = None):
+  if sandbox is not None:
+      return sandbox.run(code, cancel=cancel).returncode
   with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as tmp:
       tmp.write(code)
       tmp_path = tmp.name
-  result = subprocess.run(
-    ["python", tmp_path],
-    capture_output=True,
-    text=True,
-    timeout=20
-  )
-  return result.returncode
+  try:
+    returncode, _, _, timed_out, cancelled = run_cancellable(["python", tmp_path], 20, cancel)
+  finally:
+    os.unlink(tmp_path)
+  return -1 if timed_out or cancelled else returncode
 
 def code_save(code: str,
               name: str):
@@ -0,0 +1,163 @@
+import json
+import os
+import queue
+import select
+import signal
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+from pro_solver.modules.validation.vars import SANDBOX_PRELOAD, SANDBOX_WORKERS, SANDBOX_WALL_TIMEOUT, \
+    SANDBOX_CPU_TIME, SANDBOX_ADDRESS_SPACE_MB, SANDBOX_MAX_OUTPUT
+
+WORKER_PATH = Path(__file__).resolve().with_name("sandbox_worker.py")
+
+
+@dataclass
+class SandboxResult:
+    returncode: int
+    stdout: str
+    stderr: str
+    wall_time: float
+    cpu_time: float
+    peak_rss_kb: int
+    timed_out: bool
+    cancelled: bool = False
+
+
+class _Worker:
+    def __init__(self, preload: List[str]):
+        self.process = subprocess.Popen(
+            [sys.executable, str(WORKER_PATH), *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            # Own process group, so a cancelled job's fork dies with the worker.
+            start_new_session=True,
+        )
+        ready = self.process.stdout.readline()
+        if not ready:
+            raise RuntimeError("Sandbox worker failed to start")
+
+    def run(self, job: dict, cancel: threading.Event | None = None) -> dict | None:
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+            if cancel is not None:
+                # One job in flight and one line per answer, so nothing is left in the reader's buffer.
+                while not select.select([self.process.stdout], [], [], 0.05)[0]:
+                    if cancel.is_set():
+                        self.kill()
+                        return None
+            line = self.process.stdout.readline()
+        except (BrokenPipeError, OSError):
+            return None
+        return json.loads(line) if line else None
+
+    def kill(self) -> None:
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+
+    def close(self) -> None:
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.process.kill()
+
+
+class SandboxPool:
+    """
+    Pool of warm worker interpreters that have already imported `preload`.
+    Each run forks a worker, applies CPU-time/address-space limits and a wall
+    timeout to the child, and returns a SandboxResult. Peak RSS includes the
+    pages the child shares with its pre-imported parent.
+    """
+    def __init__(self, workers: int = SANDBOX_WORKERS,
+                 preload: List[str] = SANDBOX_PRELOAD,
+                 cpu_time: int | None = SANDBOX_CPU_TIME,
+                 address_space_mb: int | None = SANDBOX_ADDRESS_SPACE_MB,
+                 wall_timeout: float = SANDBOX_WALL_TIMEOUT,
+                 max_output: int = SANDBOX_MAX_OUTPUT):
+        self.preload = list(preload)
+        self.limits = {
+            "cpu_time": cpu_time,
+            "address_space_mb": address_space_mb,
+            "wall_timeout": wall_timeout,
+            "max_output": max_output,
+        }
+        self.size = workers
+        self.lock = threading.Lock()
+        self._idle: queue.Queue = queue.Queue()
+        for _ in range(workers):
+            self._idle.put(_Worker(self.preload))
+
+    def run(self, code: str, cancel: threading.Event | None = None, **limits) -> SandboxResult:
+        """
+        Runs `code` on an idle worker. Setting `cancel` kills the running job
+        (the worker and its fork) and replaces the worker; a job still waiting
+        for a worker is not started. If a dead worker cannot be replaced, its
+        slot is dropped and the error re-raised.
+        """
+        job = {"code": code, **self.limits, **limits}
+        worker = self._acquire(cancel)
+        if worker is None:
+            return SandboxResult(-1, "", "cancelled", 0.0, 0.0, 0, False, cancelled=True)
+        try:
+            result = worker.run(job, cancel)
+            if result is None:
+                cancelled = cancel is not None and cancel.is_set()
+                # The worker itself died or was killed; replace it and report the run as failed.
+                worker.close()
+                # Nothing goes back to the idle queue if the respawn fails.
+                worker = None
+                worker = self._respawn()
+                return SandboxResult(-1, "", "cancelled" if cancelled else "sandbox worker crashed",
+                                     0.0, 0.0, 0, False, cancelled=cancelled)
+            return SandboxResult(**result)
+        finally:
+            if worker is not None:
+                self._idle.put(worker)
+
+    def _respawn(self) -> "_Worker | None":
+        try:
+            return _Worker(self.preload)
+        except Exception as e:
+            with self.lock:
+                self.size -= 1
+                left = self.size
+            print(f"Sandbox worker could not be restarted ({type(e).__name__}: {e}), {left} left")
+            raise
+
+    def _acquire(self, cancel: threading.Event | None) -> "_Worker | None":
+        while cancel is None or not cancel.is_set():
+            if self.size == 0:
+                raise RuntimeError("Sandbox pool has no workers left")
+            try:
+                return self._idle.get(timeout=0.05)
+            except queue.Empty:
+                pass
+        return None
+
+    def map(self, codes: List[str], **limits) -> List[SandboxResult]:
+        with ThreadPoolExecutor(max_workers=self.size) as pool:
+            return list(pool.map(lambda code: self.run(code, **limits), codes))
+
+    def close(self) -> None:
+        for _ in range(self.size):
+            self._idle.get().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,138 @@
+"""
+Warm sandbox worker, started by SandboxPool as `python sandbox_worker.py <modules...>`.
+
+Imports the given modules once, then reads one JSON job per line on stdin and
+answers with one JSON result per line. Every job runs in a fresh fork of this
+process, so it inherits the warm imports but none of the previous job's state.
+Kept free of pro_solver imports so it starts without the package on sys.path.
+"""
+import importlib
+import json
+import os
+import resource
+import select
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+
+def _apply_limits(job: dict) -> None:
+    if job.get("cpu_time"):
+        seconds = int(job["cpu_time"])
+        resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+    if job.get("address_space_mb"):
+        limit = int(job["address_space_mb"]) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _child(path: str, out_fd: int, err_fd: int, job: dict) -> None:
+    code = 1
+    try:
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_fd, 1)
+        os.dup2(err_fd, 2)
+        _apply_limits(job)
+        import runpy
+        runpy.run_path(path, run_name="__main__")
+        code = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _wait(pid: int, timeout: float):
+    """wait4 with a wall-clock timeout; returns (status, rusage, timed_out)."""
+    deadline = time.perf_counter() + timeout
+    pidfd = os.pidfd_open(pid) if hasattr(os, "pidfd_open") else None
+    try:
+        while True:
+            wpid, status, rusage = os.wait4(pid, os.WNOHANG)
+            if wpid:
+                return status, rusage, False
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                os.kill(pid, signal.SIGKILL)
+                _, status, rusage = os.wait4(pid, 0)
+                return status, rusage, True
+            if pidfd is not None:
+                select.select([pidfd], [], [], remaining)
+            else:
+                time.sleep(min(remaining, 0.005))
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+def _read(f, limit: int) -> str:
+    f.seek(0)
+    data = f.read(limit + 1)
+    text = data[:limit].decode("utf-8", errors="replace")
+    return text + "\n...[truncated]" if len(data) > limit else text
+
+
+def run_job(job: dict) -> dict:
+    fd, path = tempfile.mkstemp(suffix=".py")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(job["code"])
+
+    limit = int(job.get("max_output", 65536))
+    with tempfile.TemporaryFile() as out_f, tempfile.TemporaryFile() as err_f:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            start = time.perf_counter()
+            pid = os.fork()
+            if pid == 0:
+                _child(path, out_f.fileno(), err_f.fileno(), job)
+            status, rusage, timed_out = _wait(pid, float(job.get("wall_timeout", 20.0)))
+            wall_time = time.perf_counter() - start
+        finally:
+            os.unlink(path)
+
+        return {
+            "returncode": os.waitstatus_to_exitcode(status),
+            "stdout": _read(out_f, limit),
+            "stderr": _read(err_f, limit),
+            "wall_time": wall_time,
+            "cpu_time": rusage.ru_utime + rusage.ru_stime,
+            "peak_rss_kb": rusage.ru_maxrss,
+            "timed_out": timed_out,
+        }
+
+
+def main() -> None:
+    # The protocol owns the original stdout; anything printed by imports goes to stderr.
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+
+    for name in sys.argv[1:]:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"sandbox worker: could not preload {name}: {e}", file=sys.stderr)
+    protocol.write(json.dumps({"ready": True, "pid": os.getpid()}) + "\n")
+    protocol.flush()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        result = run_job(json.loads(line))
+        protocol.write(json.dumps(result) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+SANDBOX_PRELOAD = ["numpy", "scipy", "scipy.integrate", "scipy.sparse", "scipy.sparse.linalg", "numba"]
+SANDBOX_WORKERS = 2
+SANDBOX_WALL_TIMEOUT = 20.0
+SANDBOX_CPU_TIME = 60
+SANDBOX_ADDRESS_SPACE_MB = None
+SANDBOX_MAX_OUTPUT = 65536
+
+# Acceptance stage: candidate solve_pde run on benchmark samples
+ACCEPT_NUM_SAMPLES = 3
+ACCEPT_MAX_REL_L2 = 0.1
+ACCEPT_MAX_SECONDS_PER_SAMPLE = 60.0
+ACCEPT_MAX_MEMORY_MB = None
+# Startup, imports and data loading on top of the per-sample budget
+ACCEPT_OVERHEAD_SECONDS = 30.0
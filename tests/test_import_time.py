@@ -0,0 +1,15 @@
+import pytest
+
+from pro_solver.benchmark.benchmark_modules.import_time_benchmark import IMPORT_BUDGETS_MS, measure
+
+
+@pytest.mark.parametrize("module", list(IMPORT_BUDGETS_MS))
+def test_import_budget(module):
+    result = measure(module, repeat=3)
+    assert result["total_ms"] <= IMPORT_BUDGETS_MS[module], f"{module} took {result['total_ms']:.1f} ms"
+
+
+@pytest.mark.parametrize("module", list(IMPORT_BUDGETS_MS))
+def test_no_heavy_imports(module):
+    result = measure(module, repeat=1)
+    assert not result["forbidden"], f"{module} eagerly imports {', '.join(result['forbidden'])}"
@@ -0,0 +1,119 @@
+import shutil
+import subprocess
+
+import pytest
+
+pytest.importorskip("git")
+
+from pro_solver.modules.collection.repo_load.repo_fetch import RepoFetcher, fetch_repo, report
+
+FILES = {
+    "solver.py": "print('v1')\n",
+    "README.md": "# solver\n",
+    "pkg/mod.py": "x = 1\n",
+    "weights.bin": "binary",
+    "data/train.py": "skipped = True\n",
+}
+
+
+def git(*args, cwd):
+    return subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                          cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+def commit(repo, files, message):
+    for name, text in files.items():
+        path = repo / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    git("add", "-A", cwd=repo)
+    git("commit", "-q", "-m", message, cwd=repo)
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Local repository with two commits; blobless clones need allowFilter on the serving side."""
+    repo = tmp_path / "src" / "solver-repo"
+    repo.mkdir(parents=True)
+    git("init", "-q", cwd=repo)
+    git("config", "uploadpack.allowFilter", "true", cwd=repo)
+    commit(repo, FILES, "first")
+    commit(repo, {"solver.py": "print('v2')\n"}, "second")
+    return repo
+
+
+def checked_out(dest):
+    return sorted(str(p.relative_to(dest)) for p in dest.rglob("*") if p.is_file() and ".git" not in p.parts)
+
+
+def test_clone_is_shallow_and_sparse(source, tmp_path):
+    result = fetch_repo(str(source), tmp_path / "repos")
+    assert result.status == "cloned" and result.ok and result.error is None
+    dest = tmp_path / "repos" / "solver-repo"
+    assert result.path == dest
+    assert checked_out(dest) == ["README.md", "pkg/mod.py", "solver.py"]
+    assert (dest / "solver.py").read_text() == "print('v2')\n"
+    assert git("rev-list", "--count", "HEAD", cwd=dest).strip() == "1"
+    # Blobs outside the sparse patterns were never downloaded.
+    missing = {line[1:] for line in git("rev-list", "--objects", "--missing=print", "HEAD", cwd=dest).split()
+               if line.startswith("?")}
+    assert missing == {git("rev-parse", f"HEAD:{name}", cwd=source).strip() for name in ("weights.bin", "data/train.py")}
+
+
+def test_update_fetches_new_commit(source, tmp_path):
+    fetch_repo(str(source), tmp_path / "repos")
+    commit(source, {"solver.py": "print('v3')\n", "new.py": "y = 2\n"}, "third")
+
+    result = fetch_repo(str(source), tmp_path / "repos")
+    dest = tmp_path / "repos" / "solver-repo"
+    assert result.status == "updated"
+    assert (dest / "solver.py").read_text() == "print('v3')\n"
+    assert (dest / "new.py").exists()
+    assert git("rev-parse", "HEAD", cwd=dest) == git("rev-parse", "HEAD", cwd=source)
+    assert git("rev-list", "--count", "HEAD", cwd=dest).strip() == "1"
+
+
+def test_failed_update_keeps_previous_checkout(source, tmp_path):
+    fetch_repo(str(source), tmp_path / "repos")
+    shutil.rmtree(source)
+
+    result = fetch_repo(str(source), tmp_path / "repos")
+    assert result.status == "stale" and result.ok
+    assert result.error.startswith("git fetch failed")
+    assert (result.path / "solver.py").read_text() == "print('v2')\n"
+    assert "UPDATE FAILED" in report(result)
+
+
+def test_bad_url_fails(tmp_path):
+    result = fetch_repo(str(tmp_path / "missing"), tmp_path / "repos")
+    assert result.status == "failed" and not result.ok
+    assert result.path is None
+    assert result.error.startswith("git clone failed")
+    assert "FETCH FAILED" in report(result)
+
+
+def test_mirror(source, tmp_path):
+    mirrors = tmp_path / "mirrors"
+    result = fetch_repo(str(source), tmp_path / "repos", mirrors)
+    dest = tmp_path / "repos" / "solver-repo"
+    assert result.status == "cloned"
+    assert (mirrors / "solver-repo.git" / "HEAD").exists()
+    assert git("remote", "get-url", "origin", cwd=dest).strip() == (mirrors / "solver-repo.git").resolve().as_uri()
+    assert checked_out(dest) == ["README.md", "pkg/mod.py", "solver.py"]
+
+    commit(source, {"solver.py": "print('v3')\n"}, "third")
+    result = fetch_repo(str(source), tmp_path / "repos", mirrors)
+    assert result.status == "updated"
+    assert (dest / "solver.py").read_text() == "print('v3')\n"
+
+
+def test_fetcher_keeps_input_order(source, tmp_path):
+    urls = [str(source), str(tmp_path / "missing")]
+    fetcher = RepoFetcher(tmp_path / "repos", workers=2, mirror_root=None)
+    try:
+        futures = fetcher.submit(urls)
+        assert list(futures) == urls
+        results = [future.result() for future in futures.values()]
+    finally:
+        fetcher.close()
+    assert [r.status for r in results] == ["cloned", "failed"]
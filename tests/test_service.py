@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+
+from pro_solver.infer.service import SolverService, StubCollection, StubLLM
+
+
+def request(app, method: str, path: str, body: bytes = b""):
+    """Drives one ASGI http request; returns (status, response body)."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app({"type": "http", "method": method, "path": path}, receive, send))
+    return messages[0]["status"], b"".join(m.get("body", b"") for m in messages[1:])
+
+
+@pytest.fixture
+def service(tmp_path):
+    return SolverService(StubLLM(), StubCollection(), output_dir=tmp_path, concurrency=1, attempts=1,
+                         budget=None, accept=False)
+
+
+def test_health(service):
+    status, body = request(service, "GET", "/health")
+    assert status == 200
+    assert json.loads(body) == {"status": "ok", "running": 0, "queued": 0, "completed": 0}
+
+
+def test_solve_streams_status(service, tmp_path):
+    pytest.importorskip("langchain_core")
+    status, body = request(service, "POST", "/solve", json.dumps({"name": "rec_diff"}).encode())
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert status == 200
+    assert [line["status"] for line in lines] == ["queued", "started", "done"]
+    assert lines[-1]["success"]
+    assert (tmp_path / "rec_diff.py").exists()
+    assert service.completed == 1 and service.running == 0 and service.queued == 0
+
+
+@pytest.mark.parametrize("body", [
+    b"not json",
+    b"[]",
+    b'"rec_diff"',
+    b'{"name": "no_such_equation"}',
+    b'{"name": "x", "equation": {"equation": "u_t = u_xx"}}',
+    b'{"name": "../../x", "equation": "rec_diff"}',
+])
+def test_bad_spec(service, body):
+    status, response = request(service, "POST", "/solve", body)
+    assert status == 400
+    assert "error" in json.loads(response)
+
+
+def test_path_in_name_is_rejected(service):
+    from pro_solver.infer.vars.infer_vars.equation_var import EQUATIONS_DATASET
+    equation = EQUATIONS_DATASET["rec_diff"]
+    for name in ("../../x", "/etc/x", "a/b", ".."):
+        status, _ = request(service, "POST", "/solve", json.dumps({"name": name, "equation": equation}).encode())
+        assert status == 400
+
+
+def test_queue_full(tmp_path):
+    service = SolverService(StubLLM(), StubCollection(), output_dir=tmp_path, max_queue=0)
+    status, body = request(service, "POST", "/solve", json.dumps({"name": "rec_diff"}).encode())
+    assert status == 429
+    assert json.loads(body)["error"] == "queue full"